@@ -0,0 +1,62 @@
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+# (vehicle_type, capacity, price, free units)
+FleetOption = Tuple[str, int, float, int]
+
+
+@lru_cache(maxsize=4096)
+def _cheapest_cover(options: Tuple[FleetOption, ...], passengers: int) -> Optional[Tuple[float, int, Tuple[int, ...]]]:
+    """Cheapest vehicle counts per option that seat all passengers.
+
+    Bounded knapsack over the fleet, memoized on (option index, passengers
+    still to seat). Returns (total price, vehicle count, counts per option)
+    or None when the free fleet cannot seat everyone. Ties go to fewer
+    vehicles.
+    """
+
+    @lru_cache(maxsize=None)
+    def best(index: int, remaining: int):
+        if remaining <= 0:
+            return 0.0, 0, ()
+        if index == len(options):
+            return None
+
+        _, capacity, price, free = options[index]
+        result = None
+        for count in range(0, min(free, -(-remaining // capacity)) + 1):
+            rest = best(index + 1, remaining - count * capacity)
+            if rest is None:
+                continue
+            candidate = (rest[0] + count * price, rest[1] + count, (count,) + rest[2])
+            if result is None or candidate[:2] < result[:2]:
+                result = candidate
+        return result
+
+    found = best(0, passengers)
+    if found is None:
+        return None
+    total, vehicles, counts = found
+    return total, vehicles, counts + (0,) * (len(options) - len(counts))
+
+
+def cheapest_allocation(passengers: int, options: List[FleetOption]) -> Optional[Dict[str, int]]:
+    """Vehicles to use per type for the cheapest way to seat a party"""
+    if passengers < 1:
+        raise ValueError(f"passengers must be at least 1, got {passengers}")
+    options = tuple(sorted(option for option in options if option[3] > 0 and option[1] > 0))
+    found = _cheapest_cover(options, passengers)
+    if found is None:
+        return None
+    _, _, counts = found
+    return {option[0]: count for option, count in zip(options, counts) if count}
+
+
+def seat_passengers(passengers: int, capacities: List[int]) -> List[int]:
+    """Seats taken in each vehicle, filling them in the order given"""
+    seated = []
+    for capacity in capacities:
+        take = min(capacity, passengers)
+        seated.append(take)
+        passengers -= take
+    return seated
@@ -0,0 +1,87 @@
+"""Measure how quickly a write from another worker reaches this worker's catalog cache.
+
+Needs a replica set, e.g. a local single node:
+    mongod --replSet rs0 --dbpath /tmp/rs0 && mongosh --eval "rs.initiate()"
+
+Usage (from the backend directory, against a disposable database):
+    MONGO_URL=mongodb://localhost:27017/?replicaSet=rs0 python -m benchmarks.cache_coherence [--count 200]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from cache import CatalogCache, TOURS
+from coherence import CacheCoherenceListener, LIVE
+
+POLL_SECONDS = 0.001
+TIMEOUT_SECONDS = 5.0
+
+
+async def wait_for(condition, timeout: float = TIMEOUT_SECONDS) -> bool:
+    deadline = time.perf_counter() + timeout
+    while not condition():
+        if time.perf_counter() > deadline:
+            return False
+        await asyncio.sleep(POLL_SECONDS)
+    return True
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--count", type=int, default=200)
+    args = parser.parse_args()
+
+    database_name = os.environ["DB_NAME"] + "_bench"
+    # Separate clients stand in for two workers
+    reader = AsyncIOMotorClient(os.environ["MONGO_URL"])
+    writer = AsyncIOMotorClient(os.environ["MONGO_URL"])
+    tours = writer[database_name].tours
+    cache = CatalogCache(ttl=3600)
+    listener = CacheCoherenceListener(reader[database_name], cache)
+    try:
+        await tours.drop()
+        tour_id = (await tours.insert_one({"title": "Benchmark Tour", "price": 0.0})).inserted_id
+
+        await listener.start()
+        if not await wait_for(lambda: listener.state == LIVE):
+            print(f"Listener did not go live (state {listener.state}); is MONGO_URL a replica set?")
+            return
+
+        async def load():
+            return await tours.find_one({"_id": tour_id})
+
+        latencies, missed = [], 0
+        for price in range(1, args.count + 1):
+            await cache.get_or_load(TOURS, tour_id, load)
+            started = time.perf_counter()
+            await tours.update_one({"_id": tour_id}, {"$set": {"price": float(price)}})
+            if await wait_for(lambda: cache.stats()["entries"] == 0):
+                latencies.append((time.perf_counter() - started) * 1000)
+            else:
+                missed += 1
+
+        latencies.sort()
+        print(f"write -> invalidation over {len(latencies)} writes: "
+              f"p50 {statistics.median(latencies):.2f} ms, "
+              f"p95 {latencies[int(len(latencies) * 0.95) - 1]:.2f} ms, missed {missed}")
+
+        # Writes made while the listener is down are replayed from its resume token
+        await listener.stop()
+        events = listener.events
+        await tours.update_many({}, {"$inc": {"price": 1}})
+        await listener.start()
+        replayed = await wait_for(lambda: listener.events > events)
+        print(f"resume after restart: {'replayed' if replayed else 'NOT replayed'} the missed write")
+        await tours.drop()
+    finally:
+        await listener.stop()
+        reader.close()
+        writer.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,83 @@
+"""Benchmark the create path with and without the read-back round trip.
+
+Usage (from the backend directory, against a disposable MongoDB):
+    python -m benchmarks.create_roundtrips [--count 500]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import monitoring
+
+import database
+from models import Contact
+
+
+class CommandCounter(monitoring.CommandListener):
+    """Count commands sent to the server"""
+
+    def __init__(self):
+        self.count = 0
+
+    def started(self, event):
+        self.count += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+SAMPLE_CONTACT = {
+    "name": "Benchmark Guest",
+    "email": "guest@example.com",
+    "phone": "+255 777 000 000",
+    "subject": "Mnemba Island availability",
+    "message": "Do you have space for four guests next Friday?",
+}
+
+
+async def run(collection, counter, read_your_writes, count):
+    database.READ_YOUR_WRITES = read_your_writes
+    counter.count = 0
+    latencies = []
+    for _ in range(count):
+        started = time.perf_counter()
+        await database.insert_model(collection, Contact(**SAMPLE_CONTACT))
+        latencies.append((time.perf_counter() - started) * 1000)
+
+    latencies.sort()
+    return {
+        "round_trips_per_create": counter.count / count,
+        "p50_ms": statistics.median(latencies),
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1],
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--count", type=int, default=500)
+    args = parser.parse_args()
+
+    counter = CommandCounter()
+    client = AsyncIOMotorClient(os.environ["MONGO_URL"], event_listeners=[counter])
+    collection = client[os.environ["DB_NAME"] + "_bench"].contacts
+    try:
+        await collection.drop()
+        for label, read_your_writes in [("read_your_writes", True), ("echo model", False)]:
+            result = await run(collection, counter, read_your_writes, args.count)
+            print(
+                f"{label:>16}: {result['round_trips_per_create']:.2f} round trips/create, "
+                f"p50 {result['p50_ms']:.2f} ms, p95 {result['p95_ms']:.2f} ms"
+            )
+        await collection.drop()
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
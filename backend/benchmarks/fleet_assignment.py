@@ -0,0 +1,43 @@
+"""Microbenchmark of fleet vehicle assignment on a busy arrival day.
+
+No database needed. Usage (from the backend directory):
+    python -m benchmarks.fleet_assignment [--arrivals 3000] [--fleet-size 150]
+"""
+import argparse
+import random
+import time
+from datetime import date, time as time_of_day
+
+from fleet import FleetScheduler, service_window, DRIVE_MINUTES
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--arrivals", type=int, default=3000)
+    parser.add_argument("--fleet-size", type=int, default=150)
+    args = parser.parse_args()
+
+    scheduler = FleetScheduler()
+    scheduler.set_fleet([{"type": "SUV", "capacity": 6, "fleet_size": args.fleet_size}])
+    destinations = list(DRIVE_MINUTES)
+    day = date(2025, 7, 1)
+
+    assigned = 0
+    timings = []
+    for _ in range(args.arrivals):
+        arrival = time_of_day(random.randint(0, 23), random.randint(0, 59))
+        start, end = service_window(day, arrival, random.choice(destinations))
+        started = time.perf_counter()
+        unit = scheduler.best_fit("SUV", start, end)
+        if unit is not None:
+            scheduler.add_local([unit], start, end, assigned)
+            assigned += 1
+        timings.append((time.perf_counter() - started) * 1000)
+
+    timings.sort()
+    print(f"{args.arrivals} arrivals, {args.fleet_size} vehicles, {assigned} assigned")
+    print(f"  p50 {timings[len(timings) // 2]:.3f} ms, p99 {timings[int(len(timings) * 0.99)]:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
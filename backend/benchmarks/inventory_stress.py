@@ -0,0 +1,51 @@
+"""Concurrency stress test for tour seat reservations.
+
+Fires many simultaneous reservations at one tour-day and checks that the
+seats sold never exceed capacity. Run against a disposable MongoDB:
+    python -m benchmarks.inventory_stress [--requests 500] [--capacity 20]
+"""
+import argparse
+import asyncio
+import random
+import sys
+from datetime import date
+
+from bson import ObjectId
+
+import database
+from inventory import reserve_seats
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--capacity", type=int, default=20)
+    parser.add_argument("--max-guests", type=int, default=4)
+    args = parser.parse_args()
+
+    tour_id = str(ObjectId())
+    day = date.today()
+    party_sizes = [random.randint(1, args.max_guests) for _ in range(args.requests)]
+
+    try:
+        results = await asyncio.gather(*[
+            reserve_seats(tour_id, day, guests, args.capacity) for guests in party_sizes
+        ])
+        sold = sum(guests for guests, accepted in zip(party_sizes, results) if accepted)
+        counter = await database.inventory_collection.find_one({"tour_id": tour_id})
+        booked = counter["booked"] if counter else 0
+
+        print(f"{args.requests} concurrent reservations, capacity {args.capacity}")
+        print(f"  accepted: {sum(results)}, seats sold: {sold}, counter: {booked}")
+        if sold > args.capacity or booked != sold:
+            print("  FAILED: inventory oversold or counter out of step")
+            return 1
+        print("  OK: never oversold")
+        return 0
+    finally:
+        await database.inventory_collection.delete_many({"tour_id": tour_id})
+        database.close_client()
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
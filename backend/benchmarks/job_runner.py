@@ -0,0 +1,145 @@
+"""Run booking confirmation jobs end to end against a local SMTP stand-in.
+
+Starts a minimal SMTP server in-process that accepts every message, except
+that it answers a share of them with a transient 451 so retries get exercised.
+It then queues one confirmation job per booking and reports throughput,
+retries, and whether every guest got exactly one mail.
+
+By default MongoDB is replaced by mongomock-motor; pass --mongo real to use
+MONGO_URL (a disposable database).
+
+Usage (from the backend directory):
+    python -m benchmarks.job_runner [--jobs 500] [--concurrency 8] [--transient-failures 0.1]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import random
+import time
+from collections import Counter
+
+from benchmarks.load_test import _use_mongomock
+
+
+class SMTPStandIn:
+    """Just enough of SMTP for smtplib: HELO/EHLO, MAIL, RCPT, DATA, RSET, NOOP, QUIT"""
+
+    def __init__(self, transient_failures: float):
+        self.transient_failures = transient_failures
+        self.delivered = Counter()
+        self.deferred = 0
+        self.server = None
+
+    async def start(self) -> int:
+        self.server = await asyncio.start_server(self._session, "127.0.0.1", 0)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def _session(self, reader, writer):
+        def reply(line: str):
+            writer.write(f"{line}\r\n".encode())
+
+        reply("220 stand-in ESMTP")
+        recipients = []
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            command = line.decode().strip()
+            verb = command[:4].upper()
+            if verb in ("HELO", "EHLO"):
+                reply("250 stand-in")
+            elif verb == "MAIL":
+                recipients = []
+                reply("250 OK")
+            elif verb == "RCPT":
+                recipients.append(command.split(":", 1)[1].strip(" <>"))
+                reply("250 OK")
+            elif verb == "DATA":
+                reply("354 End data with <CR><LF>.<CR><LF>")
+                while (await reader.readline()) not in (b".\r\n", b""):
+                    pass
+                if random.random() < self.transient_failures:
+                    self.deferred += 1
+                    reply("451 Try again later")
+                else:
+                    self.delivered.update(recipients)
+                    reply("250 Queued")
+            elif verb == "QUIT":
+                reply("221 Bye")
+                await writer.drain()
+                break
+            else:  # RSET, NOOP
+                reply("250 OK")
+            await writer.drain()
+        writer.close()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--mongo", choices=["mock", "real"], default="mock")
+    parser.add_argument("--jobs", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--transient-failures", type=float, default=0.1, help="share of mails answered 451")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    args = parser.parse_args()
+
+    smtp = SMTPStandIn(args.transient_failures)
+    os.environ["SMTP_HOST"] = "127.0.0.1"
+    os.environ["SMTP_PORT"] = str(await smtp.start())
+    if args.mongo == "mock":
+        _use_mongomock()
+
+    import jobs
+    from database import bookings_collection, tours_collection
+
+    logging.getLogger("jobs").setLevel(logging.ERROR)
+
+    # Retry at once instead of after minutes, so the run measures the runner
+    jobs.RETRY_SECONDS = 0.01
+    runner = jobs.JobRunner(jobs.jobs_collection, periodic={}, concurrency=args.concurrency,
+                            poll_interval=0.05, max_attempts=10)
+    await jobs.jobs_collection.delete_many({"type": jobs.BOOKING_CONFIRMATION})
+
+    tour_id = (await tours_collection.insert_one({"title": "Job Runner Tour", "price": 50.0})).inserted_id
+    bookings = [{
+        "tour_id": str(tour_id), "customer_name": f"Guest {number}", "email": f"guest{number}@example.com",
+        "phone": "+255 777 000 000", "booking_date": "2030-01-01", "guests": 2, "status": "pending",
+    } for number in range(args.jobs)]
+    inserted = await bookings_collection.insert_many(bookings)
+    try:
+        started = time.perf_counter()
+        await runner.enqueue_many(jobs.BOOKING_CONFIRMATION, [
+            {"booking_id": str(booking_id)} for booking_id in inserted.inserted_ids
+        ])
+        await runner.start()
+        deadline = started + args.timeout
+        while time.perf_counter() < deadline:
+            open_jobs = await jobs.jobs_collection.count_documents(
+                {"type": jobs.BOOKING_CONFIRMATION, "status": {"$in": [jobs.QUEUED, jobs.RUNNING]}}
+            )
+            if not open_jobs:
+                break
+            await asyncio.sleep(0.05)
+        elapsed = time.perf_counter() - started
+        await runner.stop()
+
+        stats = runner.stats()
+        duplicates = sum(1 for count in smtp.delivered.values() if count > 1)
+        missing = args.jobs - len(smtp.delivered)
+        print(f"{stats['succeeded']} jobs done in {elapsed:.2f}s ({stats['succeeded'] / elapsed:.0f} jobs/s), "
+              f"{stats['retried']} retries after {smtp.deferred} deferred mails, {stats['failed']} failed")
+        print(f"guests mailed {len(smtp.delivered)}/{args.jobs}, missing {missing}, mailed twice {duplicates}")
+    finally:
+        await runner.stop()
+        await bookings_collection.delete_many({"_id": {"$in": inserted.inserted_ids}})
+        await tours_collection.delete_one({"_id": tour_id})
+        await smtp.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,227 @@
+"""Load test of every API router against a stored baseline.
+
+Boots the FastAPI app in-process, seeds realistic volumes and drives
+concurrent traffic at each scenario, reporting requests per second and
+p50/p95/p99 latency. A scenario that is slower than the baseline by more than
+the tolerance fails the run (exit status 1).
+
+By default MongoDB is replaced by mongomock-motor, so the numbers measure the
+application itself and are comparable between runs on the same machine.
+Pass --mongo real to use MONGO_URL instead (use a disposable database).
+
+Usage (from the backend directory):
+    python -m benchmarks.load_test [--requests 300] [--concurrency 20] [--only tours]
+    python -m benchmarks.load_test --update-baseline
+"""
+import argparse
+import asyncio
+import gc
+import json
+import logging
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+BASELINE_PATH = Path(__file__).parent / "baseline.json"
+
+CONTACT = {
+    "name": "Load Test Guest",
+    "email": "guest@example.com",
+    "phone": "+255 777 000 000",
+    "subject": "Availability",
+    "message": "Do you have space for four guests next Friday?",
+}
+
+
+def _use_mongomock():
+    try:
+        import motor.motor_asyncio
+        from mongomock_motor import AsyncMongoMockClient
+    except ImportError:
+        sys.exit("mongomock-motor is not installed: pip install mongomock-motor, or pass --mongo real")
+    motor.motor_asyncio.AsyncIOMotorClient = AsyncMongoMockClient
+    os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+    os.environ.setdefault("DB_NAME", "load_test")
+
+
+def _future_day() -> str:
+    return (date.today() + timedelta(days=random.randint(1, 365))).isoformat()
+
+
+def build_scenarios(tour_ids, booking_ids):
+    """(router, name, method, path factory, body factory, accepted statuses)"""
+    booked = {200, 201, 409}  # full tour days and busy fleets are valid answers
+    return [
+        ("tours", "list", "GET", lambda: "/api/tours/?limit=50", None, {200}),
+        ("tours", "by id", "GET", lambda: f"/api/tours/{random.choice(tour_ids)}", None, {200}),
+        ("tours", "by category", "GET", lambda: "/api/tours/category/water", None, {200}),
+        ("tours", "search", "GET", lambda: "/api/tours/search?q=" + random.choice(["snork", "spice far", "beach"]),
+         None, {200}),
+        ("tours", "availability", "GET", lambda: f"/api/tours/{random.choice(tour_ids)}/availability", None, {200}),
+        ("tours", "create booking", "POST", lambda: "/api/tours/bookings", lambda: {
+            **CONTACT, "customer_name": CONTACT["name"], "tour_id": random.choice(tour_ids),
+            "booking_date": _future_day(), "guests": random.randint(1, 4),
+        }, booked),
+        ("tours", "booking by id", "GET", lambda: f"/api/tours/bookings/{random.choice(booking_ids)}", None, {200}),
+        ("transfers", "vehicles", "GET", lambda: "/api/transfers/vehicles", None, {200}),
+        ("transfers", "quote", "POST", lambda: "/api/transfers/quote", lambda: {
+            "arrival_date": _future_day(), "arrival_time": "14:30",
+            "passengers": random.randint(1, 20), "destination": "Nungwi",
+        }, {200, 409}),
+        ("transfers", "create booking", "POST", lambda: "/api/transfers/bookings", lambda: {
+            **CONTACT, "customer_name": CONTACT["name"], "flight_number": "TK 605",
+            "arrival_date": _future_day(), "arrival_time": f"{random.randint(6, 22):02d}:00",
+            "passengers": random.randint(1, 4), "vehicle_type": "SUV", "destination": "Paje",
+        }, booked),
+        ("transfers", "list bookings", "GET", lambda: "/api/transfers/bookings?limit=100", None, {200}),
+        ("contact", "create", "POST", lambda: "/api/contact/", lambda: {
+            **CONTACT, "message": f"Inquiry {random.random()}",  # identical bodies would be replayed
+        }, {202}),
+        ("contact", "list", "GET", lambda: "/api/contact/?limit=100", None, {200}),
+        ("gallery", "grouped", "GET", lambda: "/api/gallery/", None, {200}),
+        ("gallery", "by category", "GET", lambda: "/api/gallery/category/beaches", None, {200}),
+        ("gallery", "images", "GET", lambda: "/api/gallery/images?limit=50", None, {200}),
+    ]
+
+
+async def seed(tours: int, bookings: int, contacts: int):
+    """Sample data plus synthetic tours, bookings and contacts"""
+    import database
+    from models import Contact, mongo_document
+    from seed import seed_collection, synthetic_tours, synthetic_bookings
+
+    await database.init_database()
+    await seed_collection(database.tours_collection, synthetic_tours(tours), "title")
+    tour_ids = [str(tour["_id"]) async for tour in database.tours_collection.find({}, {"_id": 1})]
+    await seed_collection(database.bookings_collection, synthetic_bookings(bookings, tour_ids))
+    await seed_collection(
+        database.contacts_collection,
+        (mongo_document(Contact(**CONTACT)) for _ in range(contacts)),
+    )
+    booking_ids = [str(booking["_id"]) async for booking in database.bookings_collection.find({}, {"_id": 1}).limit(1000)]
+    database.catalog_cache.invalidate()
+    return tour_ids, booking_ids
+
+
+def percentile(ordered, fraction: float) -> float:
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+async def run_scenario(http, scenario, requests: int, concurrency: int) -> dict:
+    _, _, method, path, body, accepted = scenario
+    latencies, failures = [], 0
+    remaining = iter(range(requests))
+
+    async def worker():
+        nonlocal failures
+        for _ in remaining:
+            started = time.perf_counter()
+            response = await http.request(method, path(), json=body() if body else None)
+            latencies.append((time.perf_counter() - started) * 1000)
+            if response.status_code not in accepted:
+                failures += 1
+
+    # Warm caches and connections, then start from a clean heap so a
+    # collection pause left over from the previous scenario isn't measured here
+    for _ in range(concurrency):
+        await http.request(method, path(), json=body() if body else None)
+    gc.collect()
+
+    started = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "rps": round(requests / elapsed, 1),
+        "p50": round(percentile(latencies, 0.50), 2),
+        "p95": round(percentile(latencies, 0.95), 2),
+        "p99": round(percentile(latencies, 0.99), 2),
+        "failures": failures,
+    }
+
+
+def regressions(result: dict, baseline: dict, tolerance: float):
+    """Ways a result is worse than its baseline by more than the tolerance.
+
+    Only throughput and p95 are gated; p99 over a few hundred requests is a
+    handful of samples and too noisy to fail a run on.
+    """
+    found = []
+    if result["failures"]:
+        found.append(f"{result['failures']} failed requests")
+    if not baseline:
+        return found
+    if result["rps"] < baseline["rps"] * (1 - tolerance):
+        found.append(f"rps {result['rps']} < baseline {baseline['rps']}")
+    if result["p95"] > baseline["p95"] * (1 + tolerance):
+        found.append(f"p95 {result['p95']} ms > baseline {baseline['p95']} ms")
+    return found
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mongo", choices=["mock", "real"], default="mock")
+    parser.add_argument("--requests", type=int, default=300, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--tours", type=int, default=200, help="synthetic tours to seed")
+    parser.add_argument("--bookings", type=int, default=5000, help="synthetic bookings to seed")
+    parser.add_argument("--contacts", type=int, default=2000, help="synthetic contacts to seed")
+    parser.add_argument("--only", action="append", default=[], help="router to run, may be repeated")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="allowed slowdown, 0.5 = 50%%")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--seed", type=int, default=42, help="random seed for request mixes")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    # All traffic comes from one address, which the per-client limits would throttle
+    os.environ["RATE_LIMIT_ENABLED"] = "false"
+    # Requests only queue their side effects; running them is not part of the test
+    os.environ["JOB_RUNNER_ENABLED"] = "false"
+    if args.mongo == "mock":
+        # mongomock has no change streams
+        os.environ["CACHE_COHERENCE_ENABLED"] = "false"
+        _use_mongomock()
+
+    import httpx
+    import database
+    import server
+
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    tour_ids, booking_ids = await seed(args.tours, args.bookings, args.contacts)
+    gc.collect()
+    gc.freeze()  # seeded data stays alive for the whole run
+    baseline = json.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+
+    results, failed = {}, False
+    transport = httpx.ASGITransport(app=server.app)
+    async with server.lifespan(server.app), \
+            httpx.AsyncClient(transport=transport, base_url="http://load-test") as http:
+        print(f"{'scenario':<30} {'rps':>8} {'p50':>8} {'p95':>8} {'p99':>8}")
+        for scenario in build_scenarios(tour_ids, booking_ids):
+            router, name = scenario[0], scenario[1]
+            if args.only and router not in args.only:
+                continue
+            key = f"{router}: {name}"
+            result = results[key] = await run_scenario(http, scenario, args.requests, args.concurrency)
+            problems = [] if args.update_baseline else regressions(result, baseline.get(key), args.tolerance)
+            failed = failed or bool(problems)
+            print(f"{key:<30} {result['rps']:>8} {result['p50']:>8} {result['p95']:>8} {result['p99']:>8}"
+                  + ("  REGRESSION: " + "; ".join(problems) if problems else ""))
+
+    if args.update_baseline:
+        baseline.update({key: {k: v for k, v in result.items() if k != "failures"} for key, result in results.items()})
+        args.baseline.write_text(json.dumps(baseline, indent=2, sort_keys=True) + "\n")
+        print(f"baseline written to {args.baseline}")
+        return 0
+    if not baseline:
+        print(f"no baseline at {args.baseline}; run with --update-baseline to record one")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,76 @@
+"""Microbenchmark of the list read path: Pydantic models versus lean documents.
+
+No database needed; documents are generated in the shape MongoDB returns.
+Usage (from the backend directory):
+    python -m benchmarks.serialization [--documents 1000] [--rounds 50]
+"""
+import argparse
+import asyncio
+import time
+from datetime import datetime
+from typing import List
+
+from bson import ObjectId
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from models import Tour
+from serialization import dumps, lean_documents
+
+
+def make_documents(count):
+    now = datetime.utcnow().replace(microsecond=0)
+    return [
+        {
+            "_id": ObjectId(),
+            "title": f"Tour {i}",
+            "description": "Enjoy a magical boat ride as you spot playful dolphins and snorkel.",
+            "image": "https://images.unsplash.com/photo-1597799119438-cbf326f268b9",
+            "price": 85.0,
+            "duration": "Full Day",
+            "category": "water",
+            "features": ["Dolphin watching", "Snorkeling equipment", "Lunch included"],
+            "created_at": now,
+            "updated_at": now,
+        }
+        for i in range(count)
+    ]
+
+
+async def model_path(documents, field):
+    # What the routes did before: build models, then FastAPI validates and serializes them again
+    tours = [Tour(**document) for document in documents]
+    content = await serialize_response(field=field, response_content=tours)
+    return JSONResponse(content).body
+
+
+async def lean_path(documents, field):
+    return dumps(lean_documents(documents, Tour))
+
+
+async def measure(path, documents, field, rounds):
+    started = time.perf_counter()
+    for _ in range(rounds):
+        await path([dict(document) for document in documents], field)
+    return (time.perf_counter() - started) / rounds * 1000
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--documents", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=50)
+    args = parser.parse_args()
+
+    documents = make_documents(args.documents)
+    field = create_response_field(name="Response_get_tours", type_=List[Tour])
+
+    model_ms = await measure(model_path, documents, field, args.rounds)
+    lean_ms = await measure(lean_path, documents, field, args.rounds)
+    print(f"{args.documents} tours per response")
+    print(f"  models.py path: {model_ms:.2f} ms")
+    print(f"  lean path:      {lean_ms:.2f} ms ({model_ms / lean_ms:.1f}x faster)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
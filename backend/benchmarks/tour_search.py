@@ -0,0 +1,58 @@
+"""Microbenchmark of tour search queries against the in-memory index.
+
+No database needed. Usage (from the backend directory):
+    python -m benchmarks.tour_search [--tours 2000] [--queries 5000]
+"""
+import argparse
+import random
+import time
+
+from bson import ObjectId
+
+from search import TourSearchIndex
+
+WORDS = [
+    "snorkeling", "dolphin", "spice", "farm", "stone", "town", "beach", "sunset",
+    "cruise", "dhow", "forest", "monkey", "turtle", "island", "reef", "safari",
+    "lunch", "guide", "diving", "kayak", "village", "history", "market", "sandbank",
+]
+QUERIES = ["snork", "dolphin tour", "spcie farm", "stone town", "sunset dhow", "reef diving", "x"]
+
+
+def synthetic_tour(number: int) -> dict:
+    return {
+        "_id": ObjectId(),
+        "title": " ".join(random.sample(WORDS, 3)).title() + f" {number}",
+        "description": " ".join(random.choices(WORDS, k=30)),
+        "features": random.sample(WORDS, 4),
+        "category": random.choice(["water", "cultural", "nature", "safari"]),
+        "duration": random.choice(["2 Hours", "3 Hours", "Half Day", "Full Day"]),
+        "price": float(random.randint(20, 400)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tours", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=5000)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    index = TourSearchIndex(synthetic_tour(i) for i in range(args.tours))
+    print(f"indexed {args.tours} tours in {(time.perf_counter() - started) * 1000:.1f} ms")
+
+    timings = []
+    for _ in range(args.queries):
+        query = random.choice(QUERIES)
+        filters = {"category": random.choice([None, "water"])}
+        started = time.perf_counter()
+        index.search(query, filters)
+        timings.append((time.perf_counter() - started) * 1000)
+
+    timings.sort()
+    print(f"{args.queries} queries: p50 {timings[len(timings) // 2]:.3f} ms, "
+          f"p99 {timings[int(len(timings) * 0.99)]:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+
+# Catalog namespaces served from memory
+TOURS = "tours"
+VEHICLES = "vehicles"
+GALLERY = "gallery"
+
+DEFAULT_TTL = float(os.environ.get("CATALOG_CACHE_TTL", "300"))
+# Keys include client-supplied filters and cursors, so the cache must be bounded
+DEFAULT_MAX_ENTRIES = int(os.environ.get("CATALOG_CACHE_MAX_ENTRIES", "1000"))
+
+
+class CatalogCache:
+    """In-process read-through cache for catalog data (tours, vehicles, gallery).
+
+    Holds at most ``max_entries`` values and evicts the least recently used
+    one beyond that. Load locks exist only while a load is running.
+    """
+
+    def __init__(self, ttl: float = DEFAULT_TTL, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, Hashable], Tuple[float, Any]]" = OrderedDict()
+        self._locks: Dict[Tuple[str, Hashable], asyncio.Lock] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _lookup(self, entry_key):
+        entry = self._entries.get(entry_key)
+        if entry is None:
+            return False, None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            self._entries.pop(entry_key, None)
+            return False, None
+        self._entries.move_to_end(entry_key)
+        return True, value
+
+    def _store(self, entry_key, value) -> None:
+        self._entries[entry_key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(entry_key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def get_or_load(
+        self,
+        namespace: str,
+        key: Hashable,
+        loader: Callable[[], Awaitable[Any]],
+    ) -> Any:
+        """Return the cached value, loading it once on a miss.
+
+        Concurrent misses for the same key share one loader call so a cold
+        cache doesn't send a burst of identical queries to MongoDB. ``None``
+        results are not cached.
+        """
+        entry_key = (namespace, key)
+        found, value = self._lookup(entry_key)
+        if found:
+            self.hits += 1
+            return value
+
+        lock = self._locks.setdefault(entry_key, asyncio.Lock())
+        async with lock:
+            found, value = self._lookup(entry_key)
+            if found:
+                self.hits += 1
+                return value
+
+            self.misses += 1
+            try:
+                value = await loader()
+            finally:
+                # Requests already waiting hold the lock object; later ones find the value
+                if self._locks.get(entry_key) is lock:
+                    del self._locks[entry_key]
+            if value is not None:
+                self._store(entry_key, value)
+            return value
+
+    def invalidate(self, *namespaces: str) -> None:
+        """Drop cached entries for the given namespaces (all when none given)"""
+        if not namespaces:
+            self._entries.clear()
+            self._locks.clear()
+            return
+        for entry_key in list(self._entries):
+            if entry_key[0] in namespaces:
+                self._entries.pop(entry_key, None)
+
+    def stats(self) -> dict:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses,
+                "evictions": self.evictions}
+
+
+catalog_cache = CatalogCache()
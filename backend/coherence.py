@@ -0,0 +1,220 @@
+"""Keeps every worker's catalog cache coherent with MongoDB change streams.
+
+Each uvicorn worker caches tours, vehicles and gallery data in memory. A write
+from another worker, ``/init-db`` or a script would otherwise only show up once
+the cache TTL ran out. The listener watches the catalog collections and drops
+the matching cache namespace (entries, search index and ETag version) as soon
+as a change event arrives, so the cache can keep entries for COHERENT_CACHE_TTL
+while the stream is live. Gallery changes also rebuild the grouped gallery
+view, once per burst of writes.
+
+Change streams need a replica set. On a standalone server the listener logs
+once and the cache keeps its normal, short TTL. To try it locally, run a
+single-node replica set::
+
+    mongod --replSet rs0 --dbpath /tmp/rs0 && mongosh --eval "rs.initiate()"
+
+and point MONGO_URL at it (see ``python -m benchmarks.cache_coherence``).
+"""
+import asyncio
+import logging
+import os
+import time
+from typing import Dict, Optional
+
+from pymongo.errors import OperationFailure
+
+from cache import catalog_cache, TOURS, VEHICLES, GALLERY, DEFAULT_TTL
+from database import db, catalog_db
+from views import refresh_gallery_view, GALLERY_VIEW
+
+logger = logging.getLogger(__name__)
+
+CACHE_COHERENCE_ENABLED = os.environ.get("CACHE_COHERENCE_ENABLED", "true").lower() == "true"
+# Cache TTL while the change stream is live; falls back to CATALOG_CACHE_TTL when it isn't
+COHERENT_CACHE_TTL = float(os.environ.get("COHERENT_CACHE_TTL", "3600"))
+# How long one getMore waits for events before the resume token is advanced
+MAX_AWAIT_MS = 1000
+# Gallery writes arriving within this window share one rebuild of the gallery view
+VIEW_REFRESH_DELAY_SECONDS = float(os.environ.get("GALLERY_VIEW_REFRESH_DELAY_MS", "2000")) / 1000
+
+# Collection -> cache namespace it feeds
+WATCHED: Dict[str, str] = {
+    "tours": TOURS,
+    "vehicles": VEHICLES,
+    "gallery": GALLERY,
+    GALLERY_VIEW: GALLERY,
+}
+
+# Delay before reopening a failed stream, doubled up to the max
+RETRY_SECONDS = 0.5
+MAX_RETRY_SECONDS = 30.0
+
+# Server errors meaning change streams will never work on this deployment
+CHANGE_STREAMS_UNSUPPORTED = {40573}  # "only supported on replica sets"
+# The resume token fell off the oplog; events were missed and can't be replayed
+CHANGE_STREAM_HISTORY_LOST = {136, 280, 286}
+
+# Listener states
+DISABLED = "disabled"
+STARTING = "starting"
+LIVE = "live"
+RECONNECTING = "reconnecting"
+UNSUPPORTED = "unsupported"
+
+
+class CacheCoherenceListener:
+    """Invalidates catalog cache namespaces on change events from MongoDB.
+
+    The last resume token is kept, so a reopened stream replays everything
+    that happened while it was down. Whenever events may have been missed
+    (first open, lost history, stopped listener) every namespace is dropped
+    and the cache falls back to its short TTL until the stream is live again.
+    """
+
+    def __init__(self, database, cache=catalog_cache, watched: Dict[str, str] = WATCHED,
+                 coherent_ttl: float = COHERENT_CACHE_TTL, view_database=db,
+                 view_refresh_delay: float = VIEW_REFRESH_DELAY_SECONDS):
+        self.database = database
+        self.cache = cache
+        self.watched = watched
+        self.coherent_ttl = coherent_ttl
+        # The view is rebuilt with $out, which has to run on the primary
+        self.view_database = view_database
+        self.view_refresh_delay = view_refresh_delay
+        self.state = DISABLED
+        self._resume_token: Optional[dict] = None
+        self._task: Optional[asyncio.Task] = None
+        self._view_refresh: Optional[asyncio.Task] = None
+        # An older rebuild finishing last would swap in a stale view
+        self._view_lock = asyncio.Lock()
+
+        self.events = 0
+        self.invalidations = 0
+        self.reconnects = 0
+        self.view_refreshes = 0
+        self.last_event_at: Optional[float] = None
+
+    def _pipeline(self) -> list:
+        return [{"$match": {"ns.coll": {"$in": list(self.watched)}}}]
+
+    def _live(self) -> None:
+        self.state = LIVE
+        self.cache.ttl = self.coherent_ttl
+
+    def _stale(self, state: str) -> None:
+        """Events may be missed from here on: forget everything and use the short TTL"""
+        self.state = state
+        self.cache.ttl = DEFAULT_TTL
+        self.cache.invalidate(*set(self.watched.values()))
+        self.invalidations += 1
+
+    def apply(self, change: dict) -> None:
+        """Drop the cache namespace a change event belongs to"""
+        self.events += 1
+        self.last_event_at = time.monotonic()
+        collection_name = change.get("ns", {}).get("coll")
+        namespace = self.watched.get(collection_name)
+        if namespace is None:
+            # dropDatabase and similar events carry no watched collection
+            self.cache.invalidate(*set(self.watched.values()))
+        else:
+            self.cache.invalidate(namespace)
+        self.invalidations += 1
+        # Not for events on the view itself, which the rebuild causes
+        if collection_name == "gallery":
+            self.schedule_view_refresh()
+
+    def schedule_view_refresh(self) -> None:
+        """Rebuild the gallery view after the delay, unless a rebuild is already waiting"""
+        if self._view_refresh is None or self._view_refresh.done():
+            self._view_refresh = asyncio.create_task(self._refresh_view())
+
+    async def _refresh_view(self) -> None:
+        await asyncio.sleep(self.view_refresh_delay)
+        # Writes from here on schedule the next rebuild
+        self._view_refresh = None
+        try:
+            async with self._view_lock:
+                await refresh_gallery_view(self.view_database)
+            self.view_refreshes += 1
+        except Exception as e:
+            logger.error(f"Refreshing the {GALLERY_VIEW} view failed: {str(e)}")
+
+    async def start(self) -> None:
+        if self._task is not None or not CACHE_COHERENCE_ENABLED:
+            return
+        self.state = STARTING
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        if self._view_refresh is not None:
+            self._view_refresh.cancel()
+            self._view_refresh = None
+        self._stale(DISABLED)
+
+    async def _watch(self) -> None:
+        async with self.database.watch(
+            self._pipeline(), start_after=self._resume_token, max_await_time_ms=MAX_AWAIT_MS
+        ) as stream:
+            if self._resume_token is None:
+                # Anything cached before the stream opened may already be stale
+                self._stale(STARTING)
+            self._live()
+            while stream.alive:
+                change = await stream.try_next()
+                if change is not None:
+                    self.apply(change)
+                # Advances on quiet streams too, so a reopen doesn't replay old events
+                self._resume_token = stream.resume_token
+
+    async def _run(self) -> None:
+        delay = RETRY_SECONDS
+        while True:
+            try:
+                await self._watch()
+                # A dropped or renamed collection ends the stream; reopen after the event
+                delay = RETRY_SECONDS
+                continue
+            except asyncio.CancelledError:
+                raise
+            except OperationFailure as e:
+                if e.code in CHANGE_STREAMS_UNSUPPORTED:
+                    logger.warning(f"Change streams unavailable, catalog cache relies on its TTL: {str(e)}")
+                    self._stale(UNSUPPORTED)
+                    return
+                if e.code in CHANGE_STREAM_HISTORY_LOST:
+                    logger.warning(f"Change stream history lost, restarting from now: {str(e)}")
+                    self._resume_token = None
+                error = e
+            except Exception as e:
+                error = e
+            self.reconnects += 1
+            if self.state == LIVE:
+                self._stale(RECONNECTING)
+            logger.error(f"Catalog change stream failed, reopening in {delay:.1f}s: {str(error)}")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, MAX_RETRY_SECONDS)
+
+    def stats(self) -> dict:
+        since_event = time.monotonic() - self.last_event_at if self.last_event_at else None
+        return {
+            "state": self.state,
+            "cache_ttl": self.cache.ttl,
+            "events": self.events,
+            "invalidations": self.invalidations,
+            "reconnects": self.reconnects,
+            "view_refreshes": self.view_refreshes,
+            "seconds_since_event": round(since_event, 1) if since_event is not None else None,
+        }
+
+
+cache_listener = CacheCoherenceListener(catalog_db)
@@ -1,34 +1,184 @@
 import os
 from pathlib import Path
 from dotenv import load_dotenv
+from bson import ObjectId
 from motor.motor_asyncio import AsyncIOMotorClient
-from models import Tour, Vehicle, GalleryImage
-import asyncio
+from pymongo import monitoring
+from pymongo.errors import BulkWriteError
+from pymongo.read_preferences import read_pref_mode_from_name, make_read_preference
+from models import Tour, Vehicle, GalleryImage, mongo_document
+from cache import catalog_cache, TOURS, VEHICLES, GALLERY
+from metrics import command_metrics, pool_wait_metrics
+from seed import seed_collections, backfill_fields, NATURAL_KEYS
+from views import refresh_gallery_view, GALLERY_VIEW
 
 # Load environment variables
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
+# Connection pool settings, sized per uvicorn worker
+MAX_POOL_SIZE = int(os.environ.get("MONGO_MAX_POOL_SIZE", "100"))
+MIN_POOL_SIZE = int(os.environ.get("MONGO_MIN_POOL_SIZE", "0"))
+WAIT_QUEUE_TIMEOUT_MS = int(os.environ.get("MONGO_WAIT_QUEUE_TIMEOUT_MS", "5000"))
+SERVER_SELECTION_TIMEOUT_MS = int(os.environ.get("MONGO_SERVER_SELECTION_TIMEOUT_MS", "10000"))
+# Catalog reads (tours, vehicles, gallery) can be served by secondaries
+CATALOG_READ_PREFERENCE = os.environ.get("MONGO_CATALOG_READ_PREFERENCE", "secondaryPreferred")
+
+
+class PoolStats(monitoring.ConnectionPoolListener):
+    """Connection pool counters collected from pymongo pool events"""
+
+    def __init__(self):
+        self.open = 0
+        self.checked_out = 0
+        self.waiting = 0
+        self.checkout_failures = 0
+        self.pools_cleared = 0
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        self.pools_cleared += 1
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        self.open += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self.open -= 1
+
+    def connection_check_out_started(self, event):
+        self.waiting += 1
+
+    def connection_check_out_failed(self, event):
+        self.waiting -= 1
+        self.checkout_failures += 1
+
+    def connection_checked_out(self, event):
+        self.waiting -= 1
+        self.checked_out += 1
+
+    def connection_checked_in(self, event):
+        self.checked_out -= 1
+
+    def snapshot(self) -> dict:
+        return {
+            "max_pool_size": MAX_POOL_SIZE,
+            "min_pool_size": MIN_POOL_SIZE,
+            "open_connections": self.open,
+            "checked_out": self.checked_out,
+            "waiting": self.waiting,
+            "checkout_failures": self.checkout_failures,
+            "pools_cleared": self.pools_cleared,
+        }
+
+
+pool_stats = PoolStats()
+
+
+def create_client() -> AsyncIOMotorClient:
+    """Create the Motor client shared by the whole worker"""
+    return AsyncIOMotorClient(
+        os.environ['MONGO_URL'],
+        maxPoolSize=MAX_POOL_SIZE,
+        minPoolSize=MIN_POOL_SIZE,
+        waitQueueTimeoutMS=WAIT_QUEUE_TIMEOUT_MS,
+        serverSelectionTimeoutMS=SERVER_SELECTION_TIMEOUT_MS,
+        event_listeners=[pool_stats, command_metrics, pool_wait_metrics],
+    )
+
+
 # Database connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+client = create_client()
 db = client[os.environ['DB_NAME']]
+catalog_db = client.get_database(
+    os.environ['DB_NAME'],
+    read_preference=make_read_preference(read_pref_mode_from_name(CATALOG_READ_PREFERENCE), None),
+)
 
 # Collections
-tours_collection = db.tours
+tours_collection = catalog_db.tours
 bookings_collection = db.bookings
 contacts_collection = db.contacts
 transfers_collection = db.transfer_bookings
-vehicles_collection = db.vehicles
-gallery_collection = db.gallery
+vehicles_collection = catalog_db.vehicles
+gallery_collection = catalog_db.gallery
+# Per-tour, per-day seat counters
+inventory_collection = db.tour_inventory
+# Service windows reserved per vehicle unit
+fleet_schedule_collection = db.fleet_schedule
+
+
+def close_client():
+    client.close()
+
+# Re-read created documents from MongoDB instead of echoing the inserted model
+READ_YOUR_WRITES = os.environ.get("READ_YOUR_WRITES", "false").lower() == "true"
+
+
+def _document(model, keep_id: bool) -> dict:
+    document = mongo_document(model)
+    if keep_id:
+        document["_id"] = ObjectId(model.id)
+    return document
+
+
+async def insert_model(collection, model, keep_id: bool = False):
+    """Insert a validated model and return it with its new id.
+
+    The response is built from the model itself, saving the find_one round
+    trip. With READ_YOUR_WRITES enabled the stored copy is read back instead.
+    With ``keep_id`` the model's own id is written as _id, for callers that
+    referenced the document before writing it.
+    """
+    result = await collection.insert_one(_document(model, keep_id))
+    if READ_YOUR_WRITES:
+        stored = await collection.find_one({"_id": result.inserted_id})
+        return type(model)(**stored)
+
+    model.id = result.inserted_id
+    return model
+
+
+async def insert_models(collection, models, keep_id: bool = False) -> list:
+    """Insert validated models with one unordered insert_many.
+
+    Returns one entry per model: None when it was written (the model then
+    carries its new id) or the server's error message when it was not.
+    ``keep_id`` works as for insert_model.
+    """
+    if not models:
+        return []
+
+    documents = [_document(model, keep_id) for model in models]
+    errors = {}
+    try:
+        await collection.insert_many(documents, ordered=False)
+    except BulkWriteError as e:
+        for error in e.details.get("writeErrors", []):
+            errors[error["index"]] = error.get("errmsg", "Write failed")
+
+    for index, (model, document) in enumerate(zip(models, documents)):
+        if index not in errors:
+            model.id = document["_id"]
+    return [errors.get(index) for index in range(len(models))]
 
 
 async def init_database():
-    """Initialize database with sample data"""
-    
-    # Check if data already exists
-    if await tours_collection.count_documents({}) > 0:
-        return
+    """Initialize database with sample data.
+
+    Every collection is upserted on its natural key, so running this again
+    only fills in whatever is missing.
+    """
     
     # Sample tours data
     tours_data = [
@@ -151,11 +301,6 @@ async def init_database():
         }
     ]
     
-    # Insert tours
-    for tour_data in tours_data:
-        tour = Tour(**tour_data)
-        await tours_collection.insert_one(tour.dict(by_alias=True, exclude={"id"}))
-    
     # Sample vehicles data
     vehicles_data = [
         {
@@ -163,29 +308,27 @@ async def init_database():
             "description": "Comfortable sedan for up to 3 passengers",
             "price": 25.0,
             "features": ["Air Conditioning", "Professional Driver", "Meet & Greet"],
-            "capacity": 3
+            "capacity": 3,
+            "fleet_size": 4
         },
         {
             "type": "SUV",
             "description": "Spacious SUV for up to 6 passengers with luggage",
             "price": 35.0,
             "features": ["Air Conditioning", "Professional Driver", "Meet & Greet", "Extra Luggage Space"],
-            "capacity": 6
+            "capacity": 6,
+            "fleet_size": 3
         },
         {
             "type": "Minivan",
             "description": "Perfect for groups up to 12 passengers",
             "price": 55.0,
             "features": ["Air Conditioning", "Professional Driver", "Meet & Greet", "Group Friendly"],
-            "capacity": 12
+            "capacity": 12,
+            "fleet_size": 2
         }
     ]
     
-    # Insert vehicles
-    for vehicle_data in vehicles_data:
-        vehicle = Vehicle(**vehicle_data)
-        await vehicles_collection.insert_one(vehicle.dict(by_alias=True, exclude={"id"}))
-    
     # Sample gallery images
     gallery_data = [
         {"url": "https://images.unsplash.com/photo-1634646350433-fe03ad698448", "category": "beaches", "title": "Pristine Beach", "alt_text": "Beautiful beach with turquoise water"},
@@ -203,9 +346,25 @@ async def init_database():
         {"url": "https://images.unsplash.com/photo-1666778439853-540bae64fa9f", "category": "wildlife", "title": "Dhow at Sunset", "alt_text": "Dhow sailing at sunset"}
     ]
     
-    # Insert gallery images
-    for image_data in gallery_data:
-        gallery_image = GalleryImage(**image_data)
-        await gallery_collection.insert_one(gallery_image.dict(by_alias=True, exclude={"id"}))
-    
-    print("Database initialized with sample data!")
\ No newline at end of file
+    # Seed the three collections concurrently
+    added = await seed_collections([
+        (tours_collection, (mongo_document(Tour(**data)) for data in tours_data), NATURAL_KEYS["tours"]),
+        (vehicles_collection, (mongo_document(Vehicle(**data)) for data in vehicles_data), NATURAL_KEYS["vehicles"]),
+        (gallery_collection, (mongo_document(GalleryImage(**data)) for data in gallery_data), NATURAL_KEYS["gallery"]),
+    ])
+    tours_added, vehicles_added, gallery_added = added
+
+    # Vehicles seeded before fleet sizes existed would count as one unit each
+    backfilled = await backfill_fields(vehicles_collection, vehicles_data, NATURAL_KEYS["vehicles"], ["fleet_size"])
+
+    # Keep the grouped gallery view in step with the gallery collection
+    if gallery_added or await db[GALLERY_VIEW].count_documents({}) == 0:
+        await refresh_gallery_view(db)
+
+    if not any(added) and not backfilled:
+        return
+
+    # Seed data changes the catalog, drop anything cached before it
+    catalog_cache.invalidate(TOURS, VEHICLES, GALLERY)
+
+    print("Database initialized with sample data!")
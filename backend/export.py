@@ -0,0 +1,284 @@
+"""Streaming exports of tour and transfer bookings to CSV and Parquet.
+
+Documents are read from a Motor cursor EXPORT_BATCH_SIZE at a time and every
+batch is encoded and handed on before the next one is read, so memory use stays
+flat however many rows match. Parquet gets one row group per batch and is
+encoded in a worker thread to keep the event loop free. Parquet needs pyarrow;
+CSV has no extra dependencies.
+
+Serves the /api/admin/exports endpoints and runs from the command line:
+
+    python export.py bookings --start 2025-01-01 --end 2025-12-31 -o bookings.csv
+    python export.py transfers --format parquet -o transfers.parquet
+"""
+import argparse
+import asyncio
+import csv
+import io
+import os
+import sys
+from datetime import date, datetime, time
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet export is optional, CSV covers every client
+    pa = pq = None
+
+from database import bookings_collection, transfers_collection, close_client
+from pagination import date_range, ASCENDING
+
+EXPORT_BATCH_SIZE = int(os.environ.get("EXPORT_BATCH_SIZE", "5000"))
+
+CSV = "csv"
+PARQUET = "parquet"
+FORMATS = [CSV, PARQUET]
+MEDIA_TYPES = {
+    CSV: "text/csv; charset=utf-8",
+    PARQUET: "application/vnd.apache.parquet",
+}
+
+
+class ExportUnavailable(Exception):
+    """The requested format needs an optional dependency that isn't installed"""
+
+
+def _date(value) -> Optional[date]:
+    # Service dates are stored as ISO strings, older documents may hold datetimes
+    if isinstance(value, str):
+        return date.fromisoformat(value[:10])
+    if isinstance(value, datetime):
+        return value.date()
+    return value
+
+
+def _time(value) -> Optional[time]:
+    return time.fromisoformat(value) if isinstance(value, str) else value
+
+
+def _text(value) -> Optional[str]:
+    return None if value is None else str(value)
+
+
+class Column:
+    """One export column: its name, Parquet type and how to read it from a document"""
+
+    def __init__(self, name: str, kind: str, read: Callable[[dict], Any]):
+        self.name = name
+        self.kind = kind
+        self.read = read
+
+
+def _field(name: str, kind: str = "string", convert: Callable[[Any], Any] = _text, source: str = None) -> Column:
+    source = source or name
+    return Column(name, kind, lambda document: convert(document.get(source)))
+
+
+def _allocation(document: dict) -> List[dict]:
+    return document.get("allocation") or []
+
+
+class ExportSpec:
+    """A collection, the field its date range filters on, the fields read and the columns written"""
+
+    def __init__(self, name: str, collection, service_date: str, fields: List[str], columns: List[Column]):
+        self.name = name
+        self.collection = collection
+        self.service_date = service_date
+        self.projection: Dict[str, int] = {field: 1 for field in fields}
+        self.columns = columns
+
+
+BOOKINGS_EXPORT = ExportSpec("bookings", bookings_collection, "booking_date", [
+    "tour_id", "customer_name", "email", "phone", "booking_date", "guests",
+    "special_requests", "status", "created_at",
+], [
+    _field("id", source="_id"),
+    _field("tour_id"),
+    _field("customer_name"),
+    _field("email"),
+    _field("phone"),
+    _field("booking_date", "date", _date),
+    _field("guests", "int", lambda value: value),
+    _field("special_requests"),
+    _field("status"),
+    _field("created_at", "timestamp", lambda value: value),
+])
+
+TRANSFERS_EXPORT = ExportSpec("transfers", transfers_collection, "arrival_date", [
+    "customer_name", "email", "phone", "flight_number", "arrival_date", "arrival_time",
+    "passengers", "vehicle_type", "destination", "special_requests", "vehicle_units",
+    "allocation", "status", "created_at",
+], [
+    _field("id", source="_id"),
+    _field("customer_name"),
+    _field("email"),
+    _field("phone"),
+    _field("flight_number"),
+    _field("arrival_date", "date", _date),
+    _field("arrival_time", "time", _time),
+    _field("passengers", "int", lambda value: value),
+    _field("vehicle_type"),
+    _field("destination"),
+    _field("special_requests"),
+    # Allocation flattened: units as "unit;unit", vehicle count and summed price
+    Column("vehicle_units", "string", lambda document: ";".join(document.get("vehicle_units") or [])),
+    Column("vehicles", "int", lambda document: len(_allocation(document)) or None),
+    Column("price", "float", lambda document: sum(v["price"] for v in _allocation(document)) or None),
+    _field("status"),
+    _field("created_at", "timestamp", lambda value: value),
+])
+
+EXPORTS = {spec.name: spec for spec in (BOOKINGS_EXPORT, TRANSFERS_EXPORT)}
+
+
+def export_query(
+    spec: ExportSpec,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    status: Optional[str] = None,
+) -> dict:
+    """Filter on the service date (booking or arrival day), creation time and status"""
+    query = {}
+    # Service dates are ISO strings, which sort in date order
+    query.update(date_range(spec.service_date, start and start.isoformat(), end and end.isoformat()))
+    query.update(date_range("created_at", created_from, created_to))
+    if status:
+        query["status"] = status
+    return query
+
+
+async def _batches(spec: ExportSpec, query: dict, batch_size: int) -> AsyncIterator[List[dict]]:
+    """Matching documents in creation order, batch_size at a time"""
+    cursor = spec.collection.find(query, spec.projection) \
+        .sort([("created_at", ASCENDING), ("_id", ASCENDING)]) \
+        .batch_size(batch_size)
+    batch = []
+    async for document in cursor:
+        batch.append(document)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _csv_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, (date, time)):
+        return value.isoformat()
+    return value
+
+
+async def _csv_chunks(spec: ExportSpec, batches: AsyncIterator[List[dict]]) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([column.name for column in spec.columns])
+    yield buffer.getvalue().encode()
+    async for batch in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows([_csv_value(column.read(document)) for column in spec.columns] for document in batch)
+        yield buffer.getvalue().encode()
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file that hands out what was written since the last take()"""
+
+    def __init__(self):
+        self._chunk = bytearray()
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunk += data
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def take(self) -> bytes:
+        chunk = bytes(self._chunk)
+        self._chunk.clear()
+        return chunk
+
+
+def _arrow_schema(spec: ExportSpec):
+    types = {
+        "string": pa.string(), "int": pa.int64(), "float": pa.float64(),
+        "date": pa.date32(), "time": pa.time64("us"), "timestamp": pa.timestamp("ms"),
+    }
+    return pa.schema([(column.name, types[column.kind]) for column in spec.columns])
+
+
+async def _parquet_chunks(spec: ExportSpec, batches: AsyncIterator[List[dict]]) -> AsyncIterator[bytes]:
+    schema = _arrow_schema(spec)
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression="snappy")
+
+    def write(batch: List[dict]) -> None:
+        arrays = [
+            pa.array([column.read(document) for document in batch], type=field.type)
+            for column, field in zip(spec.columns, schema)
+        ]
+        writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+
+    try:
+        async for batch in batches:
+            await asyncio.to_thread(write, batch)
+            chunk = sink.take()
+            if chunk:
+                yield chunk
+    finally:
+        writer.close()
+    yield sink.take()
+
+
+def export_chunks(spec: ExportSpec, query: dict, export_format: str,
+                  batch_size: int = EXPORT_BATCH_SIZE) -> AsyncIterator[bytes]:
+    """Encoded export file, produced batch by batch"""
+    if export_format == PARQUET:
+        if pa is None:
+            raise ExportUnavailable("Parquet export needs pyarrow installed")
+        return _parquet_chunks(spec, _batches(spec, query, batch_size))
+    return _csv_chunks(spec, _batches(spec, query, batch_size))
+
+
+def export_filename(spec: ExportSpec, export_format: str,
+                    start: Optional[date] = None, end: Optional[date] = None) -> str:
+    period = "-".join(day.isoformat() for day in (start, end) if day) or "all"
+    return f"{spec.name}-{period}.{export_format}"
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Export tour or transfer bookings")
+    parser.add_argument("collection", choices=list(EXPORTS))
+    parser.add_argument("--format", choices=FORMATS, default=CSV)
+    parser.add_argument("--start", type=date.fromisoformat, help="first booking/arrival day, YYYY-MM-DD")
+    parser.add_argument("--end", type=date.fromisoformat, help="last booking/arrival day, YYYY-MM-DD")
+    parser.add_argument("--status")
+    parser.add_argument("--batch-size", type=int, default=EXPORT_BATCH_SIZE)
+    parser.add_argument("-o", "--output", help="file to write, default stdout")
+    args = parser.parse_args()
+
+    spec = EXPORTS[args.collection]
+    query = export_query(spec, args.start, args.end, status=args.status)
+    output = open(args.output, "wb") if args.output else sys.stdout.buffer
+    try:
+        async for chunk in export_chunks(spec, query, args.format, args.batch_size):
+            output.write(chunk)
+    finally:
+        if args.output:
+            output.close()
+        close_client()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
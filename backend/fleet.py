@@ -0,0 +1,414 @@
+"""Vehicle unit scheduling for airport transfers.
+
+Bookings written before vehicle reservations moved to MongoDB are copied into
+the fleet_schedule collection once, after deploying:
+
+    python fleet.py --sync [--since 2025-01-01]
+"""
+import argparse
+import asyncio
+import bisect
+import os
+import time
+from datetime import date, datetime, time as time_of_day, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+from allocation import cheapest_allocation, seat_passengers
+from database import vehicles_collection, transfers_collection, fleet_schedule_collection, close_client
+
+# Driving minutes from the airport, matched against the booking destination
+DRIVE_MINUTES = {
+    "stone town": 20,
+    "fumba": 30,
+    "kiwengwa": 60,
+    "pongwe": 60,
+    "paje": 60,
+    "bwejuu": 65,
+    "jambiani": 65,
+    "michamvi": 70,
+    "matemwe": 70,
+    "nungwi": 75,
+    "kendwa": 75,
+}
+DEFAULT_DRIVE_MINUTES = 60
+# Flight delays, meet & greet and luggage before the vehicle leaves the airport
+PICKUP_BUFFER_MINUTES = 45
+
+# How long a worker trusts its in-memory view of a day before re-reading it
+SCHEDULE_REFRESH_SECONDS = float(os.environ.get("FLEET_SCHEDULE_REFRESH_SECONDS", "2"))
+# Picks made again when another worker reserved a chosen vehicle first
+FLEET_RESERVE_ATTEMPTS = 3
+# Unit updates sent per bulk_write by sync_schedule
+SYNC_BATCH_SIZE = 1000
+
+DUPLICATE_KEY = 11000
+
+
+def drive_minutes(destination: str) -> int:
+    destination = destination.lower()
+    for place, minutes in DRIVE_MINUTES.items():
+        if place in destination:
+            return minutes
+    return DEFAULT_DRIVE_MINUTES
+
+
+def service_window(arrival_date: date, arrival_time, destination: str) -> Tuple[datetime, datetime]:
+    """Time a vehicle is committed to a transfer: pickup, drive out and drive back"""
+    start = datetime.combine(arrival_date, arrival_time)
+    end = start + timedelta(minutes=PICKUP_BUFFER_MINUTES + 2 * drive_minutes(destination))
+    return start, end
+
+
+class IntervalIndex:
+    """Non-overlapping [start, end) intervals of one vehicle, sorted by start.
+
+    Lookups and conflict checks are binary searches, so they stay fast as a
+    vehicle's schedule fills up.
+    """
+
+    def __init__(self):
+        self._starts: List[datetime] = []
+        self._ends: List[datetime] = []
+        self._keys: List[tuple] = []
+
+    def __len__(self):
+        return len(self._starts)
+
+    def idle_before(self, start: datetime, end: datetime) -> Optional[timedelta]:
+        """Idle time before a new interval if it fits, or None on conflict"""
+        position = bisect.bisect_right(self._starts, start)
+        if position > 0 and self._ends[position - 1] > start:
+            return None
+        if position < len(self._starts) and self._starts[position] < end:
+            return None
+        if position == 0:
+            return timedelta.max
+        return start - self._ends[position - 1]
+
+    def add(self, start: datetime, end: datetime, key: tuple) -> None:
+        position = bisect.bisect_right(self._starts, start)
+        self._starts.insert(position, start)
+        self._ends.insert(position, end)
+        self._keys.insert(position, key)
+
+    def keys(self) -> List[tuple]:
+        return list(self._keys)
+
+    def remove(self, predicate) -> None:
+        """Drop every interval whose key matches the predicate"""
+        keep = [i for i, key in enumerate(self._keys) if not predicate(key)]
+        self._starts = [self._starts[i] for i in keep]
+        self._ends = [self._ends[i] for i in keep]
+        self._keys = [self._keys[i] for i in keep]
+
+
+class FleetScheduler:
+    """Assigns individual vehicles to transfers without overlapping time windows.
+
+    MongoDB is the authority: each vehicle unit has a document in the
+    fleet_schedule collection listing its service windows, and a unit is
+    reserved with one conditional upsert that only matches while none of its
+    windows overlaps the new one. A unit that another worker took in the
+    meantime collides on _id, exactly like a full tour day in
+    ``inventory.reserve_seats``, so two workers can never hand out the same
+    vehicle for overlapping windows.
+
+    To pick a unit quickly, each worker mirrors the schedule in an interval
+    index per vehicle. Days are re-read from MongoDB once they are older than
+    SCHEDULE_REFRESH_SECONDS, and at once after a reservation lost a race.
+    Interval keys are (day, booking_id, added_at). A reload replaces the
+    intervals added before it started and keeps the ones this worker added
+    while it was reading. Days before yesterday are forgotten once a day, as
+    ``prune_schedule`` drops them from MongoDB.
+    """
+
+    def __init__(self, refresh_seconds: float = SCHEDULE_REFRESH_SECONDS):
+        self.refresh_seconds = refresh_seconds
+        self.units: Dict[str, List[str]] = {}
+        self.capacities: Dict[str, int] = {}
+        self.prices: Dict[str, float] = {}
+        self.schedules: Dict[str, IntervalIndex] = {}
+        self._fleet_loaded_at = 0.0
+        self._days_loaded_at: Dict[str, float] = {}
+        self._evicted_before: Optional[str] = None
+
+    def set_fleet(self, vehicles: List[dict]) -> None:
+        """Build the vehicle units from the vehicle type documents"""
+        self.units = {}
+        for vehicle in vehicles:
+            vehicle_type = vehicle["type"]
+            self.capacities[vehicle_type] = vehicle["capacity"]
+            self.prices[vehicle_type] = vehicle.get("price", 0.0)
+            self.units[vehicle_type] = [
+                f"{vehicle_type} #{number}" for number in range(1, vehicle.get("fleet_size", 1) + 1)
+            ]
+            for unit in self.units[vehicle_type]:
+                self.schedules.setdefault(unit, IntervalIndex())
+
+    async def _ensure_fleet(self) -> None:
+        if time.monotonic() - self._fleet_loaded_at < self.refresh_seconds:
+            return
+        vehicles = await vehicles_collection.find(
+            {"available": True}, {"type": 1, "capacity": 1, "price": 1, "fleet_size": 1}
+        ).to_list(None)
+        self.set_fleet(vehicles)
+        self._fleet_loaded_at = time.monotonic()
+
+    def add_local(self, units: List[str], start: datetime, end: datetime, booking_id) -> None:
+        """Put a reservation on this worker's schedule only"""
+        key = (start.date().isoformat(), str(booking_id), time.monotonic())
+        for unit in units:
+            if unit in self.schedules:
+                self.schedules[unit].add(start, end, key)
+
+    def _remove_local(self, booking_ids: List[str]) -> None:
+        booking_ids = set(booking_ids)
+        for schedule in self.schedules.values():
+            schedule.remove(lambda key: key[1] in booking_ids)
+
+    async def _load_day(self, day: date) -> None:
+        day_key = day.isoformat()
+        loaded_at = self._days_loaded_at.get(day_key)
+        if loaded_at is not None and time.monotonic() - loaded_at < self.refresh_seconds:
+            return
+
+        started = time.monotonic()
+        day_start = datetime.combine(day, time_of_day.min)
+        units = await fleet_schedule_collection.aggregate([
+            {"$match": {"intervals.start": {"$gte": day_start, "$lt": day_start + timedelta(days=1)}}},
+            {"$project": {"intervals": {"$filter": {
+                "input": "$intervals", "as": "interval",
+                "cond": {"$and": [{"$gte": ["$$interval.start", day_start]},
+                                  {"$lt": ["$$interval.start", day_start + timedelta(days=1)]}]},
+            }}}},
+        ]).to_list(None)
+
+        # Reservations this worker made while the day was being read stay
+        for schedule in self.schedules.values():
+            schedule.remove(lambda key: key[0] == day_key and key[2] < started)
+        for unit in units:
+            schedule = self.schedules.get(unit["_id"])
+            if schedule is None:
+                continue
+            kept = {key[1] for key in schedule.keys() if key[0] == day_key}
+            for interval in unit["intervals"]:
+                if interval["booking_id"] not in kept:
+                    schedule.add(interval["start"], interval["end"], (day_key, interval["booking_id"], started))
+        self._days_loaded_at[day_key] = time.monotonic()
+
+    def evict_past(self, today: date) -> None:
+        """Forget the days before yesterday; yesterday's windows can still overlap today"""
+        cutoff = (today - timedelta(days=1)).isoformat()
+        if cutoff == self._evicted_before:
+            return
+        for schedule in self.schedules.values():
+            schedule.remove(lambda key: key[0] < cutoff)
+        for day_key in [day_key for day_key in self._days_loaded_at if day_key < cutoff]:
+            del self._days_loaded_at[day_key]
+        self._evicted_before = cutoff
+
+    async def refresh(self, day: date) -> None:
+        """Make sure the fleet and every day that can overlap this one are current"""
+        self.evict_past(date.today())
+        await self._ensure_fleet()
+        for offset in (-1, 0, 1):
+            await self._load_day(day + timedelta(days=offset))
+
+    def free_units(self, vehicle_type: str, start: datetime, end: datetime) -> List[Tuple[timedelta, str]]:
+        """Units of a type that are free for the window, tightest fit first"""
+        free = []
+        for unit in self.units.get(vehicle_type, []):
+            idle = self.schedules[unit].idle_before(start, end)
+            if idle is not None:
+                free.append((idle, unit))
+        free.sort()
+        return free
+
+    def best_fit(self, vehicle_type: str, start: datetime, end: datetime) -> Optional[str]:
+        """The free unit that leaves the least idle time before this transfer"""
+        free = self.free_units(vehicle_type, start, end)
+        return free[0][1] if free else None
+
+    def allocate(self, passengers: int, start: datetime, end: datetime) -> Optional[List[dict]]:
+        """Cheapest set of free units, of any type, that seats the whole party.
+
+        Returns one entry per vehicle with its type, unit, capacity, price and
+        the passengers it carries, or None when the free fleet is too small.
+        """
+        free = {
+            vehicle_type: [unit for _, unit in self.free_units(vehicle_type, start, end)]
+            for vehicle_type in self.units
+        }
+        options = [
+            (vehicle_type, self.capacities[vehicle_type], self.prices[vehicle_type], len(units))
+            for vehicle_type, units in free.items()
+        ]
+        counts = cheapest_allocation(passengers, options)
+        if counts is None:
+            return None
+
+        vehicles = [
+            {"vehicle_type": vehicle_type, "vehicle_unit": unit,
+             "capacity": self.capacities[vehicle_type], "price": self.prices[vehicle_type]}
+            for vehicle_type, count in counts.items()
+            for unit in free[vehicle_type][:count]
+        ]
+        vehicles.sort(key=lambda vehicle: vehicle["capacity"], reverse=True)
+        seated = seat_passengers(passengers, [vehicle["capacity"] for vehicle in vehicles])
+        for vehicle, seats in zip(vehicles, seated):
+            vehicle["passengers"] = seats
+        return vehicles
+
+    async def reserve(self, units: List[str], start: datetime, end: datetime, booking_id) -> bool:
+        """Atomically reserve units for a window in MongoDB.
+
+        All or nothing: when one unit is already taken for an overlapping
+        window, the units reserved so far are given back, the surrounding
+        days are marked stale and False is returned.
+        """
+        booking_id = str(booking_id)
+        reserved = []
+        for unit in units:
+            try:
+                await fleet_schedule_collection.update_one(
+                    {"_id": unit, "intervals": {"$not": {"$elemMatch": {"start": {"$lt": end}, "end": {"$gt": start}}}}},
+                    {"$push": {"intervals": {"start": start, "end": end, "booking_id": booking_id}}},
+                    upsert=True,
+                )
+            except DuplicateKeyError:
+                if reserved:
+                    await self._pull(reserved, [booking_id])
+                for offset in (-1, 0, 1):
+                    self._days_loaded_at.pop((start.date() + timedelta(days=offset)).isoformat(), None)
+                return False
+            reserved.append(unit)
+        self.add_local(units, start, end, booking_id)
+        return True
+
+    async def reserve_many(self, requests: List[Tuple[List[str], datetime, datetime, str]]) -> List[bool]:
+        """Reserve the units of many (units, start, end, booking_id) picks with one bulk_write.
+
+        Each pick is all or nothing, as with ``reserve``. The picks must already
+        be on this worker's schedule through ``add_local``, since a batch makes
+        them one after another, and must not overlap each other on a unit.
+        The picks that lost a unit to another worker are taken off again, in
+        MongoDB and locally, and their days are marked stale.
+        """
+        operations, owners = [], []
+        for position, (units, start, end, booking_id) in enumerate(requests):
+            for unit in units:
+                operations.append(UpdateOne(
+                    {"_id": unit, "intervals": {"$not": {"$elemMatch": {"start": {"$lt": end}, "end": {"$gt": start}}}}},
+                    {"$push": {"intervals": {"start": start, "end": end, "booking_id": str(booking_id)}}},
+                    upsert=True,
+                ))
+                owners.append(position)
+        lost = set()
+        if operations:
+            try:
+                await fleet_schedule_collection.bulk_write(operations, ordered=False)
+            except BulkWriteError as e:
+                for error in e.details.get("writeErrors", []):
+                    if error.get("code") != DUPLICATE_KEY:
+                        await self.release([booking_id for _, _, _, booking_id in requests])
+                        raise
+                    lost.add(owners[error["index"]])
+        if lost:
+            await self.release([requests[position][3] for position in lost])
+            for position in lost:
+                start = requests[position][1]
+                for offset in (-1, 0, 1):
+                    self._days_loaded_at.pop((start.date() + timedelta(days=offset)).isoformat(), None)
+        return [position not in lost for position in range(len(requests))]
+
+    async def _pull(self, units: Optional[List[str]], booking_ids: List[str]) -> None:
+        query = {"intervals.booking_id": {"$in": booking_ids}}
+        if units is not None:
+            query["_id"] = {"$in": units}
+        await fleet_schedule_collection.update_many(
+            query, {"$pull": {"intervals": {"booking_id": {"$in": booking_ids}}}}
+        )
+
+    async def release(self, booking_ids: List) -> None:
+        """Free the vehicles of bookings that were cancelled or never written"""
+        booking_ids = [str(booking_id) for booking_id in booking_ids]
+        if not booking_ids:
+            return
+        await self._pull(None, booking_ids)
+        self._remove_local(booking_ids)
+
+
+async def prune_schedule(before: datetime) -> int:
+    """Drop service windows that ended before a cutoff; returns the units touched"""
+    result = await fleet_schedule_collection.update_many(
+        {"intervals.end": {"$lt": before}}, {"$pull": {"intervals": {"end": {"$lt": before}}}}
+    )
+    return result.modified_count
+
+
+async def _sync_batch(requests: List[UpdateOne]) -> int:
+    try:
+        result = await fleet_schedule_collection.bulk_write(requests, ordered=False)
+    except BulkWriteError as e:
+        # A duplicate key means the window is already on the unit's schedule
+        if any(error.get("code") != DUPLICATE_KEY for error in e.details.get("writeErrors", [])):
+            raise
+        return e.details["nModified"] + e.details["nUpserted"]
+    return result.modified_count + result.upserted_count
+
+
+async def sync_schedule(since: date, batch_size: int = SYNC_BATCH_SIZE) -> int:
+    """Copy the windows of stored bookings arriving from ``since`` into fleet_schedule.
+
+    For bookings written before reservations moved to MongoDB. Windows that
+    are already there are left alone, so running it again is harmless.
+    Returns how many unit windows were added.
+    """
+    added = 0
+    requests = []
+    bookings = transfers_collection.find(
+        {"arrival_date": {"$gte": since.isoformat()}, "vehicle_units": {"$exists": True, "$ne": []},
+         "status": {"$ne": "cancelled"}},
+        {"arrival_date": 1, "arrival_time": 1, "destination": 1, "vehicle_units": 1},
+    )
+    async for booking in bookings:
+        booking_id = str(booking["_id"])
+        start, end = service_window(date.fromisoformat(booking["arrival_date"]),
+                                    time_of_day.fromisoformat(booking["arrival_time"]), booking["destination"])
+        requests.extend(
+            UpdateOne({"_id": unit, "intervals.booking_id": {"$ne": booking_id}},
+                      {"$push": {"intervals": {"start": start, "end": end, "booking_id": booking_id}}},
+                      upsert=True)
+            for unit in booking["vehicle_units"]
+        )
+        if len(requests) >= batch_size:
+            added += await _sync_batch(requests)
+            requests = []
+    if requests:
+        added += await _sync_batch(requests)
+    return added
+
+
+fleet_scheduler = FleetScheduler()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Maintain the fleet schedule")
+    parser.add_argument("--sync", action="store_true",
+                        help="copy the vehicle windows of stored bookings into the schedule")
+    parser.add_argument("--since", type=date.fromisoformat, default=date.today() - timedelta(days=1),
+                        help="first arrival day to copy (default yesterday)")
+    args = parser.parse_args()
+
+    if args.sync:
+        print(f"Fleet schedule synced with {await sync_schedule(args.since)} vehicle windows")
+    else:
+        parser.print_help()
+    close_client()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,101 @@
+import asyncio
+import os
+import time
+from datetime import datetime
+from typing import Awaitable, Callable, Optional
+
+from database import db, pool_stats
+from metrics import command_metrics
+
+# How long a probe result is reused, so orchestrator polling doesn't add load
+PROBE_CACHE_SECONDS = float(os.environ.get("HEALTH_PROBE_CACHE_SECONDS", "5"))
+PING_TIMEOUT_SECONDS = float(os.environ.get("HEALTH_PING_TIMEOUT_MS", "500")) / 1000
+# Pings slower than this mark the node degraded (still ready)
+SLOW_PING_SECONDS = float(os.environ.get("HEALTH_SLOW_PING_MS", "100")) / 1000
+# Share of the pool checked out, with requests queueing, at which the node stops taking traffic
+POOL_SATURATION_LIMIT = float(os.environ.get("HEALTH_POOL_SATURATION_LIMIT", "0.9"))
+
+READY = "ready"
+DEGRADED = "degraded"
+NOT_READY = "not_ready"
+
+
+class ReadinessProbe:
+    """Checks whether this worker should receive traffic.
+
+    A worker is ready once its startup work has finished and MongoDB answers a
+    ping within PING_TIMEOUT_SECONDS without the connection pool being
+    saturated. Results are cached for PROBE_CACHE_SECONDS and concurrent
+    probes share one check.
+    """
+
+    def __init__(self, cache_seconds: float = PROBE_CACHE_SECONDS):
+        self.cache_seconds = cache_seconds
+        self.initialized = False
+        # Retried from the probe when startup work failed, e.g. Mongo was down at boot
+        self.initializer: Optional[Callable[[], Awaitable[bool]]] = None
+        self._result: Optional[dict] = None
+        self._checked_at = 0.0
+        self._lock = asyncio.Lock()
+
+    def mark_initialized(self) -> None:
+        self.initialized = True
+
+    async def _ping(self) -> dict:
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(db.command("ping"), PING_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            return {"ok": False, "error": f"ping timed out after {PING_TIMEOUT_SECONDS * 1000:.0f} ms"}
+        except Exception as e:
+            return {"ok": False, "error": str(e)}
+        return {"ok": True, "latency_ms": round((time.perf_counter() - started) * 1000, 2)}
+
+    @staticmethod
+    def _pool() -> dict:
+        pool = pool_stats.snapshot()
+        saturation = pool["checked_out"] / pool["max_pool_size"] if pool["max_pool_size"] else 0.0
+        return {
+            "ok": not (saturation >= POOL_SATURATION_LIMIT and pool["waiting"] > 0),
+            "saturation": round(saturation, 3),
+            "checked_out": pool["checked_out"],
+            "waiting": pool["waiting"],
+            "max_pool_size": pool["max_pool_size"],
+        }
+
+    async def _check(self) -> dict:
+        mongo = await self._ping()
+        if mongo["ok"] and not self.initialized and self.initializer is not None:
+            if await self.initializer():
+                self.mark_initialized()
+        pool = self._pool()
+
+        if not (mongo["ok"] and pool["ok"] and self.initialized):
+            state = NOT_READY
+        elif mongo["latency_ms"] > SLOW_PING_SECONDS * 1000:
+            state = DEGRADED
+        else:
+            state = READY
+
+        last_query = command_metrics.last_seconds
+        return {
+            "status": state,
+            "initialized": self.initialized,
+            "mongo": mongo,
+            "pool": pool,
+            "last_query_ms": round(last_query * 1000, 2) if last_query is not None else None,
+            "checked_at": datetime.utcnow().isoformat(),
+        }
+
+    async def check(self) -> dict:
+        """The cached probe result, re-checked once it is older than cache_seconds"""
+        if self._result is not None and time.monotonic() - self._checked_at < self.cache_seconds:
+            return self._result
+        async with self._lock:
+            if self._result is None or time.monotonic() - self._checked_at >= self.cache_seconds:
+                self._result = await self._check()
+                self._checked_at = time.monotonic()
+            return self._result
+
+
+readiness_probe = ReadinessProbe()
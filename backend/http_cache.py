@@ -0,0 +1,127 @@
+import hashlib
+import re
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional
+
+from fastapi import Request, Response
+
+from cache import catalog_cache, TOURS, VEHICLES, GALLERY
+from database import tours_collection, vehicles_collection, gallery_collection
+
+# (path pattern, catalog namespace, Cache-Control) for cacheable GET routes
+CACHE_RULES = [
+    (re.compile(r"^/api/tours/(category/[^/]+|search|[0-9a-f]{24})?$"), TOURS, "public, max-age=60"),
+    (re.compile(r"^/api/transfers/vehicles$"), VEHICLES, "public, max-age=300"),
+    (re.compile(r"^/api/gallery/"), GALLERY, "public, max-age=300"),
+]
+
+COLLECTIONS = {
+    TOURS: tours_collection,
+    VEHICLES: vehicles_collection,
+    GALLERY: gallery_collection,
+}
+
+VERSION_KEY = "__version__"
+
+
+class CollectionVersion:
+    def __init__(self, etag: str, last_modified: Optional[datetime]):
+        self.etag = etag
+        self.last_modified = last_modified
+
+
+async def _load_version(namespace: str) -> CollectionVersion:
+    pipeline = [{"$group": {
+        "_id": None,
+        "count": {"$sum": 1},
+        "updated_at": {"$max": "$updated_at"},
+        "created_at": {"$max": "$created_at"},
+        "max_id": {"$max": "$_id"},
+    }}]
+    stats = await COLLECTIONS[namespace].aggregate(pipeline).to_list(1)
+    stats = stats[0] if stats else {}
+
+    stamps = [stamp for stamp in (stats.get("updated_at"), stats.get("created_at")) if stamp]
+    last_modified = max(stamps).replace(tzinfo=timezone.utc, microsecond=0) if stamps else None
+    raw = f"{namespace}:{stats.get('count', 0)}:{stats.get('updated_at')}:{stats.get('created_at')}:{stats.get('max_id')}"
+    # Weak: the same version is served gzipped, brotli'd or plain, which aren't byte-identical
+    return CollectionVersion('W/"' + hashlib.sha1(raw.encode()).hexdigest() + '"', last_modified)
+
+
+async def collection_version(namespace: str) -> CollectionVersion:
+    """Current version of a catalog collection.
+
+    Stored in the catalog cache, so it is only recomputed from MongoDB after
+    the namespace is invalidated or its TTL runs out.
+    """
+    return await catalog_cache.get_or_load(namespace, VERSION_KEY, lambda: _load_version(namespace))
+
+
+def _opaque_tag(etag: str) -> str:
+    return etag[2:] if etag.startswith("W/") else etag
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    """Weak comparison, as If-None-Match requires"""
+    candidates = [_opaque_tag(candidate.strip()) for candidate in header.split(",")]
+    return _opaque_tag(etag) in candidates
+
+
+def _is_wildcard(header: str) -> bool:
+    return header.strip() == "*"
+
+
+def _not_modified_since(header: str, last_modified: Optional[datetime]) -> bool:
+    if last_modified is None:
+        return False
+    try:
+        since = parsedate_to_datetime(header)
+    except (TypeError, ValueError):
+        return False
+    return last_modified <= since
+
+
+def _cache_headers(version: CollectionVersion, cache_control: str) -> dict:
+    headers = {"ETag": version.etag, "Cache-Control": cache_control}
+    if version.last_modified:
+        headers["Last-Modified"] = format_datetime(version.last_modified, usegmt=True)
+    return headers
+
+
+async def conditional_get_middleware(request: Request, call_next):
+    """Send validators on catalog GETs and answer conditional requests with 304"""
+    if request.method not in ("GET", "HEAD"):
+        return await call_next(request)
+
+    for pattern, namespace, cache_control in CACHE_RULES:
+        if pattern.match(request.url.path):
+            break
+    else:
+        return await call_next(request)
+
+    version = await collection_version(namespace)
+    headers = _cache_headers(version, cache_control)
+
+    if_none_match = request.headers.get("if-none-match")
+    if_modified_since = request.headers.get("if-modified-since")
+    wildcard = if_none_match is not None and _is_wildcard(if_none_match)
+    if wildcard:
+        # "*" matches any current representation, so only once the handler has found one
+        not_modified = False
+    elif if_none_match is not None:
+        not_modified = _etag_matches(if_none_match, version.etag)
+    elif if_modified_since is not None:
+        not_modified = _not_modified_since(if_modified_since, version.last_modified)
+    else:
+        not_modified = False
+
+    if not_modified:
+        return Response(status_code=304, headers=headers)
+
+    response = await call_next(request)
+    if response.status_code == 200:
+        if wildcard:
+            return Response(status_code=304, headers=headers)
+        response.headers.update(headers)
+    return response
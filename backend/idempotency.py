@@ -0,0 +1,151 @@
+import asyncio
+import hashlib
+import os
+import re
+import time
+from typing import Dict, Optional, Tuple
+
+from fastapi import Request, Response
+from fastapi.responses import JSONResponse
+
+from ratelimit import client_address
+
+# How long a successful POST answers identical repeats
+IDEMPOTENCY_TTL_SECONDS = float(os.environ.get("IDEMPOTENCY_TTL_SECONDS", "30"))
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+
+# Public POST routes where a repeat must not create a second record
+IDEMPOTENT_ROUTES = [
+    re.compile(r"^/api/contact/?$"),
+    re.compile(r"^/api/tours/bookings(/batch)?$"),
+    re.compile(r"^/api/transfers/bookings(/batch)?$"),
+]
+
+MAX_ENTRIES = 50_000
+
+# (expires at, request body hash, status code, headers, body)
+CachedResponse = Tuple[float, str, int, Dict[str, str], bytes]
+
+
+class ResponseCache:
+    """Recent successful POST responses by request fingerprint.
+
+    A repeat that arrives while the first request is still running waits for
+    it and gets the same answer, so a double click never writes twice. Each
+    entry keeps the hash of the request body it answered, so a reused
+    Idempotency-Key with a different body can be refused.
+    """
+
+    def __init__(self, ttl: float = IDEMPOTENCY_TTL_SECONDS, max_entries: int = MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: Dict[str, CachedResponse] = {}
+        self._in_flight: Dict[str, Tuple[asyncio.Future, str]] = {}
+        self.replayed = 0
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic():
+            del self._entries[key]
+            return None
+        return entry
+
+    def put(self, key: str, body_hash: str, status_code: int, headers: Dict[str, str], body: bytes) -> None:
+        now = time.monotonic()
+        if len(self._entries) >= self.max_entries:
+            for expired in [k for k, entry in self._entries.items() if entry[0] < now]:
+                del self._entries[expired]
+            if len(self._entries) >= self.max_entries:
+                self._entries.pop(next(iter(self._entries)))
+        self._entries[key] = (now + self.ttl, body_hash, status_code, headers, body)
+
+    def in_flight(self, key: str) -> Optional[Tuple[asyncio.Future, str]]:
+        """The future a running request resolves when done, and its body hash"""
+        return self._in_flight.get(key)
+
+    def begin(self, key: str, body_hash: str) -> asyncio.Future:
+        """Mark a request as running; repeats wait on the returned future"""
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = (future, body_hash)
+        return future
+
+    def finish(self, key: str) -> None:
+        self._in_flight.pop(key)[0].set_result(None)
+
+    def stats(self) -> dict:
+        return {"entries": len(self._entries), "in_flight": len(self._in_flight), "replayed": self.replayed}
+
+
+response_cache = ResponseCache()
+
+
+def body_hash(body: bytes) -> str:
+    return hashlib.sha256(body).hexdigest()
+
+
+def request_fingerprint(request: Request, body: bytes) -> str:
+    """Cache key for a request: route and client, plus the Idempotency-Key when sent, otherwise the body.
+
+    The client is its Authorization header when it sends one and its address
+    otherwise, so one client's key can never replay another client's response.
+    """
+    client = request.headers.get("authorization") or client_address(request)
+    digest = hashlib.sha256()
+    for part in (request.method, request.url.path, request.headers.get("accept-encoding", ""), client):
+        digest.update(part.encode())
+        digest.update(b"\0")
+    client_key = request.headers.get(IDEMPOTENCY_HEADER.lower())
+    digest.update(client_key.encode() if client_key else body)
+    return digest.hexdigest()
+
+
+def _replay(entry: CachedResponse) -> Response:
+    response_cache.replayed += 1
+    _, _, status_code, headers, body = entry
+    return Response(content=body, status_code=status_code, headers={**headers, REPLAYED_HEADER: "true"})
+
+
+def _key_reused() -> Response:
+    return JSONResponse(
+        status_code=422,
+        content={"detail": f"{IDEMPOTENCY_HEADER} was already used with a different request body"},
+    )
+
+
+async def idempotency_middleware(request: Request, call_next):
+    """Answer repeated public POSTs from the response cache instead of running them again"""
+    if request.method != "POST" or not any(route.match(request.url.path) for route in IDEMPOTENT_ROUTES):
+        return await call_next(request)
+
+    body = await request.body()
+    key = request_fingerprint(request, body)
+    digest = body_hash(body)
+    entry = response_cache.get(key)
+    if entry is not None:
+        return _replay(entry) if entry[1] == digest else _key_reused()
+
+    in_flight = response_cache.in_flight(key)
+    if in_flight is not None:
+        future, running_digest = in_flight
+        if running_digest != digest:
+            return _key_reused()
+        await asyncio.shield(future)
+        entry = response_cache.get(key)
+        if entry is not None:
+            return _replay(entry)
+        return await call_next(request)
+
+    response_cache.begin(key, digest)
+    try:
+        response = await call_next(request)
+        if not 200 <= response.status_code < 300:
+            return response
+        content = b"".join([chunk async for chunk in response.body_iterator])
+        headers = dict(response.headers)
+        response_cache.put(key, digest, response.status_code, headers, content)
+        return Response(content=content, status_code=response.status_code, headers=headers)
+    finally:
+        response_cache.finish(key)
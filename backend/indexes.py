@@ -0,0 +1,185 @@
+"""Index management for the collections queried by the API routes.
+
+Run ``python indexes.py`` to create the indexes, or ``python indexes.py --check``
+to explain every route query and report the ones that still scan a collection.
+"""
+import asyncio
+import logging
+import sys
+from datetime import datetime
+from typing import Dict, List
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+from database import db
+
+logger = logging.getLogger(__name__)
+
+# An index with the same name or keys exists with other options, e.g. not unique
+INDEX_OPTIONS_CONFLICT = 85
+INDEX_KEY_SPECS_CONFLICT = 86
+
+
+# Compound indexes matching each route's filter and sort
+INDEXES: Dict[str, List[IndexModel]] = {
+    "tours": [
+        IndexModel([("created_at", ASCENDING), ("_id", ASCENDING)]),
+        IndexModel([("category", ASCENDING), ("created_at", ASCENDING), ("_id", ASCENDING)]),
+        # Natural key used by seeding upserts; unique so concurrent seeding can't duplicate it
+        IndexModel([("title", ASCENDING)], unique=True),
+    ],
+    "vehicles": [
+        # Natural key, also serves lookups by type
+        IndexModel([("type", ASCENDING)], unique=True),
+        IndexModel([("available", ASCENDING)]),
+    ],
+    "gallery": [
+        IndexModel([("created_at", ASCENDING), ("_id", ASCENDING)]),
+        IndexModel([("category", ASCENDING), ("created_at", ASCENDING), ("_id", ASCENDING)]),
+        # Natural key used by seeding upserts
+        IndexModel([("url", ASCENDING)], unique=True),
+    ],
+    "contacts": [
+        IndexModel([("created_at", DESCENDING), ("_id", DESCENDING)]),
+        IndexModel([("status", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)]),
+    ],
+    # Exports stream in (created_at, _id) order. The service day comes after the
+    # sort keys, so its range is checked in the index without a blocking sort
+    "bookings": [
+        IndexModel([("created_at", ASCENDING), ("_id", ASCENDING), ("booking_date", ASCENDING)]),
+        IndexModel([("status", ASCENDING), ("created_at", ASCENDING), ("_id", ASCENDING),
+                    ("booking_date", ASCENDING)]),
+    ],
+    "tour_inventory": [
+        IndexModel([("tour_id", ASCENDING), ("date", ASCENDING)]),
+    ],
+    "transfer_bookings": [
+        # Newest-first pages walk these backwards; exports forwards, like bookings
+        IndexModel([("created_at", ASCENDING), ("_id", ASCENDING), ("arrival_date", ASCENDING)]),
+        IndexModel([("status", ASCENDING), ("created_at", ASCENDING), ("_id", ASCENDING),
+                    ("arrival_date", ASCENDING)]),
+        IndexModel([("vehicle_type", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)]),
+        # Upcoming arrivals copied into the fleet schedule on startup
+        IndexModel([("arrival_date", ASCENDING), ("status", ASCENDING)]),
+    ],
+    # Vehicle unit schedules: a day's windows, and releases by booking
+    "fleet_schedule": [
+        IndexModel([("intervals.start", ASCENDING)]),
+        IndexModel([("intervals.booking_id", ASCENDING)]),
+    ],
+    # Admin stats rollups, read by day range
+    "stats_tour_daily": [
+        IndexModel([("date", ASCENDING), ("tour_id", ASCENDING)]),
+    ],
+    "stats_transfer_daily": [
+        IndexModel([("date", ASCENDING), ("vehicle_type", ASCENDING)]),
+    ],
+    # Background jobs: due queued jobs, expired leases, and finished jobs kept a week
+    "jobs": [
+        IndexModel([("status", ASCENDING), ("run_at", ASCENDING)]),
+        IndexModel([("status", ASCENDING), ("locked_until", ASCENDING)]),
+        IndexModel([("finished_at", ASCENDING)], expireAfterSeconds=7 * 24 * 3600,
+                   partialFilterExpression={"status": "done"}),
+    ],
+    # Shared rate limit buckets (RATE_LIMIT_BACKEND=mongo), dropped once idle
+    "rate_limits": [
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0),
+    ],
+}
+
+# Representative query shapes issued by the routes, used by the check mode
+ROUTE_QUERIES = [
+    ("tours", {}, [("created_at", 1), ("_id", 1)]),
+    ("tours", {"category": "water"}, [("created_at", 1), ("_id", 1)]),
+    ("tours", {"category": "water"}, None),
+    ("vehicles", {"available": True}, None),
+    ("vehicles", {"type": "SUV", "available": True}, None),
+    ("gallery", {}, [("created_at", 1), ("_id", 1)]),
+    ("gallery", {"category": "beaches"}, None),
+    ("contacts", {}, [("created_at", -1), ("_id", -1)]),
+    ("contacts", {"status": "new"}, [("created_at", -1), ("_id", -1)]),
+    ("tour_inventory", {"tour_id": "0" * 24, "date": {"$gte": "2025-01-01", "$lte": "2025-12-31"}}, None),
+    ("transfer_bookings", {}, [("created_at", -1), ("_id", -1)]),
+    ("transfer_bookings", {"status": "pending"}, [("created_at", -1), ("_id", -1)]),
+    ("transfer_bookings", {"vehicle_type": "SUV"}, [("created_at", -1), ("_id", -1)]),
+    ("transfer_bookings", {"arrival_date": "2025-01-01", "status": {"$ne": "cancelled"}}, None),
+    # Exports
+    ("bookings", {}, [("created_at", 1), ("_id", 1)]),
+    ("bookings", {"booking_date": {"$gte": "2025-01-01", "$lte": "2025-12-31"}}, [("created_at", 1), ("_id", 1)]),
+    ("bookings", {"status": "confirmed", "booking_date": {"$gte": "2025-01-01", "$lte": "2025-12-31"}},
+     [("created_at", 1), ("_id", 1)]),
+    ("bookings", {"created_at": {"$gte": datetime(2025, 1, 1)}}, [("created_at", 1), ("_id", 1)]),
+    ("transfer_bookings", {"arrival_date": {"$gte": "2025-01-01", "$lte": "2025-12-31"}},
+     [("created_at", 1), ("_id", 1)]),
+    ("transfer_bookings", {"status": "completed", "arrival_date": {"$gte": "2025-01-01", "$lte": "2025-12-31"}},
+     [("created_at", 1), ("_id", 1)]),
+    ("fleet_schedule", {"intervals.start": {"$gte": datetime(2025, 1, 1), "$lt": datetime(2025, 1, 2)}}, None),
+    ("fleet_schedule", {"intervals.booking_id": {"$in": ["0" * 24]}}, None),
+    ("jobs", {"status": "queued", "run_at": {"$lte": datetime(2025, 1, 1)}}, [("run_at", 1)]),
+]
+
+
+async def ensure_indexes(database=db):
+    """Create all declared indexes. Safe to run repeatedly.
+
+    An existing index whose options changed, such as a natural key index that
+    is now unique, is dropped and built again.
+    """
+    for collection_name, indexes in INDEXES.items():
+        collection = database[collection_name]
+        for index in indexes:
+            try:
+                await collection.create_indexes([index])
+            except OperationFailure as e:
+                if e.code not in (INDEX_OPTIONS_CONFLICT, INDEX_KEY_SPECS_CONFLICT):
+                    raise
+                logger.warning(f"Rebuilding index {index.document['name']} on {collection_name}: {str(e)}")
+                await collection.drop_index(index.document["name"])
+                await collection.create_indexes([index])
+        logger.info(f"Indexes ready on {collection_name}: "
+                    f"{', '.join(index.document['name'] for index in indexes)}")
+
+
+def _plan_stages(plan: dict):
+    """Yield every stage name in an explain plan tree"""
+    yield plan.get("stage")
+    for child in plan.get("inputStages", []):
+        yield from _plan_stages(child)
+    if "inputStage" in plan:
+        yield from _plan_stages(plan["inputStage"])
+    if "queryPlan" in plan:
+        yield from _plan_stages(plan["queryPlan"])
+
+
+async def check_indexes(database=db) -> List[dict]:
+    """Explain each route query and return the ones whose plan uses COLLSCAN"""
+    collscans = []
+    for collection_name, query, sort in ROUTE_QUERIES:
+        command = {"find": collection_name, "filter": query}
+        if sort:
+            command["sort"] = dict(sort)
+        explain = await database.command("explain", command, verbosity="queryPlanner")
+        winning_plan = explain["queryPlanner"]["winningPlan"]
+        if "COLLSCAN" in _plan_stages(winning_plan):
+            collscans.append({"collection": collection_name, "filter": query, "sort": sort})
+    return collscans
+
+
+async def main(argv):
+    if "--check" in argv:
+        collscans = await check_indexes()
+        for entry in collscans:
+            print(f"COLLSCAN: {entry['collection']} filter={entry['filter']} sort={entry['sort']}")
+        if collscans:
+            return 1
+        print("All route queries use an index")
+        return 0
+
+    await ensure_indexes()
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(asyncio.run(main(sys.argv[1:])))
@@ -0,0 +1,97 @@
+import asyncio
+from datetime import date, timedelta
+from typing import List, Tuple
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from database import inventory_collection
+
+# Longest availability window served in one request
+MAX_CALENDAR_DAYS = 366
+# Reservations in flight at once for a batch, to leave room in the pool
+BATCH_RESERVATION_CONCURRENCY = 50
+
+
+def _counter_id(tour_id: str, day: date) -> str:
+    return f"{tour_id}:{day.isoformat()}"
+
+
+async def reserve_seats(tour_id: str, day: date, guests: int, capacity: int) -> bool:
+    """Atomically reserve seats on a tour for one day.
+
+    A single conditional $inc on the per-day counter: it only matches while
+    enough seats are left, and upserts the counter on the first booking of
+    the day. When the counter exists but is too full, the upsert collides
+    with its _id and the reservation is refused. There is no read before the
+    write, so concurrent requests cannot oversell.
+
+    Two first bookings of a day can race to create the counter; the loser
+    gets a duplicate key error and retries once as a plain conditional
+    update, now that the counter exists.
+    """
+    if guests < 1:
+        raise ValueError(f"guests must be at least 1, got {guests}")
+    if guests > capacity:
+        return False
+
+    counter_filter = {"_id": _counter_id(tour_id, day), "booked": {"$lte": capacity - guests}}
+    try:
+        await inventory_collection.find_one_and_update(
+            counter_filter,
+            {
+                "$inc": {"booked": guests},
+                "$set": {"capacity": capacity},
+                "$setOnInsert": {"tour_id": tour_id, "date": day.isoformat()},
+            },
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        return True
+    except DuplicateKeyError:
+        result = await inventory_collection.update_one(
+            counter_filter,
+            {"$inc": {"booked": guests}, "$set": {"capacity": capacity}},
+        )
+        return result.modified_count == 1
+
+
+async def reserve_many(requests: List[Tuple[str, date, int, int]]) -> List[bool]:
+    """Reserve seats for many (tour_id, day, guests, capacity) requests concurrently"""
+    semaphore = asyncio.Semaphore(BATCH_RESERVATION_CONCURRENCY)
+
+    async def reserve(request):
+        async with semaphore:
+            return await reserve_seats(*request)
+
+    return await asyncio.gather(*[reserve(request) for request in requests])
+
+
+async def release_seats(tour_id: str, day: date, guests: int) -> None:
+    """Give seats back, e.g. when the booking insert fails after reserving"""
+    await inventory_collection.update_one(
+        {"_id": _counter_id(tour_id, day), "booked": {"$gte": guests}},
+        {"$inc": {"booked": -guests}},
+    )
+
+
+async def availability_calendar(tour_id: str, start: date, end: date, capacity: int) -> List[dict]:
+    """Seats booked and left per day, read from the precomputed counters"""
+    counters = await inventory_collection.find(
+        {"tour_id": tour_id, "date": {"$gte": start.isoformat(), "$lte": end.isoformat()}},
+        {"_id": 0, "date": 1, "booked": 1},
+    ).to_list(None)
+    booked_by_day = {counter["date"]: counter["booked"] for counter in counters}
+
+    calendar = []
+    day = start
+    while day <= end:
+        booked = booked_by_day.get(day.isoformat(), 0)
+        calendar.append({
+            "date": day.isoformat(),
+            "capacity": capacity,
+            "booked": booked,
+            "available": max(capacity - booked, 0),
+        })
+        day += timedelta(days=1)
+    return calendar
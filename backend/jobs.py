@@ -0,0 +1,418 @@
+"""Durable background jobs for side effects that shouldn't hold up a request.
+
+Jobs are documents in the ``jobs`` collection, so they survive restarts and
+any worker can run them. A runner claims a due job with one
+find_one_and_update that leases it for JOB_LEASE_SECONDS. If the worker dies
+mid-job, the lease runs out and another runner picks the job up again. Delivery
+is at least once, so handlers must be safe to repeat. A failed job is retried
+with exponential backoff until it has made JOB_MAX_ATTEMPTS attempts; after that
+it is parked as failed, and ``python jobs.py --retry-failed`` queues it again.
+
+Periodic jobs get one document per period, keyed by type and period start.
+Every runner can schedule them, yet each period runs once.
+
+By default every API worker runs the jobs. To run them in a dedicated process
+instead, set JOB_RUNNER_ENABLED=false on the API workers and start
+``python jobs.py``.
+"""
+import argparse
+import asyncio
+import logging
+import math
+import os
+import socket
+import time
+from datetime import date, datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from database import db, bookings_collection, transfers_collection, contacts_collection, tours_collection, close_client
+from mailer import send_email, MailRejected, OPERATOR_EMAIL
+from rollups import record_status_change, TRANSFER_BOOKINGS
+from fleet import prune_schedule
+
+logger = logging.getLogger(__name__)
+
+JOBS_COLLECTION = "jobs"
+jobs_collection = db[JOBS_COLLECTION]
+
+JOB_RUNNER_ENABLED = os.environ.get("JOB_RUNNER_ENABLED", "true").lower() == "true"
+# Jobs run at the same time by one runner
+JOB_CONCURRENCY = int(os.environ.get("JOB_CONCURRENCY", "4"))
+# How often idle runners look for due jobs queued by other workers
+JOB_POLL_SECONDS = float(os.environ.get("JOB_POLL_INTERVAL_MS", "1000")) / 1000
+# A job running longer than this is timed out and may be claimed by another runner
+JOB_LEASE_SECONDS = float(os.environ.get("JOB_LEASE_SECONDS", "60"))
+JOB_MAX_ATTEMPTS = int(os.environ.get("JOB_MAX_ATTEMPTS", "5"))
+# How long shutdown waits for running jobs before leaving them to lease expiry
+JOB_STOP_GRACE_SECONDS = float(os.environ.get("JOB_STOP_GRACE_SECONDS", "10"))
+# How often arrived transfers are moved to completed
+AUTO_COMPLETE_INTERVAL_SECONDS = float(os.environ.get("AUTO_COMPLETE_INTERVAL_SECONDS", "3600"))
+# How often finished service windows are dropped from the fleet schedule
+FLEET_PRUNE_INTERVAL_SECONDS = float(os.environ.get("FLEET_PRUNE_INTERVAL_SECONDS", "86400"))
+
+# Delay before the second attempt, doubled for every further one up to the max
+RETRY_SECONDS = 5.0
+MAX_RETRY_SECONDS = 3600.0
+
+# Job states
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+# Job types
+BOOKING_CONFIRMATION = "booking_confirmation"
+TRANSFER_CONFIRMATION = "transfer_confirmation"
+CONTACT_NOTIFICATION = "contact_notification"
+COMPLETE_ARRIVED_TRANSFERS = "complete_arrived_transfers"
+PRUNE_FLEET_SCHEDULE = "prune_fleet_schedule"
+
+# Transfer statuses moved to completed once the arrival day has passed
+AUTO_COMPLETE_FROM = ["pending", "confirmed"]
+
+Handler = Callable[[dict], Awaitable[None]]
+HANDLERS: Dict[str, Handler] = {}
+# Job type -> period in seconds
+PERIODIC_JOBS: Dict[str, float] = {
+    COMPLETE_ARRIVED_TRANSFERS: AUTO_COMPLETE_INTERVAL_SECONDS,
+    PRUNE_FLEET_SCHEDULE: FLEET_PRUNE_INTERVAL_SECONDS,
+}
+
+
+class PermanentJobError(Exception):
+    """The job can never succeed; it is failed without further attempts"""
+
+
+def job_handler(job_type: str):
+    """Register the coroutine that runs jobs of a type; it receives the job payload"""
+    def register(handler: Handler) -> Handler:
+        HANDLERS[job_type] = handler
+        return handler
+    return register
+
+
+def _job_document(job_type: str, payload: dict, run_at: Optional[datetime] = None) -> dict:
+    now = datetime.utcnow()
+    return {
+        "type": job_type,
+        "payload": payload,
+        "status": QUEUED,
+        "attempts": 0,
+        "run_at": run_at or now,
+        "created_at": now,
+        "updated_at": now,
+    }
+
+
+def retry_delay(attempts: int) -> float:
+    return min(RETRY_SECONDS * 2 ** (attempts - 1), MAX_RETRY_SECONDS)
+
+
+class JobRunner:
+    """Claims due jobs and runs up to ``concurrency`` of them at a time"""
+
+    def __init__(self, collection, handlers: Dict[str, Handler] = HANDLERS,
+                 periodic: Dict[str, float] = PERIODIC_JOBS, concurrency: int = JOB_CONCURRENCY,
+                 poll_interval: float = JOB_POLL_SECONDS, lease: float = JOB_LEASE_SECONDS,
+                 max_attempts: int = JOB_MAX_ATTEMPTS):
+        self.collection = collection
+        self.handlers = handlers
+        self.periodic = periodic
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.lease = lease
+        self.max_attempts = max_attempts
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+
+        self._wake = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+        self._stopping = False
+
+        self.running = 0
+        self.succeeded = 0
+        self.retried = 0
+        self.failed = 0
+
+    def wake(self) -> None:
+        """Look for jobs now instead of at the next poll"""
+        self._wake.set()
+
+    async def enqueue_many(self, job_type: str, payloads: List[dict], run_at: Optional[datetime] = None) -> None:
+        """Queue one job per payload.
+
+        Best effort, like the rollups: a failure is logged and never fails the
+        request that caused it.
+        """
+        if not payloads:
+            return
+        try:
+            await self.collection.insert_many(
+                [_job_document(job_type, payload, run_at) for payload in payloads], ordered=False
+            )
+        except Exception as e:
+            logger.error(f"Queueing {len(payloads)} {job_type} jobs failed: {str(e)}")
+            return
+        self.wake()
+
+    async def claim(self) -> Optional[dict]:
+        """Lease the next due job, or one whose runner's lease ran out"""
+        now = datetime.utcnow()
+        return await self.collection.find_one_and_update(
+            {"$or": [
+                {"status": QUEUED, "run_at": {"$lte": now}},
+                {"status": RUNNING, "locked_until": {"$lt": now}},
+            ]},
+            {
+                "$set": {"status": RUNNING, "locked_by": self.worker_id,
+                         "locked_until": now + timedelta(seconds=self.lease), "updated_at": now},
+                "$inc": {"attempts": 1},
+            },
+            sort=[("run_at", 1)],
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def _finish(self, job: dict, update: dict) -> None:
+        # Only while we still hold the lease; an expired job may be running elsewhere
+        update.update({"locked_by": None, "locked_until": None, "updated_at": datetime.utcnow()})
+        await self.collection.update_one(
+            {"_id": job["_id"], "locked_by": self.worker_id, "attempts": job["attempts"]},
+            {"$set": update},
+        )
+
+    async def run_job(self, job: dict) -> None:
+        handler = self.handlers.get(job["type"])
+        try:
+            if handler is None:
+                raise PermanentJobError(f"No handler for job type {job['type']}")
+            if job["attempts"] > self.max_attempts:
+                # Only reachable through expired leases, e.g. a job that keeps killing its worker
+                raise PermanentJobError(f"Lease expired on all {self.max_attempts} attempts")
+            await asyncio.wait_for(handler(job["payload"]), self.lease)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            error = str(e) or type(e).__name__
+            if isinstance(e, PermanentJobError) or job["attempts"] >= self.max_attempts:
+                self.failed += 1
+                logger.error(f"Job {job['_id']} ({job['type']}) failed after {job['attempts']} attempts: {error}")
+                await self._finish(job, {"status": FAILED, "last_error": error, "finished_at": datetime.utcnow()})
+            else:
+                self.retried += 1
+                delay = retry_delay(job["attempts"])
+                logger.warning(f"Job {job['_id']} ({job['type']}) failed, retrying in {delay:.0f}s: {error}")
+                await self._finish(job, {"status": QUEUED, "last_error": error,
+                                         "run_at": datetime.utcnow() + timedelta(seconds=delay)})
+            return
+        self.succeeded += 1
+        await self._finish(job, {"status": DONE, "finished_at": datetime.utcnow()})
+
+    async def _work(self) -> None:
+        while not self._stopping:
+            try:
+                job = await self.claim()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Claiming a job failed: {str(e)}")
+                job = None
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wake.clear()
+                continue
+            self.running += 1
+            try:
+                await self.run_job(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Recording the outcome of job {job['_id']} failed: {str(e)}")
+            finally:
+                self.running -= 1
+
+    async def schedule_periodic(self, now: Optional[float] = None) -> None:
+        """Queue the current period's run of every periodic job, once across all workers"""
+        now = time.time() if now is None else now
+        for job_type, period in self.periodic.items():
+            started = datetime.utcfromtimestamp(math.floor(now / period) * period)
+            document = _job_document(job_type, {}, run_at=started)
+            try:
+                await self.collection.update_one(
+                    {"_id": f"{job_type}:{started.isoformat()}"}, {"$setOnInsert": document}, upsert=True
+                )
+            except DuplicateKeyError:
+                pass  # another worker scheduled it at the same moment
+
+    async def _schedule(self) -> None:
+        while not self._stopping:
+            try:
+                await self.schedule_periodic()
+                self.wake()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Scheduling periodic jobs failed: {str(e)}")
+            now = time.time()
+            next_period = min(
+                (math.floor(now / period) + 1) * period - now for period in self.periodic.values()
+            ) if self.periodic else self.poll_interval
+            await asyncio.sleep(max(next_period, self.poll_interval))
+
+    async def start(self) -> None:
+        if self._tasks:
+            return
+        self._stopping = False
+        self._wake = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.concurrency)]
+        self._tasks.append(asyncio.create_task(self._schedule()))
+
+    async def stop(self, grace: float = JOB_STOP_GRACE_SECONDS) -> None:
+        """Let running jobs finish for up to ``grace`` seconds; the rest are rerun after their lease"""
+        if not self._tasks:
+            return
+        self._stopping = True
+        self.wake()
+        _, still_running = await asyncio.wait(self._tasks, timeout=grace)
+        for task in still_running:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "succeeded": self.succeeded,
+            "retried": self.retried,
+            "failed": self.failed,
+        }
+
+
+job_runner = JobRunner(jobs_collection)
+
+
+async def enqueue(job_type: str, payload: dict, run_at: Optional[datetime] = None) -> None:
+    """Queue a job; runs as soon as a runner is free, or at ``run_at``"""
+    await job_runner.enqueue_many(job_type, [payload], run_at)
+
+
+async def enqueue_many(job_type: str, payloads: List[dict], run_at: Optional[datetime] = None) -> None:
+    await job_runner.enqueue_many(job_type, payloads, run_at)
+
+
+async def _load(collection, document_id: str, label: str) -> dict:
+    document = await collection.find_one({"_id": ObjectId(document_id)})
+    if document is None:
+        raise PermanentJobError(f"{label} {document_id} no longer exists")
+    return document
+
+
+async def _mail(to: str, subject: str, body: str, reply_to: Optional[str] = None) -> None:
+    try:
+        await send_email(to, subject, body, reply_to)
+    except MailRejected as e:
+        raise PermanentJobError(str(e))
+
+
+@job_handler(BOOKING_CONFIRMATION)
+async def send_booking_confirmation(payload: dict) -> None:
+    booking = await _load(bookings_collection, payload["booking_id"], "Booking")
+    tour = await tours_collection.find_one({"_id": ObjectId(booking["tour_id"])}, {"title": 1}) or {}
+    title = tour.get("title", "your tour")
+    await _mail(
+        booking["email"],
+        f"Booking received: {title}",
+        f"Hello {booking['customer_name']},\n\n"
+        f"We have received your booking for {title} on {booking['booking_date']} "
+        f"for {booking['guests']} guest(s). We will confirm it shortly.\n\n"
+        f"Booking reference: {booking['_id']}\n\nZanzibar Explore Tours",
+    )
+
+
+@job_handler(TRANSFER_CONFIRMATION)
+async def send_transfer_confirmation(payload: dict) -> None:
+    booking = await _load(transfers_collection, payload["booking_id"], "Transfer booking")
+    vehicles = ", ".join(booking.get("vehicle_units") or [booking["vehicle_type"]])
+    await _mail(
+        booking["email"],
+        f"Transfer booked: flight {booking['flight_number']} on {booking['arrival_date']}",
+        f"Hello {booking['customer_name']},\n\n"
+        f"Your driver will meet flight {booking['flight_number']} on {booking['arrival_date']} "
+        f"at {booking['arrival_time']} and take {booking['passengers']} passenger(s) to "
+        f"{booking['destination']} ({vehicles}).\n\n"
+        f"Booking reference: {booking['_id']}\n\nZanzibar Explore Tours",
+    )
+
+
+@job_handler(CONTACT_NOTIFICATION)
+async def notify_operators_of_contact(payload: dict) -> None:
+    contact = await _load(contacts_collection, payload["contact_id"], "Contact")
+    await _mail(
+        OPERATOR_EMAIL,
+        f"New inquiry: {contact['subject']}",
+        f"From: {contact['name']} <{contact['email']}> {contact.get('phone', '')}\n\n{contact['message']}",
+        reply_to=contact["email"],
+    )
+
+
+@job_handler(COMPLETE_ARRIVED_TRANSFERS)
+async def complete_arrived_transfers(payload: dict) -> None:
+    # Arrival days are ISO strings, which sort in date order
+    today = date.today().isoformat()
+    for from_status in AUTO_COMPLETE_FROM:
+        result = await transfers_collection.update_many(
+            {"arrival_date": {"$lt": today}, "status": from_status},
+            {"$set": {"status": "completed"}},
+        )
+        if result.modified_count:
+            logger.info(f"Completed {result.modified_count} {from_status} transfers that arrived before {today}")
+            await record_status_change(TRANSFER_BOOKINGS, from_status, "completed", result.modified_count)
+
+
+@job_handler(PRUNE_FLEET_SCHEDULE)
+async def prune_fleet_schedule(payload: dict) -> None:
+    # Windows are kept a day past their end; nothing books into the past
+    pruned = await prune_schedule(datetime.combine(date.today() - timedelta(days=1), datetime.min.time()))
+    if pruned:
+        logger.info(f"Dropped finished service windows from {pruned} vehicle schedules")
+
+
+async def retry_failed(job_type: Optional[str] = None) -> int:
+    """Queue failed jobs again with a fresh set of attempts"""
+    query = {"status": FAILED}
+    if job_type:
+        query["type"] = job_type
+    result = await jobs_collection.update_many(query, {"$set": {
+        "status": QUEUED, "attempts": 0, "run_at": datetime.utcnow(), "updated_at": datetime.utcnow(),
+    }})
+    return result.modified_count
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Run background jobs in a dedicated process")
+    parser.add_argument("--retry-failed", action="store_true", help="queue failed jobs again and exit")
+    parser.add_argument("--type", help="only retry jobs of this type")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+
+    try:
+        if args.retry_failed:
+            print(f"Queued {await retry_failed(args.type)} failed jobs again")
+            return
+        await job_runner.start()
+        await asyncio.Event().wait()
+    finally:
+        await job_runner.stop()
+        close_client()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,59 @@
+"""Outgoing email over SMTP.
+
+With SMTP_HOST unset, messages are logged instead of sent, which is enough
+for development. smtplib blocks, so sending runs in a worker thread.
+"""
+import asyncio
+import logging
+import os
+import smtplib
+from email.message import EmailMessage
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+SMTP_HOST = os.environ.get("SMTP_HOST", "")
+SMTP_PORT = int(os.environ.get("SMTP_PORT", "25"))
+SMTP_USERNAME = os.environ.get("SMTP_USERNAME", "")
+SMTP_PASSWORD = os.environ.get("SMTP_PASSWORD", "")
+SMTP_STARTTLS = os.environ.get("SMTP_STARTTLS", "false").lower() == "true"
+SMTP_TIMEOUT_SECONDS = float(os.environ.get("SMTP_TIMEOUT_SECONDS", "10"))
+MAIL_FROM = os.environ.get("MAIL_FROM", "bookings@zanzibarexploretours.com")
+# Where new inquiries are announced
+OPERATOR_EMAIL = os.environ.get("OPERATOR_EMAIL", MAIL_FROM)
+
+
+class MailRejected(Exception):
+    """The server refused the message permanently (5xx); sending it again won't help"""
+
+
+def _send(message: EmailMessage) -> None:
+    with smtplib.SMTP(SMTP_HOST, SMTP_PORT, timeout=SMTP_TIMEOUT_SECONDS) as smtp:
+        if SMTP_STARTTLS:
+            smtp.starttls()
+        if SMTP_USERNAME:
+            smtp.login(SMTP_USERNAME, SMTP_PASSWORD)
+        try:
+            smtp.send_message(message)
+        except smtplib.SMTPRecipientsRefused as e:
+            raise MailRejected(f"Recipients refused: {', '.join(e.recipients)}")
+        except smtplib.SMTPResponseException as e:
+            if e.smtp_code >= 500:
+                raise MailRejected(f"{e.smtp_code} {e.smtp_error!r}")
+            raise
+
+
+async def send_email(to: str, subject: str, body: str, reply_to: Optional[str] = None) -> None:
+    """Send a plain text email; transient failures raise, permanent ones raise MailRejected"""
+    message = EmailMessage()
+    message["From"] = MAIL_FROM
+    message["To"] = to
+    message["Subject"] = subject
+    if reply_to:
+        message["Reply-To"] = reply_to
+    message.set_content(body)
+
+    if not SMTP_HOST:
+        logger.info(f"SMTP_HOST not set, not sending mail to {to}: {subject}")
+        return
+    await asyncio.to_thread(_send, message)
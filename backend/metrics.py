@@ -0,0 +1,226 @@
+import os
+import threading
+import time
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import Request
+from pymongo import monitoring
+
+# Add a Server-Timing header with the request's time split per phase
+SERVER_TIMING = os.environ.get("SERVER_TIMING", "false").lower() == "true"
+
+# Histogram bucket upper bounds, in seconds
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Request phases timed outside the handler itself
+MONGO = "mongo"
+POOL_WAIT = "pool_wait"
+SERIALIZE = "serialize"
+
+# Time spent per phase by the request being handled. Motor copies the context
+# into its executor threads, so the command listeners add to the same dict.
+_request_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("request_timings", default=None)
+
+
+def record_time(phase: str, seconds: float) -> None:
+    """Add time spent in a phase to the current request, if there is one"""
+    timings = _request_timings.get()
+    if timings is not None:
+        timings[phase] = timings.get(phase, 0.0) + seconds
+
+
+class Histogram:
+    """Prometheus-style cumulative histogram with one series per label set"""
+
+    def __init__(self, name: str, documentation: str, label_names: Tuple[str, ...],
+                 buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series: Dict[tuple, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels: tuple, value: float) -> None:
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                # bucket counts, then +Inf count and sum
+                series = self._series[labels] = [0.0] * (len(self.buckets) + 2)
+            for position, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[position] += 1
+            series[-2] += 1
+            series[-1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {labels: list(values) for labels, values in self._series.items()}
+        for labels, values in sorted(series.items()):
+            label_text = ",".join(
+                f'{name}="{_escape(value)}"' for name, value in zip(self.label_names, labels)
+            )
+            prefix = label_text + "," if label_text else ""
+            for bound, count in zip(self.buckets, values):
+                lines.append(f'{self.name}_bucket{{{prefix}le="{bound}"}} {int(count)}')
+            lines.append(f'{self.name}_bucket{{{prefix}le="+Inf"}} {int(values[-2])}')
+            suffix = f"{{{label_text}}}" if label_text else ""
+            lines.append(f"{self.name}_count{suffix} {int(values[-2])}")
+            lines.append(f"{self.name}_sum{suffix} {values[-1]}")
+        return lines
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "Time to response headers per route",
+    ("method", "route", "status"),
+)
+REQUEST_MONGO_SECONDS = Histogram(
+    "http_request_mongo_seconds", "MongoDB command time per request and route",
+    ("method", "route"),
+)
+MONGO_COMMAND_SECONDS = Histogram(
+    "mongo_command_duration_seconds", "MongoDB command round trips per collection and command",
+    ("collection", "command", "outcome"),
+)
+POOL_WAIT_SECONDS = Histogram(
+    "mongo_pool_wait_seconds", "Time spent waiting to check a connection out of the pool", (),
+)
+
+
+class CommandMetrics(monitoring.CommandListener):
+    """Times every MongoDB command per collection and adds it to the current request"""
+
+    def __init__(self):
+        self._pending: Dict[tuple, Tuple[str, str]] = {}
+        # Duration of the most recently finished command, for the health probes
+        self.last_seconds: Optional[float] = None
+
+    def started(self, event):
+        target = event.command.get(event.command_name)
+        if not isinstance(target, str):
+            target = event.command.get("collection", "")
+        self._pending[(event.connection_id, event.request_id)] = (target, event.command_name)
+
+    def _finished(self, event, outcome: str):
+        collection, command = self._pending.pop(
+            (event.connection_id, event.request_id), ("", event.command_name)
+        )
+        seconds = event.duration_micros / 1_000_000
+        self.last_seconds = seconds
+        MONGO_COMMAND_SECONDS.observe((collection, command, outcome), seconds)
+        record_time(MONGO, seconds)
+
+    def succeeded(self, event):
+        self._finished(event, "ok")
+
+    def failed(self, event):
+        self._finished(event, "error")
+
+
+class PoolWaitMetrics(monitoring.ConnectionPoolListener):
+    """Times connection checkouts; start and finish events fire on the same thread"""
+
+    def __init__(self):
+        self._started = threading.local()
+
+    def connection_check_out_started(self, event):
+        self._started.at = time.perf_counter()
+
+    def _checked_out(self):
+        started = getattr(self._started, "at", None)
+        if started is None:
+            return
+        self._started.at = None
+        seconds = time.perf_counter() - started
+        POOL_WAIT_SECONDS.observe((), seconds)
+        record_time(POOL_WAIT, seconds)
+
+    def connection_checked_out(self, event):
+        self._checked_out()
+
+    def connection_check_out_failed(self, event):
+        self._checked_out()
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        pass
+
+    def connection_checked_in(self, event):
+        pass
+
+
+command_metrics = CommandMetrics()
+pool_wait_metrics = PoolWaitMetrics()
+
+_route_templates: Dict[object, str] = {}
+
+
+def _route_label(request: Request) -> str:
+    """Path template of the matched route, so ids don't create new series"""
+    endpoint = request.scope.get("endpoint")
+    if endpoint is None:
+        return "unmatched"
+    if not _route_templates:
+        for route in request.app.routes:
+            if hasattr(route, "endpoint"):
+                _route_templates.setdefault(route.endpoint, getattr(route, "path", ""))
+    return _route_templates.get(endpoint, "unmatched")
+
+
+def _server_timing(total: float, timings: Dict[str, float]) -> str:
+    entries = [f"{phase};dur={seconds * 1000:.2f}" for phase, seconds in timings.items()]
+    entries.append(f"app;dur={total * 1000:.2f}")
+    return ", ".join(entries)
+
+
+async def metrics_middleware(request: Request, call_next):
+    """Record latency per route and add Server-Timing when enabled"""
+    timings: Dict[str, float] = {}
+    token = _request_timings.set(timings)
+    started = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        _request_timings.reset(token)
+    total = time.perf_counter() - started
+
+    route = _route_label(request)
+    REQUEST_SECONDS.observe((request.method, route, str(response.status_code)), total)
+    REQUEST_MONGO_SECONDS.observe((request.method, route), timings.get(MONGO, 0.0))
+    if SERVER_TIMING:
+        response.headers["Server-Timing"] = _server_timing(total, timings)
+    return response
+
+
+def render_metrics(gauges: Dict[str, float]) -> str:
+    """Every histogram plus point-in-time gauges in Prometheus text format"""
+    lines = []
+    for histogram in (REQUEST_SECONDS, REQUEST_MONGO_SECONDS, MONGO_COMMAND_SECONDS, POOL_WAIT_SECONDS):
+        lines.extend(histogram.render())
+    for name, value in gauges.items():
+        lines.append(f"# TYPE {name} gauge")
+        lines.append(f"{name} {value}")
+    return "\n".join(lines) + "\n"
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, EmailStr
-from typing import List, Optional, Any
+from typing import Dict, List, Optional, Any
 from datetime import datetime, date, time
 from bson import ObjectId
 
@@ -20,6 +20,29 @@ class PyObjectId(ObjectId):
         return {"type": "string"}
 
 
+def mongo_document(model: BaseModel) -> dict:
+    """Dump a model for insertion into MongoDB.
+
+    BSON has no date-only or time-of-day type, so those are stored as ISO
+    strings. Datetimes are truncated to milliseconds, the precision MongoDB
+    keeps, so the in-memory model matches the stored document exactly.
+    """
+    document = model.dict(by_alias=True, exclude={"id"})
+    for key, value in document.items():
+        if isinstance(value, datetime):
+            millis = value.microsecond // 1000 * 1000
+            value = value.replace(microsecond=millis)
+            setattr(model, key, value)
+            document[key] = value
+        elif isinstance(value, (date, time)):
+            document[key] = value.isoformat()
+    return document
+
+
+# Seats sold per tour per day unless a tour sets its own capacity
+DEFAULT_TOUR_CAPACITY = 20
+
+
 # Tour Models
 class Tour(BaseModel):
     id: PyObjectId = Field(default_factory=PyObjectId, alias="_id")
@@ -30,6 +53,7 @@ class Tour(BaseModel):
     duration: str
     category: str  # water, cultural, nature, safari
     features: List[str] = []
+    capacity: int = DEFAULT_TOUR_CAPACITY  # guests per day
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
@@ -47,6 +71,13 @@ class TourCreate(BaseModel):
     duration: str
     category: str
     features: List[str] = []
+    capacity: int = DEFAULT_TOUR_CAPACITY
+
+
+class TourSearchResult(BaseModel):
+    total: int
+    results: List[Tour]  # best match first
+    facets: Dict[str, Dict[str, int]]  # facet -> value -> matching tours
 
 
 # Booking Models
@@ -68,13 +99,20 @@ class Booking(BaseModel):
         json_encoders = {ObjectId: str}
 
 
+class DayAvailability(BaseModel):
+    date: date
+    capacity: int
+    booked: int
+    available: int
+
+
 class BookingCreate(BaseModel):
     tour_id: str
     customer_name: str
     email: EmailStr
     phone: str
     booking_date: date
-    guests: int
+    guests: int = Field(gt=0)
     special_requests: Optional[str] = ""
 
 
@@ -111,6 +149,7 @@ class Vehicle(BaseModel):
     price: float
     features: List[str]
     capacity: int
+    fleet_size: int = 1  # vehicles of this type in the fleet
     available: bool = True
 
     class Config:
@@ -131,6 +170,8 @@ class TransferBooking(BaseModel):
     vehicle_type: str
     destination: str
     special_requests: Optional[str] = ""
+    vehicle_units: List[str] = []  # individual vehicles assigned by the fleet scheduler
+    allocation: List["VehicleAllocation"] = []  # per-vehicle split for large parties
     status: str = "pending"  # pending, confirmed, completed
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
@@ -147,10 +188,35 @@ class TransferBookingCreate(BaseModel):
     flight_number: str
     arrival_date: date
     arrival_time: time
-    passengers: int
+    passengers: int = Field(ge=1)
     vehicle_type: str
     destination: str
     special_requests: Optional[str] = ""
+    split: bool = False  # spread the party over the cheapest set of free vehicles
+
+
+class VehicleAllocation(BaseModel):
+    vehicle_type: str
+    vehicle_unit: str
+    capacity: int
+    price: float
+    passengers: int
+
+
+class TransferQuoteRequest(BaseModel):
+    arrival_date: date
+    arrival_time: time
+    passengers: int = Field(ge=1)
+    destination: str
+
+
+class TransferQuote(BaseModel):
+    passengers: int
+    total_price: float
+    vehicles: List[VehicleAllocation]
+
+
+TransferBooking.model_rebuild()
 
 
 # Gallery Models
@@ -172,4 +238,105 @@ class GalleryImageCreate(BaseModel):
     url: str
     category: str
     title: str
-    alt_text: str
\ No newline at end of file
+    alt_text: str
+
+
+# Batch Models
+MAX_BATCH_SIZE = 500
+
+
+class BatchItemResult(BaseModel):
+    index: int  # position in the request list
+    id: Optional[str] = None
+    status_code: int
+    error: Optional[str] = None
+
+
+class BatchResult(BaseModel):
+    created: int
+    failed: int
+    results: List[BatchItemResult]
+
+
+# Bulk Status Models
+class TransferStatusFilter(BaseModel):
+    status: Optional[str] = None
+    vehicle_type: Optional[str] = None
+    arrival_date: Optional[date] = None
+    arrival_before: Optional[date] = None  # arrival day strictly before this one
+
+
+class TransferStatusUpdate(BaseModel):
+    status: str  # target status
+    ids: Optional[List[str]] = None
+    filter: Optional[TransferStatusFilter] = None
+
+
+class ContactStatusFilter(BaseModel):
+    status: Optional[str] = None
+    created_before: Optional[datetime] = None
+
+
+class ContactStatusUpdate(BaseModel):
+    status: str  # target status
+    ids: Optional[List[str]] = None
+    filter: Optional[ContactStatusFilter] = None
+
+
+class StatusChangeResult(BaseModel):
+    id: str
+    status_code: int  # 200 moved or already there, 400/404 bad ID, 409 transition not allowed
+    previous_status: Optional[str] = None
+    error: Optional[str] = None
+
+
+class BulkStatusResult(BaseModel):
+    updated: int
+    unchanged: int
+    failed: int
+    results: List[StatusChangeResult]
+
+
+# Admin Stats Models
+class TourDailyStats(BaseModel):
+    tour_id: str
+    date: date
+    bookings: int
+    guests: int
+    revenue: float
+
+
+class TransferDailyStats(BaseModel):
+    vehicle_type: str
+    date: date
+    bookings: int
+    vehicles: int
+    passengers: int
+    revenue: float
+
+
+class TourTotals(BaseModel):
+    tour_id: str
+    title: Optional[str] = None
+    bookings: int
+    guests: int
+    revenue: float
+
+
+class VehicleTypeTotals(BaseModel):
+    vehicle_type: str
+    bookings: int
+    vehicles: int
+    passengers: int
+    revenue: float
+
+
+class AdminStats(BaseModel):
+    start: Optional[date] = None
+    end: Optional[date] = None
+    bookings: int
+    guests: int
+    revenue: float
+    tours: List[TourTotals]
+    transfers: List[VehicleTypeTotals]
+    funnel: Dict[str, Dict[str, int]]  # collection -> status -> documents
@@ -0,0 +1,102 @@
+import base64
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from bson import ObjectId
+from fastapi import HTTPException, status
+
+from serialization import LeanJSONResponse
+
+# Response header carrying the cursor for the next page
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+
+ASCENDING = 1
+DESCENDING = -1
+
+
+def encode_cursor(document: dict) -> str:
+    """Encode the (created_at, _id) position of a document as an opaque cursor"""
+    raw = f"{document['created_at'].isoformat()}|{document['_id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, ObjectId]:
+    """Decode a cursor produced by encode_cursor"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        created_at, object_id = raw.split("|", 1)
+        return datetime.fromisoformat(created_at), ObjectId(object_id)
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+
+def keyset_query(query: dict, cursor: Optional[str], direction: int = DESCENDING) -> dict:
+    """Restrict a query to the documents after the cursor position"""
+    if not cursor:
+        return query
+
+    created_at, object_id = decode_cursor(cursor)
+    op = "$lt" if direction == DESCENDING else "$gt"
+    after_cursor = {"$or": [
+        {"created_at": {op: created_at}},
+        {"created_at": created_at, "_id": {op: object_id}},
+    ]}
+    return {"$and": [query, after_cursor]} if query else after_cursor
+
+
+def date_range(field: str, start: Optional[datetime], end: Optional[datetime]) -> dict:
+    """Build a range filter on a field, skipping open bounds"""
+    bounds = {}
+    if start is not None:
+        bounds["$gte"] = start
+    if end is not None:
+        bounds["$lte"] = end
+    return {field: bounds} if bounds else {}
+
+
+def find_sorted(
+    collection,
+    query: dict,
+    cursor: Optional[str],
+    direction: int = DESCENDING,
+    projection: Optional[dict] = None,
+):
+    """Motor cursor over the documents after the cursor position, in page order"""
+    return collection.find(keyset_query(query, cursor, direction), projection) \
+        .sort([("created_at", direction), ("_id", direction)])
+
+
+async def fetch_page(
+    collection,
+    query: dict,
+    cursor: Optional[str],
+    limit: int,
+    direction: int = DESCENDING,
+    projection: Optional[dict] = None,
+) -> Tuple[List[dict], Optional[str]]:
+    """Fetch one page of documents ordered by (created_at, _id).
+
+    Returns the documents and the cursor for the following page, or None when
+    this is the last page. One extra document is read to detect the end.
+    """
+    documents = await find_sorted(collection, query, cursor, direction, projection) \
+        .limit(limit + 1) \
+        .to_list(limit + 1)
+
+    next_cursor = None
+    if len(documents) > limit:
+        documents = documents[:limit]
+        next_cursor = encode_cursor(documents[-1])
+    return documents, next_cursor
+
+
+def page_response(content, next_cursor: Optional[str]) -> LeanJSONResponse:
+    """Build a JSON response for one page, with the next cursor header when set"""
+    headers = {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else None
+    return LeanJSONResponse(content, headers=headers)
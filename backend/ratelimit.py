@@ -0,0 +1,171 @@
+import math
+import os
+import re
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import orjson
+from fastapi import Request
+from fastapi.responses import JSONResponse
+from pymongo import ReturnDocument
+
+RATE_LIMIT_ENABLED = os.environ.get("RATE_LIMIT_ENABLED", "true").lower() == "true"
+# "memory" keeps buckets per worker; "mongo" shares them between workers
+RATE_LIMIT_BACKEND = os.environ.get("RATE_LIMIT_BACKEND", "memory")
+# Take the client address from X-Forwarded-For (only behind a trusted proxy)
+TRUST_FORWARDED_FOR = os.environ.get("TRUST_FORWARDED_FOR", "false").lower() == "true"
+RATE_LIMIT_COLLECTION = "rate_limits"
+
+# (path pattern, requests per minute, burst) for public POST routes
+RATE_RULES = [
+    (re.compile(r"^/api/contact/?$"), 10, 5),
+    (re.compile(r"^/api/tours/bookings(/batch)?$"), 30, 10),
+    (re.compile(r"^/api/transfers/bookings(/batch)?$"), 30, 10),
+]
+
+# Buckets idle this long are full again and can be forgotten
+BUCKET_IDLE_SECONDS = 600
+MAX_MEMORY_BUCKETS = 100_000
+
+
+class MemoryBucketStore:
+    """Token buckets held by this worker"""
+
+    def __init__(self, max_buckets: int = MAX_MEMORY_BUCKETS):
+        self.max_buckets = max_buckets
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+
+    def _sweep(self, now: float) -> None:
+        idle = [key for key, (_, updated) in self._buckets.items() if now - updated > BUCKET_IDLE_SECONDS]
+        for key in idle:
+            del self._buckets[key]
+        # Still full of active clients: drop the longest idle half
+        if len(self._buckets) >= self.max_buckets:
+            by_age = sorted(self._buckets, key=lambda key: self._buckets[key][1])
+            for key in by_age[:len(by_age) // 2]:
+                del self._buckets[key]
+
+    async def take(self, key: str, rate: float, burst: int) -> Tuple[bool, float]:
+        """Take one token; returns (allowed, seconds until a token is available)"""
+        now = time.monotonic()
+        if len(self._buckets) >= self.max_buckets:
+            self._sweep(now)
+        tokens, updated = self._buckets.get(key, (float(burst), now))
+        tokens = min(float(burst), tokens + (now - updated) * rate)
+        if tokens >= 1:
+            self._buckets[key] = (tokens - 1, now)
+            return True, 0.0
+        self._buckets[key] = (tokens, now)
+        return False, (1 - tokens) / rate
+
+
+class MongoBucketStore:
+    """Token buckets shared by every worker, one document per key.
+
+    Refill and take happen in a single pipeline update, so concurrent
+    requests from several workers can't spend the same token twice.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def take(self, key: str, rate: float, burst: int) -> Tuple[bool, float]:
+        now = datetime.utcnow()
+        elapsed = {"$divide": [{"$subtract": [now, {"$ifNull": ["$updated_at", now]}]}, 1000]}
+        refilled = {"$min": [burst, {"$add": [{"$ifNull": ["$tokens", burst]}, {"$multiply": [elapsed, rate]}]}]}
+        bucket = await self.collection.find_one_and_update(
+            {"_id": key},
+            [
+                {"$set": {"tokens": refilled, "updated_at": now,
+                          "expires_at": now + timedelta(seconds=BUCKET_IDLE_SECONDS)}},
+                {"$set": {
+                    "allowed": {"$gte": ["$tokens", 1]},
+                    "tokens": {"$cond": [{"$gte": ["$tokens", 1]}, {"$subtract": ["$tokens", 1]}, "$tokens"]},
+                }},
+            ],
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        if bucket["allowed"]:
+            return True, 0.0
+        return False, (1 - bucket["tokens"]) / rate
+
+
+def create_store():
+    if RATE_LIMIT_BACKEND == "mongo":
+        from database import db
+        return MongoBucketStore(db[RATE_LIMIT_COLLECTION])
+    return MemoryBucketStore()
+
+
+class RateLimiter:
+    """Per-client token buckets for the routes in RATE_RULES"""
+
+    def __init__(self, store=None):
+        self.store = store or create_store()
+        self.allowed = 0
+        self.limited = 0
+
+    async def check(self, keys: List[str], per_minute: int, burst: int) -> Optional[float]:
+        """Take a token from every key's bucket; returns the Retry-After when any is empty"""
+        rate = per_minute / 60
+        retry_after = None
+        for key in keys:
+            allowed, wait = await self.store.take(key, rate, burst)
+            if not allowed:
+                retry_after = max(retry_after or 0.0, wait)
+        if retry_after is None:
+            self.allowed += 1
+        else:
+            self.limited += 1
+        return retry_after
+
+    def stats(self) -> dict:
+        return {"allowed": self.allowed, "limited": self.limited}
+
+
+rate_limiter = RateLimiter()
+
+
+def client_address(request: Request) -> str:
+    if TRUST_FORWARDED_FOR:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
+
+
+def _email(body: bytes) -> Optional[str]:
+    try:
+        payload = orjson.loads(body)
+    except orjson.JSONDecodeError:
+        return None
+    email = payload.get("email") if isinstance(payload, dict) else None
+    return email.strip().lower() if isinstance(email, str) else None
+
+
+async def rate_limit_middleware(request: Request, call_next):
+    """Answer 429 once a client address or email runs out of tokens on a public POST route"""
+    if not RATE_LIMIT_ENABLED or request.method != "POST":
+        return await call_next(request)
+
+    for pattern, per_minute, burst in RATE_RULES:
+        if pattern.match(request.url.path):
+            break
+    else:
+        return await call_next(request)
+
+    keys = [f"ip:{client_address(request)}:{pattern.pattern}"]
+    email = _email(await request.body())
+    if email:
+        keys.append(f"email:{email}:{pattern.pattern}")
+
+    retry_after = await rate_limiter.check(keys, per_minute, burst)
+    if retry_after is not None:
+        return JSONResponse(
+            status_code=429,
+            content={"detail": "Too many requests, please slow down"},
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+        )
+    return await call_next(request)
@@ -0,0 +1,231 @@
+"""Incrementally maintained reporting rollups for the admin stats endpoints.
+
+Every booking, transfer booking and contact write adds its counts to small
+per-day documents, so the dashboards read a few rows per day instead of
+rescanning the booking collections. Cancelled transfer bookings leave the
+daily rollups and rejoin them when reinstated. Rollup updates are best effort: a failed
+update is logged and never fails the request. Run
+``python rollups.py --rebuild`` to recompute every rollup from the source
+collections (e.g. after a backfill), ideally while writes are quiet.
+"""
+import argparse
+import asyncio
+import logging
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional
+
+from pymongo import UpdateOne
+
+from database import db, close_client
+
+logger = logging.getLogger(__name__)
+
+# Bookings, guests and revenue per tour per booking day
+TOUR_DAILY = "stats_tour_daily"
+# Bookings, vehicles, passengers and revenue per vehicle type per arrival day
+TRANSFER_DAILY = "stats_transfer_daily"
+# Documents per status for each collection
+STATUS_COUNTS = "stats_status"
+
+BOOKINGS = "bookings"
+TRANSFER_BOOKINGS = "transfer_bookings"
+CONTACTS = "contacts"
+
+# Bookings in this status are left out of the daily rollups
+CANCELLED = "cancelled"
+
+# Fields record_status_change needs to move a booking in or out of the daily rollups.
+# Tour bookings have no status endpoint, so only transfer bookings move
+ROLLUP_FIELDS: Dict[str, List[str]] = {
+    TRANSFER_BOOKINGS: ["arrival_date", "vehicle_type", "passengers", "allocation"],
+}
+
+
+def _day(value) -> str:
+    return value if isinstance(value, str) else value.isoformat()
+
+
+def _status_updates(kind: str, counts: Dict[str, int]) -> List[UpdateOne]:
+    return [
+        UpdateOne({"_id": f"{kind}:{status}"},
+                  {"$inc": {"count": count}, "$setOnInsert": {"kind": kind, "status": status}},
+                  upsert=True)
+        for status, count in counts.items() if count
+    ]
+
+
+async def _apply(collection_name: str, updates: List[UpdateOne]) -> None:
+    if not updates:
+        return
+    try:
+        await db[collection_name].bulk_write(updates, ordered=False)
+    except Exception as e:
+        logger.error(f"Updating {collection_name} rollup failed: {str(e)}")
+
+
+def _count_statuses(documents: Iterable[dict], default: str) -> Dict[str, int]:
+    statuses = defaultdict(int)
+    for document in documents:
+        statuses[document.get("status", default)] += 1
+    return statuses
+
+
+def _active(bookings: Iterable[dict]) -> List[dict]:
+    return [booking for booking in bookings if booking.get("status") != CANCELLED]
+
+
+def _tour_updates(bookings: Iterable[dict], prices: Dict[str, float], sign: int = 1) -> List[UpdateOne]:
+    """Daily rollup updates adding the bookings, or taking them away with sign -1"""
+    daily = defaultdict(lambda: {"bookings": 0, "guests": 0, "revenue": 0.0})
+    for booking in bookings:
+        row = daily[(booking["tour_id"], _day(booking["booking_date"]))]
+        row["bookings"] += sign
+        row["guests"] += sign * booking["guests"]
+        row["revenue"] += sign * prices.get(booking["tour_id"], 0.0) * booking["guests"]
+    return [
+        UpdateOne({"_id": f"{tour_id}:{day}"},
+                  {"$inc": row, "$setOnInsert": {"tour_id": tour_id, "date": day}},
+                  upsert=True)
+        for (tour_id, day), row in daily.items()
+    ]
+
+
+def _transfer_updates(bookings: Iterable[dict], prices: Dict[str, float], sign: int = 1) -> List[UpdateOne]:
+    """Daily rollup updates adding the bookings, or taking them away with sign -1"""
+    daily = defaultdict(lambda: {"bookings": 0, "vehicles": 0, "passengers": 0, "revenue": 0.0})
+    for booking in bookings:
+        day = _day(booking["arrival_date"])
+        # Bookings from before allocations were stored used one vehicle of the booked type
+        allocation = booking.get("allocation") or [{
+            "vehicle_type": booking["vehicle_type"], "passengers": booking["passengers"],
+            "price": prices.get(booking["vehicle_type"], 0.0),
+        }]
+        for vehicle_type in {vehicle["vehicle_type"] for vehicle in allocation}:
+            daily[(vehicle_type, day)]["bookings"] += sign
+        for vehicle in allocation:
+            row = daily[(vehicle["vehicle_type"], day)]
+            row["vehicles"] += sign
+            row["passengers"] += sign * vehicle["passengers"]
+            row["revenue"] += sign * vehicle["price"]
+    return [
+        UpdateOne({"_id": f"{vehicle_type}:{day}"},
+                  {"$inc": row, "$setOnInsert": {"vehicle_type": vehicle_type, "date": day}},
+                  upsert=True)
+        for (vehicle_type, day), row in daily.items()
+    ]
+
+
+async def record_tour_bookings(bookings: List[dict], prices: Dict[str, float]) -> None:
+    """Add created tour bookings to the rollups; prices are per guest by tour ID"""
+    await asyncio.gather(
+        _apply(TOUR_DAILY, _tour_updates(_active(bookings), prices)),
+        _apply(STATUS_COUNTS, _status_updates(BOOKINGS, _count_statuses(bookings, "pending"))),
+    )
+
+
+async def record_transfer_bookings(bookings: List[dict]) -> None:
+    """Add created transfer bookings to the rollups"""
+    await asyncio.gather(
+        _apply(TRANSFER_DAILY, _transfer_updates(_active(bookings), {})),
+        _apply(STATUS_COUNTS, _status_updates(TRANSFER_BOOKINGS, _count_statuses(bookings, "pending"))),
+    )
+
+
+async def record_contacts(contacts: List[dict]) -> None:
+    """Add written contacts to the status funnel"""
+    await _apply(STATUS_COUNTS, _status_updates(CONTACTS, _count_statuses(contacts, "new")))
+
+
+def rollup_projection(kind: str) -> Dict[str, int]:
+    """Projection reading a document's status and the fields its daily rollup needs"""
+    return {field: 1 for field in ["status"] + ROLLUP_FIELDS.get(kind, [])}
+
+
+async def _move_daily(kind: str, documents: List[dict], sign: int) -> None:
+    """Take cancelled transfer bookings out of the daily rollups (sign -1) or put reinstated ones back"""
+    try:
+        days = [_day(document["arrival_date"]) for document in documents]
+        # Only bookings from before allocations were stored are priced from the fleet
+        prices = {}
+        if any(not document.get("allocation") for document in documents):
+            prices = {vehicle["type"]: vehicle.get("price", 0.0)
+                      async for vehicle in db.vehicles.find({}, {"type": 1, "price": 1})}
+        updates = _transfer_updates(documents, prices, sign)
+    except Exception as e:
+        logger.error(f"Updating {kind} daily rollups failed: {str(e)}")
+        return
+    await _apply(TRANSFER_DAILY, updates)
+    if sign < 0 and updates:
+        # A rebuild has no row for a day left without bookings
+        try:
+            await db[TRANSFER_DAILY].delete_many({"date": {"$in": list(set(days))}, "bookings": {"$lte": 0}})
+        except Exception as e:
+            logger.error(f"Removing empty {TRANSFER_DAILY} rows failed: {str(e)}")
+
+
+async def record_status_change(kind: str, old_status: str, new_status: str, count: int = 1,
+                               documents: Optional[List[dict]] = None) -> None:
+    """Move documents between status counts.
+
+    Transfer bookings moving into or out of cancelled also leave or rejoin the daily
+    rollups; pass the moved ``documents`` with their ROLLUP_FIELDS for that.
+    """
+    if old_status == new_status:
+        return
+    updates = [_apply(STATUS_COUNTS, _status_updates(kind, {old_status: -count, new_status: count}))]
+    if documents and kind in ROLLUP_FIELDS and (old_status == CANCELLED) != (new_status == CANCELLED):
+        updates.append(_move_daily(kind, documents, -1 if new_status == CANCELLED else 1))
+    await asyncio.gather(*updates)
+
+
+async def _replace(collection_name: str, updates: List[UpdateOne]) -> None:
+    await db[collection_name].delete_many({})
+    if updates:
+        await db[collection_name].bulk_write(updates, ordered=False)
+
+
+async def rebuild_rollups() -> None:
+    """Recompute every rollup from the source collections"""
+    tour_prices = {str(tour["_id"]): tour.get("price", 0.0)
+                   async for tour in db.tours.find({}, {"price": 1})}
+    vehicle_prices = {vehicle["type"]: vehicle.get("price", 0.0)
+                      async for vehicle in db.vehicles.find({}, {"type": 1, "price": 1})}
+
+    bookings = [booking async for booking in db.bookings.find(
+        {}, {"status": 1, "tour_id": 1, "booking_date": 1, "guests": 1}
+    )]
+    tour_updates = _tour_updates(_active(bookings), tour_prices)
+    booking_statuses = _count_statuses(bookings, "pending")
+
+    transfers = [booking async for booking in db.transfer_bookings.find({}, rollup_projection(TRANSFER_BOOKINGS))]
+    transfer_updates = _transfer_updates(_active(transfers), vehicle_prices)
+    transfer_statuses = _count_statuses(transfers, "pending")
+
+    contact_statuses = {
+        group["_id"]: group["count"]
+        async for group in db.contacts.aggregate([{"$group": {"_id": "$status", "count": {"$sum": 1}}}])
+    }
+
+    await _replace(TOUR_DAILY, tour_updates)
+    await _replace(TRANSFER_DAILY, transfer_updates)
+    await _replace(STATUS_COUNTS,
+                   _status_updates(BOOKINGS, booking_statuses)
+                   + _status_updates(TRANSFER_BOOKINGS, transfer_statuses)
+                   + _status_updates(CONTACTS, contact_statuses))
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Maintain the admin stats rollups")
+    parser.add_argument("--rebuild", action="store_true", help="recompute every rollup from scratch")
+    args = parser.parse_args()
+
+    if args.rebuild:
+        await rebuild_rollups()
+        print("Rollups rebuilt")
+    else:
+        parser.print_help()
+    close_client()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,132 @@
+from fastapi import APIRouter, HTTPException, status
+from typing import List, Optional
+from datetime import date
+from bson import ObjectId
+from database import db, tours_collection
+from models import AdminStats, TourDailyStats, TransferDailyStats
+from rollups import TOUR_DAILY, TRANSFER_DAILY, STATUS_COUNTS
+from serialization import LeanJSONResponse
+
+router = APIRouter(prefix="/api/admin/stats", tags=["admin"])
+
+MAX_DAILY_ROWS = 10000
+
+
+def _date_filter(start: Optional[date], end: Optional[date]) -> dict:
+    """Rollup days are ISO strings, which sort in date order"""
+    if start and end and end < start:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="End date must not be before start date"
+        )
+    days = {}
+    if start:
+        days["$gte"] = start.isoformat()
+    if end:
+        days["$lte"] = end.isoformat()
+    return {"date": days} if days else {}
+
+
+def _totals(key: str, fields: List[str]) -> List[dict]:
+    group = {"_id": f"${key}"}
+    group.update({field: {"$sum": f"${field}"} for field in fields})
+    return [{"$group": group}, {"$sort": {"revenue": -1, "_id": 1}}]
+
+
+@router.get("", response_model=AdminStats, response_class=LeanJSONResponse)
+async def get_stats(start: Optional[date] = None, end: Optional[date] = None):
+    """Bookings, guests and revenue per tour, transfer volume per vehicle type and status funnels (admin endpoint)"""
+    try:
+        query = _date_filter(start, end)
+        tours = await db[TOUR_DAILY].aggregate(
+            [{"$match": query}] + _totals("tour_id", ["bookings", "guests", "revenue"])
+        ).to_list(None)
+        transfers = await db[TRANSFER_DAILY].aggregate(
+            [{"$match": query}] + _totals("vehicle_type", ["bookings", "vehicles", "passengers", "revenue"])
+        ).to_list(None)
+        counts = await db[STATUS_COUNTS].find({}, {"kind": 1, "status": 1, "count": 1}).to_list(None)
+
+        tour_ids = [ObjectId(row["_id"]) for row in tours if ObjectId.is_valid(row["_id"])]
+        titles = {
+            str(tour["_id"]): tour["title"]
+            async for tour in tours_collection.find({"_id": {"$in": tour_ids}}, {"title": 1})
+        }
+
+        funnel = {}
+        for count in counts:
+            if count["count"]:
+                funnel.setdefault(count["kind"], {})[count["status"]] = count["count"]
+
+        return LeanJSONResponse({
+            "start": start,
+            "end": end,
+            "bookings": sum(row["bookings"] for row in tours),
+            "guests": sum(row["guests"] for row in tours),
+            "revenue": sum(row["revenue"] for row in tours),
+            "tours": [
+                {"tour_id": row["_id"], "title": titles.get(row["_id"]), "bookings": row["bookings"],
+                 "guests": row["guests"], "revenue": row["revenue"]}
+                for row in tours
+            ],
+            "transfers": [
+                {"vehicle_type": row["_id"], "bookings": row["bookings"], "vehicles": row["vehicles"],
+                 "passengers": row["passengers"], "revenue": row["revenue"]}
+                for row in transfers
+            ],
+            "funnel": funnel,
+        })
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error fetching stats: {str(e)}"
+        )
+
+
+@router.get("/tours", response_model=List[TourDailyStats], response_class=LeanJSONResponse)
+async def get_tour_stats(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    tour_id: Optional[str] = None,
+):
+    """Bookings, guests and revenue per tour per day (admin endpoint)"""
+    try:
+        query = _date_filter(start, end)
+        if tour_id:
+            query["tour_id"] = tour_id
+        rows = await db[TOUR_DAILY].find(query, {"_id": 0}).sort(
+            [("date", 1), ("tour_id", 1)]
+        ).to_list(MAX_DAILY_ROWS)
+        return LeanJSONResponse(rows)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error fetching tour stats: {str(e)}"
+        )
+
+
+@router.get("/transfers", response_model=List[TransferDailyStats], response_class=LeanJSONResponse)
+async def get_transfer_stats(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    vehicle_type: Optional[str] = None,
+):
+    """Transfer bookings, vehicles, passengers and revenue per vehicle type per arrival day (admin endpoint)"""
+    try:
+        query = _date_filter(start, end)
+        if vehicle_type:
+            query["vehicle_type"] = vehicle_type
+        rows = await db[TRANSFER_DAILY].find(query, {"_id": 0}).sort(
+            [("date", 1), ("vehicle_type", 1)]
+        ).to_list(MAX_DAILY_ROWS)
+        return LeanJSONResponse(rows)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error fetching transfer stats: {str(e)}"
+        )
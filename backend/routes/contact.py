@@ -1,23 +1,40 @@
-from fastapi import APIRouter, HTTPException, status
-from typing import List
+from fastapi import APIRouter, HTTPException, Query, status
+from typing import List, Optional
+from datetime import datetime
 from database import contacts_collection
-from models import Contact, ContactCreate
+from models import Contact, ContactCreate, ContactStatusFilter, ContactStatusUpdate, BulkStatusResult, mongo_document
+from write_behind import contact_queue, QueueFull
+from rollups import record_status_change, CONTACTS
+from transitions import bulk_transition, CONTACT_TRANSITIONS
+from pagination import fetch_page, find_sorted, page_response, date_range, DEFAULT_LIMIT, MAX_LIMIT
+from serialization import LeanJSONResponse, dumps, lean_documents, projection, streaming_response
 
 router = APIRouter(prefix="/api/contact", tags=["contact"])
 
+CONTACT_PROJECTION = projection(Contact)
 
-@router.post("/", response_model=Contact)
+
+@router.post("/", response_model=Contact, status_code=status.HTTP_202_ACCEPTED)
 async def create_contact(contact: ContactCreate):
-    """Create a new contact inquiry"""
+    """Create a new contact inquiry.
+
+    The inquiry is spooled and acknowledged at once; it is written to MongoDB
+    with the next batch of the contact write-behind queue.
+    """
     try:
         # Create contact record
         contact_obj = Contact(**contact.dict())
-        result = await contacts_collection.insert_one(contact_obj.dict(by_alias=True, exclude={"id"}))
-        
-        # Return created contact
-        created_contact = await contacts_collection.find_one({"_id": result.inserted_id})
-        return Contact(**created_contact)
+        document = mongo_document(contact_obj)
+        document["_id"] = contact_obj.id
+        await contact_queue.submit(document)
+        return contact_obj
         
+    except QueueFull:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many inquiries are waiting to be saved, please try again shortly",
+            headers={"Retry-After": "5"},
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -25,12 +42,36 @@ async def create_contact(contact: ContactCreate):
         )
 
 
-@router.get("/", response_model=List[Contact])
-async def get_contacts():
-    """Get all contact inquiries (admin endpoint)"""
+@router.get("/", response_model=List[Contact], response_class=LeanJSONResponse)
+async def get_contacts(
+    status_filter: Optional[str] = Query(None, alias="status"),
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_LIMIT, ge=1, le=MAX_LIMIT),
+    stream: Optional[str] = Query(None, pattern="^(ndjson|json)$"),
+):
+    """Get contact inquiries, newest first and paginated (admin endpoint).
+
+    With ``stream=ndjson`` or ``stream=json`` all matching contacts are
+    streamed straight from the cursor instead of returning one page.
+    """
     try:
-        contacts = await contacts_collection.find().sort("created_at", -1).to_list(1000)
-        return [Contact(**contact) for contact in contacts]
+        query = date_range("created_at", created_from, created_to)
+        if status_filter:
+            query["status"] = status_filter
+
+        if stream:
+            # Export mode: every matching document from the cursor on, ignoring limit
+            documents = find_sorted(contacts_collection, query, cursor, projection=CONTACT_PROJECTION)
+            return streaming_response(documents, Contact, stream)
+
+        contacts, next_cursor = await fetch_page(
+            contacts_collection, query, cursor, limit, projection=CONTACT_PROJECTION
+        )
+        return page_response(dumps(lean_documents(contacts, Contact)), next_cursor)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -38,8 +79,45 @@ async def get_contacts():
         )
 
 
+def _status_filter_query(status_filter: ContactStatusFilter) -> dict:
+    query = {}
+    if status_filter.status:
+        query["status"] = status_filter.status
+    if status_filter.created_before:
+        query["created_at"] = {"$lt": status_filter.created_before}
+    if not query:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="The filter needs at least one condition"
+        )
+    return query
+
+
+@router.put("/status", response_model=BulkStatusResult)
+async def update_contact_statuses(update: ContactStatusUpdate):
+    """Move many contacts to a status at once (admin endpoint).
+
+    Contacts are selected by ``ids`` or by ``filter``, e.g. every replied
+    inquiry older than a week, and moved with one bulk_write. Each contact
+    gets its own result.
+    """
+    try:
+        query = _status_filter_query(update.filter) if update.filter is not None else None
+        return await bulk_transition(
+            contacts_collection, CONTACTS, CONTACT_TRANSITIONS, "new",
+            update.status, update.ids, query,
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error updating contact statuses: {str(e)}"
+        )
+
+
 @router.put("/{contact_id}/status")
-async def update_contact_status(contact_id: str, status: str):
+async def update_contact_status(contact_id: str, new_status: str = Query(..., alias="status")):
     """Update contact status (admin endpoint)"""
     try:
         from bson import ObjectId
@@ -50,22 +128,24 @@ async def update_contact_status(contact_id: str, status: str):
                 detail="Invalid contact ID format"
             )
         
-        if status not in ["new", "replied", "closed"]:
+        if new_status not in ["new", "replied", "closed"]:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Status must be one of: new, replied, closed"
             )
         
-        result = await contacts_collection.update_one(
+        previous = await contacts_collection.find_one_and_update(
             {"_id": ObjectId(contact_id)},
-            {"$set": {"status": status}}
+            {"$set": {"status": new_status}},
+            projection={"status": 1},
         )
         
-        if result.matched_count == 0:
+        if previous is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Contact not found"
             )
+        await record_status_change(CONTACTS, previous.get("status", "new"), new_status)
         
         return {"message": "Contact status updated successfully"}
         
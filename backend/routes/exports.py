@@ -0,0 +1,81 @@
+from fastapi import APIRouter, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+from typing import Optional
+from datetime import date, datetime
+from export import (
+    BOOKINGS_EXPORT, TRANSFERS_EXPORT, CSV, MEDIA_TYPES, ExportSpec, ExportUnavailable,
+    export_chunks, export_filename, export_query,
+)
+
+router = APIRouter(prefix="/api/admin/exports", tags=["admin"])
+
+FORMAT_PATTERN = "^(csv|parquet)$"
+
+
+def _export(
+    spec: ExportSpec,
+    export_format: str,
+    start: Optional[date],
+    end: Optional[date],
+    created_from: Optional[datetime],
+    created_to: Optional[datetime],
+    status_filter: Optional[str],
+) -> StreamingResponse:
+    if start and end and end < start:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="End date must not be before start date"
+        )
+    query = export_query(spec, start, end, created_from, created_to, status_filter)
+    try:
+        chunks = export_chunks(spec, query, export_format)
+    except ExportUnavailable as e:
+        raise HTTPException(status_code=status.HTTP_501_NOT_IMPLEMENTED, detail=str(e))
+    filename = export_filename(spec, export_format, start, end)
+    return StreamingResponse(
+        chunks,
+        media_type=MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@router.get("/bookings")
+async def export_bookings(
+    export_format: str = Query(CSV, alias="format", pattern=FORMAT_PATTERN),
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    status_filter: Optional[str] = Query(None, alias="status"),
+):
+    """Stream tour bookings as CSV or Parquet, filtered by booking day (admin endpoint)"""
+    try:
+        return _export(BOOKINGS_EXPORT, export_format, start, end, created_from, created_to, status_filter)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error exporting bookings: {str(e)}"
+        )
+
+
+@router.get("/transfers")
+async def export_transfers(
+    export_format: str = Query(CSV, alias="format", pattern=FORMAT_PATTERN),
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    status_filter: Optional[str] = Query(None, alias="status"),
+):
+    """Stream transfer bookings as CSV or Parquet, filtered by arrival day (admin endpoint)"""
+    try:
+        return _export(TRANSFERS_EXPORT, export_format, start, end, created_from, created_to, status_filter)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error exporting transfer bookings: {str(e)}"
+        )
@@ -1,26 +1,26 @@
-from fastapi import APIRouter, HTTPException, status
-from typing import Dict, List
-from database import gallery_collection
+from fastapi import APIRouter, HTTPException, Query, status
+from typing import Dict, List, Optional
+from database import gallery_collection, catalog_db
+from cache import catalog_cache, GALLERY
+from pagination import fetch_page, page_response, ASCENDING, DEFAULT_LIMIT, MAX_LIMIT
+from serialization import LeanJSONResponse, dumps, lean_documents, projection
 from models import GalleryImage
+from views import read_gallery_view
 
 router = APIRouter(prefix="/api/gallery", tags=["gallery"])
 
+GALLERY_PROJECTION = projection(GalleryImage)
+
 
 @router.get("/", response_model=Dict[str, List[str]])
 async def get_gallery():
     """Get all gallery images categorized"""
     try:
-        images = await gallery_collection.find().to_list(1000)
-        
-        # Group images by category
-        gallery_dict = {}
-        for image in images:
-            gallery_image = GalleryImage(**image)
-            if gallery_image.category not in gallery_dict:
-                gallery_dict[gallery_image.category] = []
-            gallery_dict[gallery_image.category].append(gallery_image.url)
-        
-        return gallery_dict
+        async def load():
+            # Grouping is done by MongoDB and kept in a materialized view
+            return await read_gallery_view(catalog_db)
+
+        return await catalog_cache.get_or_load(GALLERY, "grouped", load)
         
     except Exception as e:
         raise HTTPException(
@@ -33,8 +33,11 @@ async def get_gallery():
 async def get_gallery_by_category(category: str):
     """Get gallery images by specific category"""
     try:
-        images = await gallery_collection.find({"category": category}).to_list(1000)
-        return [image["url"] for image in images]
+        async def load():
+            images = await gallery_collection.find({"category": category}, {"_id": 0, "url": 1}).to_list(1000)
+            return [image["url"] for image in images]
+
+        return await catalog_cache.get_or_load(GALLERY, ("category", category), load)
         
     except Exception as e:
         raise HTTPException(
@@ -43,13 +46,28 @@ async def get_gallery_by_category(category: str):
         )
 
 
-@router.get("/images", response_model=List[GalleryImage])
-async def get_all_gallery_images():
-    """Get all gallery images with full details"""
+@router.get("/images", response_model=List[GalleryImage], response_class=LeanJSONResponse)
+async def get_all_gallery_images(
+    category: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_LIMIT, ge=1, le=MAX_LIMIT),
+):
+    """Get gallery images with full details, paginated"""
     try:
-        images = await gallery_collection.find().to_list(1000)
-        return [GalleryImage(**image) for image in images]
+        query = {"category": category} if category else {}
+
+        async def load():
+            images, next_cursor = await fetch_page(
+                gallery_collection, query, cursor, limit, ASCENDING, GALLERY_PROJECTION
+            )
+            return dumps(lean_documents(images, GalleryImage)), next_cursor
+
+        cache_key = ("images", category, cursor, limit)
+        body, next_cursor = await catalog_cache.get_or_load(GALLERY, cache_key, load)
+        return page_response(body, next_cursor)
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
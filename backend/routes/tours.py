@@ -1,18 +1,57 @@
-from fastapi import APIRouter, HTTPException, status
-from typing import List
+from fastapi import APIRouter, HTTPException, Query, status
+from typing import List, Optional
+from datetime import date, timedelta
 from bson import ObjectId
-from database import tours_collection, bookings_collection
-from models import Tour, Booking, BookingCreate
+from database import tours_collection, bookings_collection, insert_model, insert_models
+from cache import catalog_cache, TOURS
+from pagination import fetch_page, page_response, ASCENDING, DEFAULT_LIMIT, MAX_LIMIT
+from serialization import LeanJSONResponse, dumps, lean_documents, projection
+from rollups import record_tour_bookings
+from jobs import enqueue, enqueue_many, BOOKING_CONFIRMATION
+from inventory import reserve_seats, reserve_many, release_seats, availability_calendar, MAX_CALENDAR_DAYS
+from search import tour_search_index
+from models import (
+    Tour, TourSearchResult, Booking, BookingCreate, DayAvailability, DEFAULT_TOUR_CAPACITY,
+    BatchItemResult, BatchResult, MAX_BATCH_SIZE,
+)
 
 router = APIRouter(prefix="/api/tours", tags=["tours"])
 
+TOUR_PROJECTION = projection(Tour)
 
-@router.get("/", response_model=List[Tour])
-async def get_tours():
-    """Get all tour packages"""
+
+@router.get("/", response_model=List[Tour], response_class=LeanJSONResponse)
+async def get_tours(
+    category: Optional[str] = None,
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_LIMIT, ge=1, le=MAX_LIMIT),
+):
+    """Get tour packages, paginated with filters on category and price"""
     try:
-        tours = await tours_collection.find().to_list(1000)
-        return [Tour(**tour) for tour in tours]
+        query = {}
+        if category:
+            query["category"] = category
+        price = {}
+        if min_price is not None:
+            price["$gte"] = min_price
+        if max_price is not None:
+            price["$lte"] = max_price
+        if price:
+            query["price"] = price
+
+        async def load():
+            tours, next_cursor = await fetch_page(
+                tours_collection, query, cursor, limit, ASCENDING, TOUR_PROJECTION
+            )
+            return dumps(lean_documents(tours, Tour)), next_cursor
+
+        cache_key = ("list", category, min_price, max_price, cursor, limit)
+        body, next_cursor = await catalog_cache.get_or_load(TOURS, cache_key, load)
+        return page_response(body, next_cursor)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -20,7 +59,27 @@ async def get_tours():
         )
 
 
-@router.get("/{tour_id}", response_model=Tour)
+@router.get("/search", response_model=TourSearchResult, response_class=LeanJSONResponse)
+async def search_tours(
+    q: str = Query("", max_length=200),
+    category: Optional[str] = None,
+    duration: Optional[str] = None,
+    price: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+):
+    """Search tours by title, description and features with category, duration and price facets"""
+    try:
+        index = await tour_search_index()
+        filters = {"category": category, "duration": duration, "price": price}
+        return LeanJSONResponse(index.search(q, filters, limit))
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error searching tours: {str(e)}"
+        )
+
+
+@router.get("/{tour_id}", response_model=Tour, response_class=LeanJSONResponse)
 async def get_tour(tour_id: str):
     """Get specific tour by ID"""
     try:
@@ -30,14 +89,18 @@ async def get_tour(tour_id: str):
                 detail="Invalid tour ID format"
             )
         
-        tour = await tours_collection.find_one({"_id": ObjectId(tour_id)})
-        if not tour:
+        async def load():
+            tour = await tours_collection.find_one({"_id": ObjectId(tour_id)}, TOUR_PROJECTION)
+            return dumps(lean_documents([tour], Tour)[0]) if tour else None
+
+        body = await catalog_cache.get_or_load(TOURS, tour_id, load)
+        if not body:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Tour not found"
             )
         
-        return Tour(**tour)
+        return LeanJSONResponse(body)
     except HTTPException:
         raise
     except Exception as e:
@@ -47,12 +110,16 @@ async def get_tour(tour_id: str):
         )
 
 
-@router.get("/category/{category}", response_model=List[Tour])
+@router.get("/category/{category}", response_model=List[Tour], response_class=LeanJSONResponse)
 async def get_tours_by_category(category: str):
     """Get tours by category"""
     try:
-        tours = await tours_collection.find({"category": category}).to_list(1000)
-        return [Tour(**tour) for tour in tours]
+        async def load():
+            tours = await tours_collection.find({"category": category}, TOUR_PROJECTION).to_list(1000)
+            return dumps(lean_documents(tours, Tour))
+
+        body = await catalog_cache.get_or_load(TOURS, ("category", category), load)
+        return LeanJSONResponse(body)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -60,6 +127,46 @@ async def get_tours_by_category(category: str):
         )
 
 
+@router.get("/{tour_id}/availability", response_model=List[DayAvailability])
+async def get_tour_availability(
+    tour_id: str,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+):
+    """Get seats booked and available per day for a tour (defaults to the next 30 days)"""
+    try:
+        if not ObjectId.is_valid(tour_id):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid tour ID format"
+            )
+        
+        start = start or date.today()
+        end = end or start + timedelta(days=29)
+        if end < start or (end - start).days >= MAX_CALENDAR_DAYS:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Date range must be ascending and at most {MAX_CALENDAR_DAYS} days"
+            )
+        
+        tour = await tours_collection.find_one({"_id": ObjectId(tour_id)}, {"capacity": 1})
+        if not tour:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Tour not found"
+            )
+        
+        capacity = tour.get("capacity", DEFAULT_TOUR_CAPACITY)
+        return LeanJSONResponse(await availability_calendar(tour_id, start, end, capacity))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error fetching tour availability: {str(e)}"
+        )
+
+
 @router.post("/bookings", response_model=Booking)
 async def create_booking(booking: BookingCreate):
     """Create a new tour booking"""
@@ -71,20 +178,31 @@ async def create_booking(booking: BookingCreate):
                 detail="Invalid tour ID format"
             )
         
-        tour = await tours_collection.find_one({"_id": ObjectId(booking.tour_id)})
+        tour = await tours_collection.find_one({"_id": ObjectId(booking.tour_id)}, {"capacity": 1, "price": 1})
         if not tour:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Tour not found"
             )
         
-        # Create booking
-        booking_obj = Booking(**booking.dict())
-        result = await bookings_collection.insert_one(booking_obj.dict(by_alias=True, exclude={"id"}))
+        # Reserve seats before writing the booking
+        capacity = tour.get("capacity", DEFAULT_TOUR_CAPACITY)
+        if not await reserve_seats(booking.tour_id, booking.booking_date, booking.guests, capacity):
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=f"Not enough seats available on {booking.booking_date.isoformat()}"
+            )
         
-        # Return created booking
-        created_booking = await bookings_collection.find_one({"_id": result.inserted_id})
-        return Booking(**created_booking)
+        # Create booking
+        booking_obj = Booking(**booking.model_dump())
+        try:
+            created = await insert_model(bookings_collection, booking_obj)
+        except Exception:
+            await release_seats(booking.tour_id, booking.booking_date, booking.guests)
+            raise
+        await record_tour_bookings([created.model_dump()], {booking.tour_id: tour.get("price", 0.0)})
+        await enqueue(BOOKING_CONFIRMATION, {"booking_id": str(created.id)})
+        return created
         
     except HTTPException:
         raise
@@ -95,6 +213,90 @@ async def create_booking(booking: BookingCreate):
         )
 
 
+@router.post("/bookings/batch", response_model=BatchResult)
+async def create_bookings_batch(bookings: List[BookingCreate]):
+    """Create many tour bookings at once (reseller endpoint).
+
+    Tour IDs are checked with one $in query and the bookings are written with
+    one unordered insert_many. Each item gets its own result, so one bad
+    booking does not fail the rest.
+    """
+    try:
+        if len(bookings) > MAX_BATCH_SIZE:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"A batch can hold at most {MAX_BATCH_SIZE} bookings"
+            )
+        
+        results = [None] * len(bookings)
+        
+        # Verify all tours with a single query
+        tour_ids = {booking.tour_id for booking in bookings if ObjectId.is_valid(booking.tour_id)}
+        tours = await tours_collection.find(
+            {"_id": {"$in": [ObjectId(tour_id) for tour_id in tour_ids]}}, {"capacity": 1, "price": 1}
+        ).to_list(None)
+        capacities = {str(tour["_id"]): tour.get("capacity", DEFAULT_TOUR_CAPACITY) for tour in tours}
+        prices = {str(tour["_id"]): tour.get("price", 0.0) for tour in tours}
+        
+        pending = []
+        for index, booking in enumerate(bookings):
+            if not ObjectId.is_valid(booking.tour_id):
+                results[index] = BatchItemResult(index=index, status_code=400, error="Invalid tour ID format")
+            elif booking.tour_id not in capacities:
+                results[index] = BatchItemResult(index=index, status_code=404, error="Tour not found")
+            else:
+                pending.append(index)
+        
+        # Reserve seats, then write every booking that got them in one insert_many
+        reserved = await reserve_many([
+            (bookings[index].tour_id, bookings[index].booking_date, bookings[index].guests,
+             capacities[bookings[index].tour_id])
+            for index in pending
+        ])
+        to_insert = []
+        for index, ok in zip(pending, reserved):
+            if ok:
+                to_insert.append(index)
+            else:
+                results[index] = BatchItemResult(
+                    index=index, status_code=409,
+                    error=f"Not enough seats available on {bookings[index].booking_date.isoformat()}"
+                )
+        
+        booking_objs = [Booking(**bookings[index].model_dump()) for index in to_insert]
+        try:
+            errors = await insert_models(bookings_collection, booking_objs)
+        except Exception:
+            for index in to_insert:
+                booking = bookings[index]
+                await release_seats(booking.tour_id, booking.booking_date, booking.guests)
+            raise
+        for index, booking_obj, error in zip(to_insert, booking_objs, errors):
+            if error:
+                booking = bookings[index]
+                await release_seats(booking.tour_id, booking.booking_date, booking.guests)
+                results[index] = BatchItemResult(index=index, status_code=500, error=error)
+            else:
+                results[index] = BatchItemResult(index=index, id=str(booking_obj.id), status_code=201)
+        await record_tour_bookings(
+            [booking_obj.model_dump() for booking_obj, error in zip(booking_objs, errors) if not error], prices
+        )
+        await enqueue_many(BOOKING_CONFIRMATION, [
+            {"booking_id": str(booking_obj.id)} for booking_obj, error in zip(booking_objs, errors) if not error
+        ])
+        
+        created = sum(1 for result in results if result.error is None)
+        return BatchResult(created=created, failed=len(results) - created, results=results)
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error creating bookings: {str(e)}"
+        )
+
+
 @router.get("/bookings/{booking_id}", response_model=Booking)
 async def get_booking(booking_id: str):
     """Get specific booking by ID"""
@@ -1,18 +1,38 @@
-from fastapi import APIRouter, HTTPException, status
-from typing import List
+from fastapi import APIRouter, HTTPException, Query, status
+from typing import List, Optional
+from datetime import date, datetime, time
 from bson import ObjectId
-from database import vehicles_collection, transfers_collection
-from models import Vehicle, TransferBooking, TransferBookingCreate
+from database import vehicles_collection, transfers_collection, insert_model, insert_models
+from cache import catalog_cache, VEHICLES
+from pagination import fetch_page, find_sorted, page_response, date_range, DEFAULT_LIMIT, MAX_LIMIT
+from serialization import LeanJSONResponse, dumps, lean_documents, projection, streaming_response
+from rollups import record_transfer_bookings, record_status_change, rollup_projection, TRANSFER_BOOKINGS
+from fleet import fleet_scheduler, service_window, FLEET_RESERVE_ATTEMPTS
+from jobs import enqueue, enqueue_many, TRANSFER_CONFIRMATION
+from transitions import bulk_transition, TRANSFER_TRANSITIONS
+from models import (
+    Vehicle, TransferBooking, TransferBookingCreate,
+    TransferQuote, TransferQuoteRequest, VehicleAllocation,
+    BatchItemResult, BatchResult, MAX_BATCH_SIZE,
+    TransferStatusFilter, TransferStatusUpdate, BulkStatusResult,
+)
 
 router = APIRouter(prefix="/api/transfers", tags=["transfers"])
 
+VEHICLE_PROJECTION = projection(Vehicle)
+TRANSFER_PROJECTION = projection(TransferBooking)
 
-@router.get("/vehicles", response_model=List[Vehicle])
+
+@router.get("/vehicles", response_model=List[Vehicle], response_class=LeanJSONResponse)
 async def get_vehicles():
     """Get all available transfer vehicles"""
     try:
-        vehicles = await vehicles_collection.find({"available": True}).to_list(1000)
-        return [Vehicle(**vehicle) for vehicle in vehicles]
+        async def load():
+            vehicles = await vehicles_collection.find({"available": True}, VEHICLE_PROJECTION).to_list(1000)
+            return dumps(lean_documents(vehicles, Vehicle))
+
+        body = await catalog_cache.get_or_load(VEHICLES, "available", load)
+        return LeanJSONResponse(body)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -20,40 +40,230 @@ async def get_vehicles():
         )
 
 
+def _arrival(arrival_date, arrival_time) -> str:
+    return f"a {arrival_time.strftime('%H:%M')} arrival on {arrival_date.isoformat()}"
+
+
+def _split_allocation(passengers, arrival_date, arrival_time, start, end) -> List[VehicleAllocation]:
+    """Cheapest free vehicles for a party, or a 409 when the fleet can't seat it"""
+    vehicles = fleet_scheduler.allocate(passengers, start, end)
+    if vehicles is None:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Not enough free vehicles to seat {passengers} passengers for {_arrival(arrival_date, arrival_time)}"
+        )
+    return [VehicleAllocation(**vehicle) for vehicle in vehicles]
+
+
+def _allocate(booking: TransferBookingCreate, vehicle: Optional[dict], start, end) -> List[VehicleAllocation]:
+    """Pick the vehicles for a booking.
+
+    ``vehicle`` is the requested vehicle type document (None if it doesn't
+    exist) and the fleet scheduler must already be refreshed for the day.
+    Raises HTTPException when the booking can't be served.
+    """
+    if booking.split:
+        return _split_allocation(booking.passengers, booking.arrival_date, booking.arrival_time, start, end)
+
+    # Verify vehicle type exists
+    if not vehicle:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Vehicle type not found or not available"
+        )
+    
+    # Check capacity
+    vehicle_obj = Vehicle(**vehicle)
+    if booking.passengers > vehicle_obj.capacity:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Vehicle capacity exceeded. Maximum passengers: {vehicle_obj.capacity}. Set split to book several vehicles"
+        )
+    
+    # Assign an individual vehicle that is free for the whole transfer window
+    unit = fleet_scheduler.best_fit(booking.vehicle_type, start, end)
+    if unit is None:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"No {booking.vehicle_type} is free for {_arrival(booking.arrival_date, booking.arrival_time)}"
+        )
+    return [VehicleAllocation(
+        vehicle_type=vehicle_obj.type, vehicle_unit=unit, capacity=vehicle_obj.capacity,
+        price=vehicle_obj.price, passengers=booking.passengers,
+    )]
+
+
+async def _reserve(booking: TransferBookingCreate, vehicle: Optional[dict], booking_id, start, end) -> List[VehicleAllocation]:
+    """Pick the vehicles for a booking and reserve them in MongoDB.
+
+    When another worker reserved one of the picked vehicles first, the day is
+    re-read and the pick made again, up to FLEET_RESERVE_ATTEMPTS times.
+    """
+    for _ in range(FLEET_RESERVE_ATTEMPTS):
+        await fleet_scheduler.refresh(booking.arrival_date)
+        allocation = _allocate(booking, vehicle, start, end)
+        units = [item.vehicle_unit for item in allocation]
+        if await fleet_scheduler.reserve(units, start, end, booking_id):
+            return allocation
+    raise HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail=f"Vehicles for {_arrival(booking.arrival_date, booking.arrival_time)} are being booked right now, please try again"
+    )
+
+
+@router.post("/quote", response_model=TransferQuote)
+async def quote_transfer(request: TransferQuoteRequest):
+    """Quote the cheapest combination of free vehicles for a party"""
+    try:
+        start, end = service_window(request.arrival_date, request.arrival_time, request.destination)
+        await fleet_scheduler.refresh(request.arrival_date)
+        allocation = _split_allocation(
+            request.passengers, request.arrival_date, request.arrival_time, start, end
+        )
+        return TransferQuote(
+            passengers=request.passengers,
+            total_price=sum(vehicle.price for vehicle in allocation),
+            vehicles=allocation,
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error quoting transfer: {str(e)}"
+        )
+
+
 @router.post("/bookings", response_model=TransferBooking)
 async def create_transfer_booking(booking: TransferBookingCreate):
-    """Create a new transfer booking"""
+    """Create a new transfer booking.
+
+    With ``split`` set, the party is spread over the cheapest combination of
+    free vehicles of any type instead of a single vehicle of ``vehicle_type``.
+    """
     try:
-        # Verify vehicle type exists
-        vehicle = await vehicles_collection.find_one({"type": booking.vehicle_type, "available": True})
-        if not vehicle:
+        vehicle = None
+        if not booking.split:
+            vehicle = await vehicles_collection.find_one({"type": booking.vehicle_type, "available": True})
+        
+        # Reserve the vehicles under the booking's id, then write the booking
+        start, end = service_window(booking.arrival_date, booking.arrival_time, booking.destination)
+        booking_obj = TransferBooking(**booking.model_dump())
+        allocation = await _reserve(booking, vehicle, booking_obj.id, start, end)
+        booking_obj.vehicle_units = [vehicle.vehicle_unit for vehicle in allocation]
+        booking_obj.allocation = allocation
+        
+        # Create booking
+        try:
+            created = await insert_model(transfers_collection, booking_obj, keep_id=True)
+        except Exception:
+            await fleet_scheduler.release([booking_obj.id])
+            raise
+        await record_transfer_bookings([created.model_dump()])
+        await enqueue(TRANSFER_CONFIRMATION, {"booking_id": str(created.id)})
+        return created
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error creating transfer booking: {str(e)}"
+        )
+
+
+@router.post("/bookings/batch", response_model=BatchResult)
+async def create_transfer_bookings_batch(bookings: List[TransferBookingCreate]):
+    """Create many transfer bookings at once (reseller endpoint).
+
+    Vehicle types are checked with one $in query, every arrival day is read
+    once, vehicles are picked in request order and reserved with one
+    bulk_write per round, and the bookings are written with one unordered
+    insert_many. Each item gets its own result, so one bad booking does not
+    fail the rest.
+    """
+    try:
+        if len(bookings) > MAX_BATCH_SIZE:
             raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Vehicle type not found or not available"
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"A batch can hold at most {MAX_BATCH_SIZE} bookings"
             )
         
-        # Check capacity
-        vehicle_obj = Vehicle(**vehicle)
-        if booking.passengers > vehicle_obj.capacity:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Vehicle capacity exceeded. Maximum passengers: {vehicle_obj.capacity}"
+        results = [None] * len(bookings)
+        
+        # Verify all vehicle types with a single query
+        vehicle_types = {booking.vehicle_type for booking in bookings if not booking.split}
+        vehicles = await vehicles_collection.find(
+            {"type": {"$in": list(vehicle_types)}, "available": True}
+        ).to_list(None)
+        vehicles_by_type = {vehicle["type"]: vehicle for vehicle in vehicles}
+        
+        windows = [service_window(booking.arrival_date, booking.arrival_time, booking.destination)
+                   for booking in bookings]
+        booking_objs = [TransferBooking(**booking.model_dump()) for booking in bookings]
+        
+        # Pick in request order, so each booking sees the vehicles picked before it,
+        # then reserve the round's picks together. Picks that lost a vehicle to
+        # another worker are made again from a fresh read of their days
+        pending = list(range(len(bookings)))
+        for _ in range(FLEET_RESERVE_ATTEMPTS):
+            for arrival_date in sorted({bookings[index].arrival_date for index in pending}):
+                await fleet_scheduler.refresh(arrival_date)
+            picks = []
+            for index in pending:
+                booking, (start, end) = bookings[index], windows[index]
+                try:
+                    allocation = _allocate(booking, vehicles_by_type.get(booking.vehicle_type), start, end)
+                except HTTPException as e:
+                    results[index] = BatchItemResult(index=index, status_code=e.status_code, error=e.detail)
+                    continue
+                booking_objs[index].vehicle_units = [vehicle.vehicle_unit for vehicle in allocation]
+                booking_objs[index].allocation = allocation
+                fleet_scheduler.add_local(booking_objs[index].vehicle_units, start, end, booking_objs[index].id)
+                picks.append(index)
+            reserved = await fleet_scheduler.reserve_many([
+                (booking_objs[index].vehicle_units, *windows[index], booking_objs[index].id) for index in picks
+            ])
+            pending = [index for index, ok in zip(picks, reserved) if not ok]
+            if not pending:
+                break
+        for index in pending:
+            results[index] = BatchItemResult(
+                index=index, status_code=409,
+                error=f"Vehicles for {_arrival(bookings[index].arrival_date, bookings[index].arrival_time)} "
+                      f"are being booked right now, please try again"
             )
         
-        # Create booking
-        booking_obj = TransferBooking(**booking.dict())
-        result = await transfers_collection.insert_one(booking_obj.dict(by_alias=True, exclude={"id"}))
+        to_insert = [index for index, result in enumerate(results) if result is None]
+        inserted = [booking_objs[index] for index in to_insert]
+        try:
+            errors = await insert_models(transfers_collection, inserted, keep_id=True)
+        except Exception:
+            await fleet_scheduler.release([booking_obj.id for booking_obj in inserted])
+            raise
+        await fleet_scheduler.release([booking_obj.id for booking_obj, error in zip(inserted, errors) if error])
+        for index, booking_obj, error in zip(to_insert, inserted, errors):
+            if error:
+                results[index] = BatchItemResult(index=index, status_code=500, error=error)
+            else:
+                results[index] = BatchItemResult(index=index, id=str(booking_obj.id), status_code=201)
+        await record_transfer_bookings(
+            [booking_obj.model_dump() for booking_obj, error in zip(inserted, errors) if not error]
+        )
+        await enqueue_many(TRANSFER_CONFIRMATION, [
+            {"booking_id": str(booking_obj.id)} for booking_obj, error in zip(inserted, errors) if not error
+        ])
         
-        # Return created booking
-        created_booking = await transfers_collection.find_one({"_id": result.inserted_id})
-        return TransferBooking(**created_booking)
+        created = sum(1 for result in results if result.error is None)
+        return BatchResult(created=created, failed=len(results) - created, results=results)
         
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Error creating transfer booking: {str(e)}"
+            detail=f"Error creating transfer bookings: {str(e)}"
         )
 
 
@@ -84,12 +294,39 @@ async def get_transfer_booking(booking_id: str):
         )
 
 
-@router.get("/bookings", response_model=List[TransferBooking])
-async def get_transfer_bookings():
-    """Get all transfer bookings (admin endpoint)"""
+@router.get("/bookings", response_model=List[TransferBooking], response_class=LeanJSONResponse)
+async def get_transfer_bookings(
+    status_filter: Optional[str] = Query(None, alias="status"),
+    vehicle_type: Optional[str] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_LIMIT, ge=1, le=MAX_LIMIT),
+    stream: Optional[str] = Query(None, pattern="^(ndjson|json)$"),
+):
+    """Get transfer bookings, newest first and paginated (admin endpoint).
+
+    With ``stream=ndjson`` or ``stream=json`` all matching bookings are
+    streamed straight from the cursor instead of returning one page.
+    """
     try:
-        bookings = await transfers_collection.find().sort("created_at", -1).to_list(1000)
-        return [TransferBooking(**booking) for booking in bookings]
+        query = date_range("created_at", created_from, created_to)
+        if status_filter:
+            query["status"] = status_filter
+        if vehicle_type:
+            query["vehicle_type"] = vehicle_type
+
+        if stream:
+            # Export mode: every matching document from the cursor on, ignoring limit
+            documents = find_sorted(transfers_collection, query, cursor, projection=TRANSFER_PROJECTION)
+            return streaming_response(documents, TransferBooking, stream)
+
+        bookings, next_cursor = await fetch_page(
+            transfers_collection, query, cursor, limit, projection=TRANSFER_PROJECTION
+        )
+        return page_response(dumps(lean_documents(bookings, TransferBooking)), next_cursor)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -97,8 +334,59 @@ async def get_transfer_bookings():
         )
 
 
+def _status_filter_query(status_filter: TransferStatusFilter) -> dict:
+    query = {}
+    if status_filter.status:
+        query["status"] = status_filter.status
+    if status_filter.vehicle_type:
+        query["vehicle_type"] = status_filter.vehicle_type
+    # Arrival days are ISO strings, which sort in date order
+    arrival = {}
+    if status_filter.arrival_date:
+        arrival["$eq"] = status_filter.arrival_date.isoformat()
+    if status_filter.arrival_before:
+        arrival["$lt"] = status_filter.arrival_before.isoformat()
+    if arrival:
+        query["arrival_date"] = arrival
+    if not query:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="The filter needs at least one condition"
+        )
+    return query
+
+
+@router.put("/bookings/status", response_model=BulkStatusResult)
+async def update_transfer_statuses(update: TransferStatusUpdate):
+    """Move many transfer bookings to a status at once (admin endpoint).
+
+    Bookings are selected by ``ids`` or by ``filter``, e.g. every confirmed
+    transfer with an arrival day before today, and moved with one bulk_write.
+    Each booking gets its own result.
+    """
+    try:
+        query = _status_filter_query(update.filter) if update.filter is not None else None
+        result = await bulk_transition(
+            transfers_collection, TRANSFER_BOOKINGS, TRANSFER_TRANSITIONS, "pending",
+            update.status, update.ids, query,
+        )
+        if update.status == "cancelled":
+            # Cancelled transfers give their vehicles back
+            await fleet_scheduler.release([
+                item.id for item in result.results if item.status_code == 200 and item.previous_status != "cancelled"
+            ])
+        return result
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error updating transfer statuses: {str(e)}"
+        )
+
+
 @router.put("/bookings/{booking_id}/status")
-async def update_transfer_status(booking_id: str, status: str):
+async def update_transfer_status(booking_id: str, new_status: str = Query(..., alias="status")):
     """Update transfer booking status"""
     try:
         if not ObjectId.is_valid(booking_id):
@@ -107,23 +395,55 @@ async def update_transfer_status(booking_id: str, status: str):
                 detail="Invalid booking ID format"
             )
         
-        if status not in ["pending", "confirmed", "completed", "cancelled"]:
+        if new_status not in ["pending", "confirmed", "completed", "cancelled"]:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Status must be one of: pending, confirmed, completed, cancelled"
             )
         
-        result = await transfers_collection.update_one(
+        booking = await transfers_collection.find_one(
             {"_id": ObjectId(booking_id)},
-            {"$set": {"status": status}}
+            {"status": 1, "arrival_date": 1, "arrival_time": 1, "destination": 1, "vehicle_units": 1},
         )
-        
-        if result.matched_count == 0:
+        if booking is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Transfer booking not found"
             )
         
+        # A reinstated booking needs its vehicles back, a cancelled one gives them up
+        previous_status = booking.get("status", "pending")
+        if previous_status == "cancelled" and new_status != "cancelled" and booking.get("vehicle_units"):
+            start, end = service_window(date.fromisoformat(booking["arrival_date"]),
+                                        time.fromisoformat(booking["arrival_time"]), booking["destination"])
+            if not await fleet_scheduler.reserve(booking["vehicle_units"], start, end, booking_id):
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail="The booking's vehicles have been given to another transfer since it was cancelled"
+                )
+        
+        # Conditional on the status read above, so a concurrent change is a 409, not overwritten
+        previous = await transfers_collection.find_one_and_update(
+            {"_id": ObjectId(booking_id), "status": booking.get("status")},
+            {"$set": {"status": new_status}},
+            projection=rollup_projection(TRANSFER_BOOKINGS),
+        )
+        if previous is None:
+            if previous_status == "cancelled" and new_status != "cancelled" and booking.get("vehicle_units"):
+                await fleet_scheduler.release([booking_id])
+            if await transfers_collection.count_documents({"_id": ObjectId(booking_id)}, limit=1) == 0:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Transfer booking not found"
+                )
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Status was changed by another request"
+            )
+        if new_status == "cancelled" and previous_status != "cancelled":
+            await fleet_scheduler.release([booking_id])
+        await record_status_change(TRANSFER_BOOKINGS, previous_status, new_status, documents=[previous])
+        
         return {"message": "Transfer booking status updated successfully"}
         
     except HTTPException:
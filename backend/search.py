@@ -0,0 +1,222 @@
+import math
+import re
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from cache import catalog_cache, TOURS
+from database import tours_collection
+from models import Tour
+from serialization import lean_documents, projection
+
+# Relevance weight of a term found in each field
+FIELD_WEIGHTS = {"title": 3.0, "features": 2.0, "description": 1.0}
+
+# Score multipliers for terms matched loosely instead of exactly
+PREFIX_WEIGHT = 0.8
+TYPO_WEIGHT = 0.5
+# Shortest query term we try to correct or complete
+MIN_FUZZY_LENGTH = 3
+
+# (label, lowest price, price below which it applies)
+PRICE_BUCKETS = [
+    ("under-50", 0.0, 50.0),
+    ("50-100", 50.0, 100.0),
+    ("100-200", 100.0, 200.0),
+    ("200-plus", 200.0, math.inf),
+]
+FACETS = ("category", "duration", "price")
+
+STOPWORDS = {"a", "an", "and", "at", "by", "for", "in", "of", "on", "or", "the", "to", "with"}
+
+SEARCH_KEY = "__search__"
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase words without stopwords, with a plural 's' stripped"""
+    tokens = []
+    for token in _TOKEN.findall(text.lower()):
+        if token in STOPWORDS:
+            continue
+        if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+def price_bucket(price: float) -> str:
+    for label, low, high in PRICE_BUCKETS:
+        if low <= price < high:
+            return label
+    return PRICE_BUCKETS[0][0]
+
+
+def _deletes(term: str) -> Set[str]:
+    return {term[:i] + term[i + 1:] for i in range(len(term))}
+
+
+def _within_one_edit(a: str, b: str) -> bool:
+    """True if a and b differ by one insert, delete, substitution or swap"""
+    if a == b:
+        return True
+    if abs(len(a) - len(b)) > 1:
+        return False
+    if len(a) == len(b):
+        diff = [i for i in range(len(a)) if a[i] != b[i]]
+        if len(diff) == 1:
+            return True
+        return len(diff) == 2 and diff[1] == diff[0] + 1 and a[diff[0]] == b[diff[1]] and a[diff[1]] == b[diff[0]]
+    if len(a) > len(b):
+        a, b = b, a
+    return any(b[:i] + b[i + 1:] == a for i in range(len(b)))
+
+
+class TourSearchIndex:
+    """Inverted index over the tour catalog for ranked, faceted text search.
+
+    Postings map each term to the weighted term frequency per tour. Typos are
+    matched through a map of single-character deletions, and the last query
+    term also matches as a prefix so results follow the user as they type.
+    """
+
+    def __init__(self, tours: Iterable[dict]):
+        self.tours: Dict[str, dict] = {}
+        self.facets: Dict[str, Dict[str, str]] = {}
+        self.postings: Dict[str, Dict[str, float]] = defaultdict(dict)
+        for tour in tours:
+            self._add(tour)
+
+        self.terms = sorted(self.postings)
+        self.idf = {
+            term: math.log(1 + len(self.tours) / len(postings))
+            for term, postings in self.postings.items()
+        }
+        self.deletions: Dict[str, Set[str]] = defaultdict(set)
+        for term in self.terms:
+            if len(term) >= MIN_FUZZY_LENGTH:
+                for deleted in _deletes(term):
+                    self.deletions[deleted].add(term)
+
+    def _add(self, tour: dict) -> None:
+        tour_id = str(tour["_id"])
+        self.tours[tour_id] = tour
+        self.facets[tour_id] = {
+            "category": tour.get("category", ""),
+            "duration": tour.get("duration", ""),
+            "price": price_bucket(tour.get("price", 0.0)),
+        }
+        fields = {
+            "title": tour.get("title", ""),
+            "description": tour.get("description", ""),
+            "features": " ".join(tour.get("features") or []),
+        }
+        for field, text in fields.items():
+            for token in tokenize(text):
+                postings = self.postings[token]
+                postings[tour_id] = postings.get(tour_id, 0.0) + FIELD_WEIGHTS[field]
+
+    def _prefixed(self, prefix: str) -> List[str]:
+        start = bisect_left(self.terms, prefix)
+        end = bisect_left(self.terms, prefix + "\uffff")
+        return self.terms[start:end]
+
+    def _typos(self, token: str) -> Set[str]:
+        candidates = set(self.deletions.get(token, ()))
+        for deleted in _deletes(token):
+            candidates.add(deleted)
+            candidates.update(self.deletions.get(deleted, ()))
+        return {term for term in candidates if term in self.postings and _within_one_edit(token, term)}
+
+    def expand(self, token: str, last: bool) -> List[Tuple[str, float]]:
+        """Index terms a query token matches, with the weight of each match"""
+        if token in self.postings and not last:
+            return [(token, 1.0)]
+        matches = {}
+        if token in self.postings:
+            matches[token] = 1.0
+        if len(token) >= MIN_FUZZY_LENGTH:
+            if last:
+                for term in self._prefixed(token):
+                    matches.setdefault(term, PREFIX_WEIGHT)
+            if not matches:
+                for term in self._typos(token):
+                    matches[term] = TYPO_WEIGHT
+        return list(matches.items())
+
+    def score(self, query: str) -> Optional[Dict[str, float]]:
+        """Relevance per tour matching every query token; None for an empty query"""
+        tokens = tokenize(query)
+        if not tokens:
+            return None
+        scores: Optional[Dict[str, float]] = None
+        for position, token in enumerate(tokens):
+            token_scores: Dict[str, float] = {}
+            for term, weight in self.expand(token, position == len(tokens) - 1):
+                idf = self.idf[term]
+                for tour_id, frequency in self.postings[term].items():
+                    token_score = weight * idf * frequency
+                    if token_score > token_scores.get(tour_id, 0.0):
+                        token_scores[tour_id] = token_score
+            if scores is None:
+                scores = token_scores
+            else:
+                scores = {
+                    tour_id: score + token_scores[tour_id]
+                    for tour_id, score in scores.items()
+                    if tour_id in token_scores
+                }
+            if not scores:
+                return {}
+        return scores
+
+    def search(self, query: str = "", filters: Optional[Dict[str, str]] = None,
+               limit: int = 20) -> dict:
+        """Rank tours for a query and count facet values.
+
+        Each facet is counted with the other facets' filters applied but not
+        its own, so the client can show how many tours switching to another
+        value would return.
+        """
+        filters = {facet: value for facet, value in (filters or {}).items() if value}
+        scores = self.score(query)
+        matched = list(self.tours) if scores is None else list(scores)
+
+        facet_counts: Dict[str, Dict[str, int]] = {facet: {} for facet in FACETS}
+        results = []
+        for tour_id in matched:
+            values = self.facets[tour_id]
+            failed = [facet for facet, value in filters.items() if values[facet] != value]
+            if not failed:
+                results.append(tour_id)
+            if len(failed) > 1:
+                continue
+            for facet in FACETS:
+                if not failed or failed == [facet]:
+                    counts = facet_counts[facet]
+                    counts[values[facet]] = counts.get(values[facet], 0) + 1
+
+        if scores is None:
+            results.sort(key=lambda tour_id: self.tours[tour_id].get("title", ""))
+        else:
+            results.sort(key=lambda tour_id: (-scores[tour_id], self.tours[tour_id].get("title", "")))
+        return {
+            "total": len(results),
+            "results": [self.tours[tour_id] for tour_id in results[:limit]],
+            "facets": facet_counts,
+        }
+
+
+async def _build_index() -> TourSearchIndex:
+    tours = await tours_collection.find({}, projection(Tour)).to_list(None)
+    return TourSearchIndex(lean_documents(tours, Tour))
+
+
+async def tour_search_index() -> TourSearchIndex:
+    """The search index for the current catalog.
+
+    It lives in the catalog cache under the tours namespace, so every tour
+    write that invalidates the namespace makes the next search rebuild it.
+    """
+    return await catalog_cache.get_or_load(TOURS, SEARCH_KEY, _build_index)
@@ -0,0 +1,178 @@
+"""Bulk seeding of MongoDB collections.
+
+Documents are upserted on a natural key with ``$setOnInsert`` so seeding is
+idempotent and a partially seeded database is completed on the next run. The
+natural keys have unique indexes (see indexes.py), so workers seeding at the
+same time can't insert a document twice.
+
+Running API workers don't see seeded catalog data until their cache entries
+expire, or at once when the change stream listener (coherence.py) is running.
+
+Load-test data can be generated or loaded from NDJSON fixtures:
+    python seed.py --synthetic-tours 100000 --synthetic-bookings 100000
+    python seed.py --fixture tours=fixtures/tours.ndjson
+"""
+import argparse
+import asyncio
+import json
+import random
+from datetime import date, timedelta
+from itertools import islice
+from typing import Iterable, Iterator, List, Optional
+
+from pymongo import InsertOne, UpdateOne
+from pymongo.errors import BulkWriteError
+
+BATCH_SIZE = 1000
+
+DUPLICATE_KEY = 11000
+
+# Natural keys identifying catalog documents
+NATURAL_KEYS = {
+    "tours": "title",
+    "vehicles": "type",
+    "gallery": "url",
+}
+
+
+def batched(documents: Iterable[dict], size: int = BATCH_SIZE) -> Iterator[List[dict]]:
+    """Split any iterable of documents into lists of at most size items"""
+    iterator = iter(documents)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+async def seed_collection(collection, documents: Iterable[dict], key: Optional[str] = None,
+                          batch_size: int = BATCH_SIZE) -> int:
+    """Write documents in unordered bulk batches and return how many were added.
+
+    With a key, each document is upserted on that field and existing documents
+    are left untouched. Without one the documents are plainly inserted.
+    """
+    added = 0
+    for batch in batched(documents, batch_size):
+        if key:
+            requests = [
+                UpdateOne({key: document[key]}, {"$setOnInsert": document}, upsert=True)
+                for document in batch
+            ]
+        else:
+            requests = [InsertOne(document) for document in batch]
+        try:
+            result = await collection.bulk_write(requests, ordered=False)
+        except BulkWriteError as e:
+            # Losing an upsert race on the unique natural key means the document is there
+            if any(error.get("code") != DUPLICATE_KEY for error in e.details.get("writeErrors", [])):
+                raise
+            added += e.details["nUpserted"] if key else e.details["nInserted"]
+            continue
+        added += result.upserted_count if key else result.inserted_count
+    return added
+
+
+async def backfill_fields(collection, documents: Iterable[dict], key: str, fields: List[str]) -> int:
+    """Set fields that existing documents are missing from the seed documents.
+
+    Seeding never overwrites, so a field added to the seed data later would
+    otherwise never reach documents seeded before it. Values already present
+    are left alone. Returns how many documents were changed.
+    """
+    requests = [
+        UpdateOne({key: document[key], field: {"$exists": False}}, {"$set": {field: document[field]}})
+        for document in documents
+        for field in fields
+        if field in document
+    ]
+    if not requests:
+        return 0
+    result = await collection.bulk_write(requests, ordered=False)
+    return result.modified_count
+
+
+async def seed_collections(plan) -> List[int]:
+    """Seed several collections concurrently.
+
+    ``plan`` is a list of (collection, documents, key) tuples.
+    """
+    return await asyncio.gather(*[
+        seed_collection(collection, documents, key) for collection, documents, key in plan
+    ])
+
+
+def iter_fixture(path: str) -> Iterator[dict]:
+    """Stream documents from an NDJSON fixture file one line at a time"""
+    with open(path, encoding="utf-8") as fixture:
+        for line in fixture:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def synthetic_tours(count: int) -> Iterator[dict]:
+    from models import Tour, mongo_document
+
+    categories = ["water", "cultural", "nature", "safari"]
+    durations = ["2 Hours", "3 Hours", "Half Day", "Full Day", "3-5 Days"]
+    for i in range(count):
+        yield mongo_document(Tour(
+            title=f"Synthetic Tour {i}",
+            description=f"Load-test tour number {i}",
+            image="https://images.unsplash.com/photo-1597799119438-cbf326f268b9",
+            price=float(random.randint(20, 400)),
+            duration=random.choice(durations),
+            category=random.choice(categories),
+            features=["Professional guide"],
+        ))
+
+
+def synthetic_bookings(count: int, tour_ids: List[str]) -> Iterator[dict]:
+    from models import Booking, mongo_document
+
+    for i in range(count):
+        yield mongo_document(Booking(
+            tour_id=random.choice(tour_ids),
+            customer_name=f"Guest {i}",
+            email=f"guest{i}@example.com",
+            phone="+255 777 000 000",
+            booking_date=date.today() + timedelta(days=random.randint(0, 365)),
+            guests=random.randint(1, 8),
+        ))
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Seed MongoDB collections in bulk")
+    parser.add_argument("--synthetic-tours", type=int, default=0)
+    parser.add_argument("--synthetic-bookings", type=int, default=0)
+    parser.add_argument("--fixture", action="append", default=[],
+                        help="collection=path.ndjson, may be repeated")
+    args = parser.parse_args()
+
+    import database
+
+    for spec in args.fixture:
+        collection_name, path = spec.split("=", 1)
+        added = await seed_collection(database.db[collection_name], iter_fixture(path),
+                                      NATURAL_KEYS.get(collection_name))
+        print(f"{collection_name}: {added} documents added from {path}")
+
+    if args.synthetic_tours:
+        added = await seed_collection(database.tours_collection,
+                                      synthetic_tours(args.synthetic_tours), "title")
+        print(f"tours: {added} synthetic documents added")
+
+    if args.synthetic_bookings:
+        tour_ids = [str(tour["_id"]) async for tour in database.tours_collection.find({}, {"_id": 1})]
+        if not tour_ids:
+            parser.error("bookings need tours to reference, seed tours first")
+        added = await seed_collection(database.bookings_collection,
+                                      synthetic_bookings(args.synthetic_bookings, tour_ids))
+        print(f"bookings: {added} synthetic documents added")
+
+    database.close_client()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
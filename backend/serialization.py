@@ -0,0 +1,110 @@
+import time
+from typing import Any, AsyncIterator, Dict, Iterable, List, Type
+
+import orjson
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel
+from pydantic_core import PydanticUndefined
+
+from metrics import record_time, SERIALIZE
+
+
+def _encode_default(value):
+    # ObjectId and anything else orjson doesn't know natively
+    return str(value)
+
+
+def dumps(content: Any) -> bytes:
+    """Encode content to JSON bytes with orjson"""
+    started = time.perf_counter()
+    encoded = orjson.dumps(content, default=_encode_default)
+    record_time(SERIALIZE, time.perf_counter() - started)
+    return encoded
+
+
+class LeanJSONResponse(JSONResponse):
+    """JSON response rendered with orjson; ObjectIds are written as strings"""
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        return dumps(content)
+
+
+def projection(model: Type[BaseModel]) -> Dict[str, int]:
+    """Mongo projection selecting only the fields a model exposes"""
+    return {field.alias or name: 1 for name, field in model.model_fields.items()}
+
+
+def _static_defaults(model: Type[BaseModel]) -> Dict[str, Any]:
+    return {
+        field.alias or name: field.default
+        for name, field in model.model_fields.items()
+        if field.default is not PydanticUndefined
+    }
+
+
+_defaults_cache: Dict[Type[BaseModel], Dict[str, Any]] = {}
+
+
+def lean_documents(documents: Iterable[dict], model: Type[BaseModel]) -> List[dict]:
+    """Prepare raw Mongo documents for output without building model instances.
+
+    Missing fields with a static default get it filled in so the output has
+    the same shape as the model would produce; the values are left as stored
+    and converted by the JSON encoder.
+    """
+    defaults = _defaults_cache.get(model)
+    if defaults is None:
+        defaults = _defaults_cache[model] = _static_defaults(model)
+
+    lean = []
+    for document in documents:
+        for key, default in defaults.items():
+            if key not in document:
+                document[key] = default.copy() if isinstance(default, (list, dict)) else default
+        lean.append(document)
+    return lean
+
+
+# Streaming formats for large listings
+NDJSON = "ndjson"
+JSON_ARRAY = "json"
+
+STREAM_BATCH_SIZE = 500
+STREAM_CHUNK_BYTES = 64 * 1024
+
+
+async def _encode_stream(cursor, model: Type[BaseModel], stream_format: str) -> AsyncIterator[bytes]:
+    """Encode documents as the cursor yields them, in chunks of about 64 KB.
+
+    The first document is flushed on its own so clients get bytes early.
+    """
+    ndjson = stream_format == NDJSON
+    chunk = bytearray() if ndjson else bytearray(b"[")
+    first = True
+    async for document in cursor:
+        if ndjson:
+            chunk += dumps(lean_documents([document], model)[0])
+            chunk += b"\n"
+        else:
+            if not first:
+                chunk += b","
+            chunk += dumps(lean_documents([document], model)[0])
+        if first or len(chunk) >= STREAM_CHUNK_BYTES:
+            yield bytes(chunk)
+            chunk.clear()
+        first = False
+    if not ndjson:
+        chunk += b"]"
+    if chunk:
+        yield bytes(chunk)
+
+
+def streaming_response(cursor, model: Type[BaseModel], stream_format: str) -> StreamingResponse:
+    """Stream a Motor cursor as NDJSON or a JSON array without buffering the result"""
+    media_type = "application/x-ndjson" if stream_format == NDJSON else "application/json"
+    return StreamingResponse(
+        _encode_stream(cursor.batch_size(STREAM_BATCH_SIZE), model, stream_format),
+        media_type=media_type,
+    )
@@ -1,29 +1,58 @@
-from fastapi import FastAPI, APIRouter
+from fastapi import FastAPI, APIRouter, Response, status
+from fastapi.responses import PlainTextResponse
 from dotenv import load_dotenv
-from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
-import os
+from contextlib import asynccontextmanager
 import logging
 from pathlib import Path
-from database import init_database
+from database import init_database, close_client, pool_stats
+from indexes import ensure_indexes
+from http_cache import conditional_get_middleware
+from metrics import metrics_middleware, render_metrics
+from cache import catalog_cache
+from coherence import cache_listener, LIVE
+from health import readiness_probe, READY, DEGRADED
+from write_behind import contact_queue
+from jobs import job_runner, JOB_RUNNER_ENABLED
+from ratelimit import rate_limit_middleware, rate_limiter
+from idempotency import idempotency_middleware, response_cache, REPLAYED_HEADER
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+import os
+import time
+
+try:
+    from brotli_asgi import BrotliMiddleware
+except ImportError:  # brotli is optional, gzip covers every client
+    BrotliMiddleware = None
 
 # Import route modules
-from routes import tours, contact, transfers, gallery
+from routes import tours, contact, transfers, gallery, admin, exports
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Run startup work, then close the shared MongoDB client on shutdown"""
+    await startup_db_client()
+    await contact_queue.start()
+    await cache_listener.start()
+    if JOB_RUNNER_ENABLED:
+        await job_runner.start()
+    yield
+    await job_runner.stop()
+    await cache_listener.stop()
+    await contact_queue.stop()
+    await shutdown_db_client()
+
 
 # Create the main app without a prefix
 app = FastAPI(
     title="Zanzibar Explore Tours API",
     description="Backend API for Zanzibar tourism website",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Add a direct root route on app
@@ -39,9 +68,86 @@ api_router = APIRouter(prefix="/api")
 async def api_root():
     return {"message": "Zanzibar Explore Tours API - API Root"}
 
+STARTED_AT = time.monotonic()
+
 @api_router.get("/health")
 async def health_check():
-    return {"status": "healthy", "message": "API is running"}
+    """Overall status; always 200 so it can't take the worker down on its own"""
+    readiness = await readiness_probe.check()
+    healthy = readiness["status"] in (READY, DEGRADED)
+    return {
+        "status": "healthy" if healthy else "unhealthy",
+        "message": "API is running" if healthy else "API is running but not ready for traffic",
+        "readiness": readiness,
+    }
+
+@api_router.get("/health/live")
+async def liveness():
+    """Liveness probe: the event loop is serving requests. No dependency checks"""
+    return {"status": "alive", "uptime_seconds": round(time.monotonic() - STARTED_AT, 1)}
+
+@api_router.get("/health/ready")
+async def readiness(response: Response):
+    """Readiness probe: 503 until startup finished and while MongoDB is unreachable or the pool is saturated"""
+    result = await readiness_probe.check()
+    if result["status"] not in (READY, DEGRADED):
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    return result
+
+@api_router.get("/health/pool")
+async def pool_health():
+    """MongoDB connection pool statistics for this worker"""
+    return pool_stats.snapshot()
+
+@api_router.get("/health/cache")
+async def cache_health():
+    """Catalog cache counters and the state of this worker's change stream listener"""
+    return {**catalog_cache.stats(), "coherence": cache_listener.stats()}
+
+@api_router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Request, MongoDB command and pool metrics in Prometheus text format"""
+    pool = pool_stats.snapshot()
+    cache = catalog_cache.stats()
+    contacts = contact_queue.stats()
+    limits = rate_limiter.stats()
+    replays = response_cache.stats()
+    coherence = cache_listener.stats()
+    jobs = job_runner.stats()
+    gauges = {
+        "mongo_pool_open_connections": pool["open_connections"],
+        "mongo_pool_checked_out": pool["checked_out"],
+        "mongo_pool_waiting": pool["waiting"],
+        "mongo_pool_max_size": pool["max_pool_size"],
+        "mongo_pool_checkout_failures": pool["checkout_failures"],
+        "catalog_cache_entries": cache["entries"],
+        "catalog_cache_hits": cache["hits"],
+        "catalog_cache_misses": cache["misses"],
+        "catalog_cache_evictions": cache["evictions"],
+        "catalog_cache_ttl_seconds": coherence["cache_ttl"],
+        "cache_coherence_live": int(coherence["state"] == LIVE),
+        "cache_coherence_events": coherence["events"],
+        "cache_coherence_reconnects": coherence["reconnects"],
+        "gallery_view_refreshes": coherence["view_refreshes"],
+        "contact_queue_pending": contacts["pending"],
+        "contact_queue_max_pending": contacts["max_pending"],
+        "contact_queue_oldest_pending_seconds": contacts["oldest_pending_seconds"],
+        "contact_queue_submitted": contacts["submitted"],
+        "contact_queue_flushed": contacts["flushed"],
+        "contact_queue_rejected": contacts["rejected"],
+        "contact_queue_dropped": contacts["dropped"],
+        "contact_queue_flush_failures": contacts["flush_failures"],
+        "contact_queue_last_flush_seconds": contacts["last_flush_seconds"],
+        "jobs_running": jobs["running"],
+        "jobs_succeeded": jobs["succeeded"],
+        "jobs_retried": jobs["retried"],
+        "jobs_failed": jobs["failed"],
+        "rate_limit_allowed": limits["allowed"],
+        "rate_limit_limited": limits["limited"],
+        "idempotency_entries": replays["entries"],
+        "idempotency_replayed": replays["replayed"],
+    }
+    return PlainTextResponse(render_metrics(gauges), media_type="text/plain; version=0.0.4")
 
 # Include the router in the main app
 app.include_router(api_router)
@@ -51,6 +157,24 @@ app.include_router(tours.router)
 app.include_router(contact.router)
 app.include_router(transfers.router)
 app.include_router(gallery.router)
+app.include_router(admin.router)
+app.include_router(exports.router)
+
+# Compress responses above the size threshold, brotli when available.
+# Added first so it sits inside the other middleware and sees whole bodies
+COMPRESSION_MIN_SIZE = int(os.environ.get("COMPRESSION_MIN_SIZE", "1024"))
+if BrotliMiddleware is not None:
+    app.add_middleware(BrotliMiddleware, minimum_size=COMPRESSION_MIN_SIZE, gzip_fallback=True)
+else:
+    app.add_middleware(GZipMiddleware, minimum_size=COMPRESSION_MIN_SIZE)
+
+# ETag / Last-Modified validators and 304 answers for catalog endpoints
+app.middleware("http")(conditional_get_middleware)
+
+# Public POST routes: per-client token buckets, and repeats of a request
+# answered from the response cache before they use up tokens
+app.middleware("http")(rate_limit_middleware)
+app.middleware("http")(idempotency_middleware)
 
 origins = [
     "http://localhost:3000",
@@ -63,8 +187,12 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "Server-Timing", "Retry-After", REPLAYED_HEADER],
 )
 
+# Latency per route and Server-Timing; added last so it times everything above
+app.middleware("http")(metrics_middleware)
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -72,18 +200,35 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-@app.on_event("startup")
-async def startup_db_client():
-    """Initialize database with sample data on startup"""
+async def startup_db_client() -> bool:
+    """Create indexes and initialize database with sample data on startup.
+
+    Returns whether both steps succeeded; until they have, the readiness probe
+    keeps the worker out of the load balancer and retries them.
+    """
+    ok = True
+    try:
+        await ensure_indexes()
+        logger.info("Database indexes ensured")
+    except Exception as e:
+        ok = False
+        logger.error(f"Index creation failed: {str(e)}")
+
     try:
         await init_database()
         logger.info("Database initialized successfully")
     except Exception as e:
+        ok = False
         logger.error(f"Database initialization failed: {str(e)}")
 
-@app.on_event("shutdown")
+    if ok:
+        readiness_probe.mark_initialized()
+    return ok
+
+readiness_probe.initializer = startup_db_client
+
 async def shutdown_db_client():
-    client.close()
+    close_client()
 
 @app.post("/init-db")
 async def init_db():
@@ -0,0 +1,140 @@
+"""Status state machines and bulk status transitions.
+
+A bulk request selects documents by ID or by filter and moves every one whose
+current status allows the target status, all in one unordered bulk_write.
+Each update only applies if the document still has the status it was read
+with. A document that someone else changed in the meantime is therefore
+reported as a conflict instead of being overwritten.
+"""
+from collections import Counter
+from typing import Dict, List, Optional, Set
+
+from bson import ObjectId
+from fastapi import HTTPException, status
+from pymongo import UpdateOne
+
+from models import BulkStatusResult, StatusChangeResult
+from rollups import record_status_change, rollup_projection
+
+# Status -> statuses it may move to
+TRANSFER_TRANSITIONS: Dict[str, Set[str]] = {
+    "pending": {"confirmed", "completed", "cancelled"},
+    "confirmed": {"completed", "cancelled"},
+    "completed": set(),
+    "cancelled": set(),
+}
+CONTACT_TRANSITIONS: Dict[str, Set[str]] = {
+    "new": {"replied", "closed"},
+    "replied": {"closed"},
+    "closed": {"new"},  # reopened
+}
+
+# Documents one request may select, by IDs or by filter
+MAX_BULK_STATUS = 5000
+
+
+def _too_many(what: str) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"{what} selects more than {MAX_BULK_STATUS} documents"
+    )
+
+
+async def bulk_transition(
+    collection,
+    kind: str,
+    transitions: Dict[str, Set[str]],
+    default_status: str,
+    target: str,
+    ids: Optional[List[str]] = None,
+    query: Optional[dict] = None,
+) -> BulkStatusResult:
+    """Move the documents selected by ``ids`` or ``query`` to ``target``.
+
+    Every document gets its own result: moved (200), already at the target
+    (200, counted as unchanged), bad or unknown ID (400/404), or a
+    transition the state machine doesn't allow (409). The status rollups
+    are updated with the moves that were applied.
+    """
+    if target not in transitions:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Status must be one of: {', '.join(transitions)}"
+        )
+    if (ids is None) == (query is None):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Select documents with either ids or a filter"
+        )
+
+    results: Dict[str, StatusChangeResult] = {}
+    if ids is not None:
+        ids = list(dict.fromkeys(str(ObjectId(i)) if ObjectId.is_valid(i) else i for i in ids))
+        if len(ids) > MAX_BULK_STATUS:
+            raise _too_many("The ID list")
+        for document_id in ids:
+            if not ObjectId.is_valid(document_id):
+                results[document_id] = StatusChangeResult(id=document_id, status_code=400, error="Invalid ID format")
+        valid = [ObjectId(document_id) for document_id in ids if document_id not in results]
+        documents = await collection.find({"_id": {"$in": valid}}, rollup_projection(kind)).to_list(None)
+        order = ids
+    else:
+        documents = await collection.find(query, rollup_projection(kind)).sort("_id", 1).to_list(MAX_BULK_STATUS + 1)
+        if len(documents) > MAX_BULK_STATUS:
+            raise _too_many("The filter")
+        order = [str(document["_id"]) for document in documents]
+
+    # Marks the documents this request moved, to tell them from ones another request moved
+    operations, moves, change_id = [], {}, ObjectId()
+    for document in documents:
+        document_id = str(document["_id"])
+        current = document.get("status") or default_status
+        if current == target:
+            results[document_id] = StatusChangeResult(id=document_id, status_code=200, previous_status=current)
+        elif target not in transitions.get(current, ()):
+            results[document_id] = StatusChangeResult(
+                id=document_id, status_code=409, previous_status=current,
+                error=f"Cannot change status from {current} to {target}"
+            )
+        else:
+            # Conditional on the stored value, so a concurrent change makes this a no-op
+            operations.append(UpdateOne({"_id": document["_id"], "status": document.get("status")},
+                                        {"$set": {"status": target, "status_change": change_id}}))
+            moves[document_id] = current
+
+    if operations:
+        result = await collection.bulk_write(operations, ordered=False)
+        if result.modified_count < len(operations):
+            # Find out which documents changed under us; rare, so one extra query is fine.
+            # A document another request moved to the target too is not one of ours
+            changed = await collection.find(
+                {"_id": {"$in": [ObjectId(document_id) for document_id in moves]}, "status_change": {"$ne": change_id}},
+                {"status": 1},
+            ).to_list(None)
+            for document in changed:
+                document_id = str(document["_id"])
+                results[document_id] = StatusChangeResult(
+                    id=document_id, status_code=409, previous_status=document.get("status"),
+                    error="Status was changed by another request"
+                )
+                del moves[document_id]
+    for document_id, previous in moves.items():
+        results[document_id] = StatusChangeResult(id=document_id, status_code=200, previous_status=previous)
+
+    # Moves into or out of cancelled also adjust the daily rollups, which need the documents
+    by_id = {str(document["_id"]): document for document in documents}
+    for previous, count in Counter(moves.values()).items():
+        moved = [by_id[document_id] for document_id, status_from in moves.items() if status_from == previous]
+        await record_status_change(kind, previous, target, count, moved)
+
+    for document_id in order:
+        if document_id not in results:
+            results[document_id] = StatusChangeResult(id=document_id, status_code=404, error="Not found")
+    ordered = [results[document_id] for document_id in order]
+    unchanged = sum(1 for item in ordered if item.status_code == 200 and item.id not in moves)
+    return BulkStatusResult(
+        updated=len(moves),
+        unchanged=unchanged,
+        failed=sum(1 for item in ordered if item.error is not None),
+        results=ordered,
+    )
@@ -0,0 +1,42 @@
+from typing import Dict, List
+
+# Precomputed category -> [url] view of the gallery collection
+GALLERY_VIEW = "gallery_by_category"
+
+
+def _gallery_group_pipeline() -> List[dict]:
+    return [
+        {"$sort": {"created_at": 1, "_id": 1}},
+        {"$project": {"_id": 0, "category": 1, "url": 1, "created_at": 1}},
+        {"$group": {
+            "_id": "$category",
+            "urls": {"$push": "$url"},
+            "first_created_at": {"$first": "$created_at"},
+        }},
+        {"$sort": {"first_created_at": 1}},
+    ]
+
+
+def _as_dict(groups) -> Dict[str, List[str]]:
+    return {group["_id"]: group["urls"] for group in groups}
+
+
+async def group_gallery(database) -> Dict[str, List[str]]:
+    """Group gallery URLs by category with a $group aggregation"""
+    groups = await database.gallery.aggregate(_gallery_group_pipeline()).to_list(None)
+    return _as_dict(groups)
+
+
+async def refresh_gallery_view(database) -> None:
+    """Rebuild the materialized gallery view; $out swaps it in atomically"""
+    pipeline = _gallery_group_pipeline() + [{"$out": GALLERY_VIEW}]
+    async for _ in database.gallery.aggregate(pipeline):
+        pass
+
+
+async def read_gallery_view(database) -> Dict[str, List[str]]:
+    """Read the grouped gallery from the view, aggregating live if it isn't built yet"""
+    groups = await database[GALLERY_VIEW].find().sort("first_created_at", 1).to_list(None)
+    if groups:
+        return _as_dict(groups)
+    return await group_gallery(database)
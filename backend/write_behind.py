@@ -0,0 +1,310 @@
+import asyncio
+import fcntl
+import glob
+import logging
+import os
+import re
+import time
+from pathlib import Path
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+from bson import json_util
+from pymongo.errors import BulkWriteError
+
+from database import contacts_collection
+from rollups import record_contacts
+from jobs import enqueue_many, CONTACT_NOTIFICATION
+
+logger = logging.getLogger(__name__)
+
+ROOT_DIR = Path(__file__).parent
+
+# Flush when this many documents are waiting, or after the interval at the latest
+FLUSH_BATCH_SIZE = int(os.environ.get("CONTACT_FLUSH_BATCH_SIZE", "100"))
+FLUSH_INTERVAL_SECONDS = float(os.environ.get("CONTACT_FLUSH_INTERVAL_MS", "500")) / 1000
+# Submissions are refused with 503 beyond this many unflushed documents
+MAX_PENDING = int(os.environ.get("CONTACT_QUEUE_LIMIT", "10000"))
+SPOOL_DIR = Path(os.environ.get("CONTACT_SPOOL_DIR", ROOT_DIR / "spool"))
+# fsync every spooled submission; without it a process crash loses nothing,
+# only a machine crash can lose the last writes the OS hadn't flushed
+SPOOL_FSYNC = os.environ.get("CONTACT_SPOOL_FSYNC", "false").lower() == "true"
+
+# Delay before retrying after MongoDB rejected a flush, doubled up to the max
+RETRY_SECONDS = 0.5
+MAX_RETRY_SECONDS = 30.0
+
+DUPLICATE_KEY = 11000
+
+
+class QueueFull(Exception):
+    """The write-behind queue has reached MAX_PENDING unflushed documents"""
+
+
+class WriteBehindQueue:
+    """Acknowledges documents at once and writes them to MongoDB in batches.
+
+    Every submitted document is first appended to a local NDJSON spool file,
+    then buffered in memory and flushed with one unordered insert_many once
+    FLUSH_BATCH_SIZE documents are waiting or FLUSH_INTERVAL_SECONDS has
+    passed. The spool is rewritten with whatever is still unflushed once the
+    backlog is written, and replayed on start, so a crash loses nothing. Documents
+    carry their _id from the start, which makes replaying one that did reach
+    MongoDB a harmless duplicate key error.
+
+    Each worker holds an flock on its own lock file next to its spool for as
+    long as the queue runs. The OS drops the lock when the process dies, so a
+    spool whose lock can be taken belongs to a dead worker and is safe to claim.
+    """
+
+    def __init__(self, collection, name: str, spool_dir: Path = SPOOL_DIR,
+                 batch_size: int = FLUSH_BATCH_SIZE, interval: float = FLUSH_INTERVAL_SECONDS,
+                 max_pending: int = MAX_PENDING,
+                 on_flush: Optional[Callable[[List[dict]], Awaitable[None]]] = None):
+        self.collection = collection
+        # Called with the documents each batch actually inserted
+        self.on_flush = on_flush
+        self.name = name
+        self.spool_dir = Path(spool_dir)
+        self.batch_size = batch_size
+        self.interval = interval
+        self.max_pending = max_pending
+
+        self._pending: List[dict] = []
+        self._enqueued_at: List[float] = []
+        self._spool = None
+        self._lock = None
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+        self.submitted = 0
+        self.flushed = 0
+        self.batches = 0
+        self.rejected = 0
+        self.dropped = 0
+        self.flush_failures = 0
+        self.last_flush_seconds = 0.0
+
+    @property
+    def spool_path(self) -> Path:
+        # One spool per worker process; leftovers of dead workers are claimed on start
+        return self.spool_dir / f"{self.name}.{os.getpid()}.ndjson"
+
+    @staticmethod
+    def _try_lock(path: Path):
+        """Open and exclusively flock a lock file; None while another process holds it"""
+        lock = open(path, "a")
+        try:
+            fcntl.flock(lock.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock.close()
+            return None
+        return lock
+
+    @staticmethod
+    def _read_spool(path: str) -> Tuple[Optional[str], List[dict]]:
+        """Claim a spool by renaming it, then read it; the file stays until its documents are respooled"""
+        suffix = f".replay.{os.getpid()}"
+        claimed = path if path.endswith(suffix) else path + suffix
+        try:
+            if path != claimed:
+                os.rename(path, claimed)
+        except FileNotFoundError:
+            return None, []  # another worker claimed it first
+        documents = []
+        with open(claimed, encoding="utf-8") as spool:
+            for line in spool:
+                line = line.strip()
+                if line:
+                    documents.append(json_util.loads(line))
+        return claimed, documents
+
+    def _claim_spools(self) -> Tuple[List[str], List[dict]]:
+        """Take over this process's spool and those of dead workers, never a live worker's.
+
+        Spools a dead worker had claimed but not yet respooled (``.replay.<pid>``)
+        are taken over too; they belong to the worker that claimed them.
+        Returns the claimed files, to remove once their documents are respooled.
+        """
+        claimed, documents = [], []
+        pattern = re.compile(rf"{re.escape(self.name)}\.\d+\.ndjson(\.replay\.\d+)*")
+        for path in sorted(glob.glob(str(self.spool_dir / f"{self.name}.*.ndjson*"))):
+            if pattern.fullmatch(Path(path).name) is None:
+                continue
+            # The worker that wrote the spool, or the last one that claimed it
+            owner = int(path.rsplit(".", 1)[1] if ".replay." in path else path.rsplit(".", 2)[1])
+            if owner == os.getpid():
+                claimed_path, spooled = self._read_spool(path)
+            else:
+                lock_path = self.spool_dir / f"{self.name}.{owner}.lock"
+                lock = self._try_lock(lock_path)
+                if lock is None:
+                    continue  # its worker is alive
+                try:
+                    claimed_path, spooled = self._read_spool(path)
+                    lock_path.unlink(missing_ok=True)
+                finally:
+                    lock.close()
+            if claimed_path is not None:
+                claimed.append(claimed_path)
+                documents.extend(spooled)
+        return claimed, documents
+
+    def _rewrite_spool(self) -> None:
+        """Replace the spool with the documents still waiting to be flushed"""
+        if self._spool is not None:
+            self._spool.close()
+        temporary = self.spool_path.with_suffix(".tmp")
+        with open(temporary, "w", encoding="utf-8") as spool:
+            for document in self._pending:
+                spool.write(json_util.dumps(document) + "\n")
+            spool.flush()
+            os.fsync(spool.fileno())
+        os.replace(temporary, self.spool_path)
+        self._spool = open(self.spool_path, "a", encoding="utf-8")
+
+    async def start(self) -> None:
+        """Replay spooled documents and start the background flusher"""
+        if self._task is not None:
+            return
+        self.spool_dir.mkdir(parents=True, exist_ok=True)
+        if self._lock is None:
+            self._lock = self._try_lock(self.spool_path.with_suffix(".lock"))
+        claimed, recovered = self._claim_spools()
+        if recovered:
+            logger.info(f"Replaying {len(recovered)} spooled {self.name} documents")
+        self._pending = recovered
+        self._enqueued_at = [time.monotonic()] * len(recovered)
+        # The claimed files go only once their documents are safely in our own spool
+        self._rewrite_spool()
+        for path in claimed:
+            os.remove(path)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the flusher after one last flush; unflushed documents stay spooled"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        try:
+            await self.drain()
+        except Exception as e:
+            logger.error(f"Final {self.name} flush failed, {len(self._pending)} documents left in the spool: {str(e)}")
+        self._spool.close()
+        self._spool = None
+        if self._lock is not None:
+            self._lock.close()
+            self._lock = None
+
+    async def submit(self, document: dict) -> None:
+        """Spool a document and queue it for the next batch.
+
+        The document must already have its _id. Raises QueueFull when
+        MongoDB has fallen too far behind.
+        """
+        if self._task is None:
+            await self.start()
+        if len(self._pending) >= self.max_pending:
+            self.rejected += 1
+            raise QueueFull(f"{len(self._pending)} {self.name} documents waiting to be written")
+
+        self._spool.write(json_util.dumps(document) + "\n")
+        self._spool.flush()
+        if SPOOL_FSYNC:
+            os.fsync(self._spool.fileno())
+
+        self._pending.append(document)
+        self._enqueued_at.append(time.monotonic())
+        self.submitted += 1
+        if len(self._pending) >= self.batch_size:
+            self._wake.set()
+
+    async def flush(self) -> int:
+        """Write up to one batch of pending documents; returns how many were written.
+
+        The spool still holds the batch afterwards, until drain() rewrites it.
+        """
+        if not self._pending:
+            return 0
+        batch = self._pending[:self.batch_size]
+        started = time.perf_counter()
+        not_inserted = set()
+        try:
+            await self.collection.insert_many(batch, ordered=False)
+        except BulkWriteError as e:
+            # Documents replayed after a crash may already be stored. Anything
+            # else the server rejected would fail the same way on every retry
+            for error in e.details.get("writeErrors", []):
+                not_inserted.add(error["index"])
+                if error.get("code") != DUPLICATE_KEY:
+                    self.dropped += 1
+                    logger.error(f"Dropping {self.name} document {batch[error['index']].get('_id')}: {error.get('errmsg')}")
+            if e.details.get("writeConcernErrors"):
+                raise
+        self.last_flush_seconds = time.perf_counter() - started
+
+        del self._pending[:len(batch)]
+        del self._enqueued_at[:len(batch)]
+        self.flushed += len(batch)
+        self.batches += 1
+        if self.on_flush is not None:
+            await self.on_flush([document for index, document in enumerate(batch) if index not in not_inserted])
+        return len(batch)
+
+    async def drain(self) -> None:
+        """Flush every full batch plus one partial one, then compact the spool if anything was written"""
+        written = 0
+        while True:
+            count = await self.flush()
+            written += count
+            if count < self.batch_size or len(self._pending) < self.batch_size:
+                break
+        if written:
+            self._rewrite_spool()
+
+    async def _run(self) -> None:
+        delay = RETRY_SECONDS
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self.drain()
+                delay = RETRY_SECONDS
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.flush_failures += 1
+                logger.error(f"Flushing {self.name} failed, retrying in {delay:.1f}s: {str(e)}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, MAX_RETRY_SECONDS)
+
+    def stats(self) -> dict:
+        oldest = time.monotonic() - self._enqueued_at[0] if self._enqueued_at else 0.0
+        return {
+            "pending": len(self._pending),
+            "max_pending": self.max_pending,
+            "oldest_pending_seconds": round(oldest, 3),
+            "submitted": self.submitted,
+            "flushed": self.flushed,
+            "batches": self.batches,
+            "rejected": self.rejected,
+            "dropped": self.dropped,
+            "flush_failures": self.flush_failures,
+            "last_flush_seconds": round(self.last_flush_seconds, 4),
+        }
+
+
+async def contacts_written(documents: List[dict]) -> None:
+    """Count written contacts and tell the operators about them"""
+    await record_contacts(documents)
+    await enqueue_many(CONTACT_NOTIFICATION, [{"contact_id": str(document["_id"])} for document in documents])
+
+
+contact_queue = WriteBehindQueue(contacts_collection, "contacts", on_flush=contacts_written)
@@ -0,0 +1,55 @@
+"""Shared fixtures: the backend runs against mongomock-motor, one database per session.
+
+The backend modules build their Motor client at import time, so the client
+class is swapped and the environment set before anything from backend/ is
+imported.
+"""
+import os
+import sys
+from pathlib import Path
+
+import motor.motor_asyncio
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+motor.motor_asyncio.AsyncIOMotorClient = AsyncMongoMockClient
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "tests")
+os.environ.setdefault("CACHE_COHERENCE_ENABLED", "false")
+os.environ.setdefault("JOB_RUNNER_ENABLED", "false")
+os.environ.setdefault("SMTP_HOST", "")
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+async def db():
+    """The backend database, emptied before each test"""
+    import database
+    from cache import catalog_cache
+
+    for name in await database.db.list_collection_names():
+        await database.db.drop_collection(name)
+    catalog_cache.invalidate()
+    yield database.db
+
+
+@pytest.fixture
+async def client(db, monkeypatch):
+    """HTTP client for the app, with empty rate limit buckets and response cache"""
+    import httpx
+    import idempotency
+    import ratelimit
+    import server
+
+    monkeypatch.setattr(idempotency, "response_cache", idempotency.ResponseCache())
+    monkeypatch.setattr(ratelimit, "rate_limiter", ratelimit.RateLimiter(ratelimit.MemoryBucketStore()))
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+        yield http
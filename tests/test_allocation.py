@@ -0,0 +1,71 @@
+from datetime import date
+
+import pytest
+
+from allocation import cheapest_allocation, seat_passengers
+
+FLEET = [("Economy Car", 3, 25.0, 4), ("SUV", 6, 35.0, 3), ("Minivan", 12, 55.0, 2)]
+
+
+@pytest.mark.parametrize("passengers, expected", [
+    (1, {"Economy Car": 1}),
+    (4, {"SUV": 1}),
+    (7, {"Minivan": 1}),
+    (13, {"Minivan": 1, "Economy Car": 1}),
+    (30, {"Minivan": 2, "SUV": 1}),
+])
+def test_cheapest_allocation(passengers, expected):
+    assert cheapest_allocation(passengers, FLEET) == expected
+
+
+def test_ties_go_to_fewer_vehicles():
+    # Two cars or one van cost the same
+    assert cheapest_allocation(6, [("Car", 3, 20.0, 2), ("Van", 6, 40.0, 1)]) == {"Van": 1}
+
+
+def test_fleet_too_small():
+    assert cheapest_allocation(12 * 2 + 6 * 3 + 3 * 4 + 1, FLEET) is None
+    assert cheapest_allocation(2, [("SUV", 6, 35.0, 0)]) is None
+    assert cheapest_allocation(2, []) is None
+
+
+def test_vehicles_without_seats_are_ignored():
+    assert cheapest_allocation(2, [("Broken", 0, 1.0, 5), ("SUV", 6, 35.0, 1)]) == {"SUV": 1}
+
+
+@pytest.mark.parametrize("passengers", [0, -4])
+def test_empty_party_is_an_error(passengers):
+    with pytest.raises(ValueError):
+        cheapest_allocation(passengers, FLEET)
+
+
+def test_seat_passengers_fills_in_order():
+    assert seat_passengers(13, [12, 3]) == [12, 1]
+    assert seat_passengers(2, [6, 6]) == [2, 0]
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("path, extra", [
+    ("/api/transfers/bookings", {"split": True}),
+    ("/api/transfers/quote", {}),
+])
+async def test_empty_party_gets_422(client, db, path, extra):
+    body = {
+        "customer_name": "Guest", "email": "guest@example.com", "phone": "+255 777 000 000",
+        "flight_number": "TK 603", "arrival_date": date(2030, 5, 10).isoformat(), "arrival_time": "10:00:00",
+        "passengers": 0, "vehicle_type": "SUV", "destination": "Paje", **extra,
+    }
+    response = await client.post(path, json=body)
+    assert response.status_code == 422
+    assert await db.transfer_bookings.count_documents({}) == 0
+
+
+@pytest.mark.anyio
+async def test_batch_rejects_an_empty_party(client, db):
+    body = {
+        "customer_name": "Guest", "email": "guest@example.com", "phone": "+255 777 000 000",
+        "flight_number": "TK 603", "arrival_date": "2030-05-10", "arrival_time": "10:00:00",
+        "passengers": 0, "vehicle_type": "SUV", "destination": "Paje", "split": True,
+    }
+    response = await client.post("/api/transfers/bookings/batch", json=[body])
+    assert response.status_code == 422
@@ -0,0 +1,126 @@
+from datetime import date, time
+
+import pytest
+from bson import ObjectId
+
+from fleet import FleetScheduler, service_window
+from models import MAX_BATCH_SIZE
+from routes import tours, transfers
+
+pytestmark = pytest.mark.anyio
+
+DAY = date(2030, 5, 10)
+START, END = service_window(DAY, time(10, 0), "Stone Town")
+
+
+async def _tour(db, capacity=5):
+    result = await db.tours.insert_one({
+        "title": "Spice Farm Tour", "description": "Spices", "image": "spice.jpg", "price": 35.0,
+        "duration": "Half Day", "category": "cultural", "features": [], "capacity": capacity,
+    })
+    return str(result.inserted_id)
+
+
+def _booking(tour_id, guests=2):
+    return {
+        "tour_id": tour_id, "customer_name": "Guest", "email": "guest@example.com", "phone": "+255 777 000 000",
+        "booking_date": DAY.isoformat(), "guests": guests,
+    }
+
+
+async def _vehicle(db, fleet_size=1):
+    await db.vehicles.insert_one({
+        "type": "SUV", "description": "SUV", "price": 35.0, "features": [],
+        "capacity": 6, "fleet_size": fleet_size, "available": True,
+    })
+
+
+def _transfer(passengers=2, vehicle_type="SUV", arrival_date=DAY):
+    return {
+        "customer_name": "Guest", "email": "guest@example.com", "phone": "+255 777 000 000",
+        "flight_number": "TK 603", "arrival_date": arrival_date.isoformat(), "arrival_time": "10:00:00",
+        "passengers": passengers, "vehicle_type": vehicle_type, "destination": "Stone Town",
+    }
+
+
+@pytest.fixture
+def scheduler(monkeypatch):
+    """A fresh fleet schedule for the transfer routes, re-read on every refresh"""
+    scheduler = FleetScheduler(refresh_seconds=0)
+    monkeypatch.setattr(transfers, "fleet_scheduler", scheduler)
+    return scheduler
+
+
+def _outcomes(response):
+    return [item["status_code"] for item in response.json()["results"]]
+
+
+async def test_tour_batch_results_per_item(client, db):
+    tour_id = await _tour(db, capacity=5)
+    response = await client.post("/api/tours/bookings/batch", json=[
+        _booking(tour_id, 3), _booking("nope"), _booking(str(ObjectId())), _booking(tour_id, 3), _booking(tour_id, 2),
+    ])
+    assert response.status_code == 200
+    assert _outcomes(response) == [201, 400, 404, 409, 201]
+    assert (response.json()["created"], response.json()["failed"]) == (2, 3)
+    assert await db.bookings.count_documents({}) == 2
+    assert (await db.tour_inventory.find_one({}))["booked"] == 5
+
+
+async def test_transfer_batch_results_per_item(client, db, scheduler):
+    await _vehicle(db)
+    response = await client.post("/api/transfers/bookings/batch", json=[
+        _transfer(), _transfer(vehicle_type="Bus"), _transfer(passengers=9), _transfer(),
+        _transfer(arrival_date=date(2030, 5, 12)),
+    ])
+    assert response.status_code == 200
+    assert _outcomes(response) == [201, 404, 400, 409, 201]
+    assert await db.transfer_bookings.count_documents({}) == 2
+    unit = await db.fleet_schedule.find_one({"_id": "SUV #1"})
+    assert len(unit["intervals"]) == 2
+
+
+async def test_transfer_batch_picks_again_after_losing_a_unit(client, db, scheduler):
+    await _vehicle(db, fleet_size=2)
+    # Another worker took SUV #1 after this one read the day
+    await scheduler.refresh(DAY)
+    other = FleetScheduler()
+    await other.refresh(DAY)
+    assert await other.reserve(["SUV #1"], START, END, "other")
+    scheduler.refresh_seconds = 3600
+
+    # The first pick lost SUV #1, so it is made again and finds nothing left
+    response = await client.post("/api/transfers/bookings/batch", json=[_transfer(), _transfer()])
+    assert _outcomes(response) == [409, 201]
+    booked = await db.transfer_bookings.find_one({})
+    assert booked["vehicle_units"] == ["SUV #2"]
+
+
+@pytest.mark.parametrize("path, item", [
+    ("/api/tours/bookings/batch", _booking(str(ObjectId()))),
+    ("/api/transfers/bookings/batch", _transfer()),
+])
+async def test_batch_size_limit(client, db, path, item):
+    response = await client.post(path, json=[item] * (MAX_BATCH_SIZE + 1))
+    assert response.status_code == 413
+
+
+async def _failing_insert(collection, models, keep_id=False):
+    raise RuntimeError("primary stepped down")
+
+
+async def test_tour_seats_are_released_when_the_insert_fails(client, db, monkeypatch):
+    tour_id = await _tour(db)
+    monkeypatch.setattr(tours, "insert_models", _failing_insert)
+    response = await client.post("/api/tours/bookings/batch", json=[_booking(tour_id, 2), _booking(tour_id, 1)])
+    assert response.status_code == 500
+    assert (await db.tour_inventory.find_one({}))["booked"] == 0
+
+
+async def test_transfer_units_are_released_when_the_insert_fails(client, db, scheduler, monkeypatch):
+    await _vehicle(db)
+    monkeypatch.setattr(transfers, "insert_models", _failing_insert)
+    response = await client.post("/api/transfers/bookings/batch", json=[_transfer()])
+    assert response.status_code == 500
+    assert (await db.fleet_schedule.find_one({"_id": "SUV #1"}))["intervals"] == []
+    assert scheduler.best_fit("SUV", START, END) == "SUV #1"
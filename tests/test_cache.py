@@ -0,0 +1,65 @@
+import asyncio
+
+import pytest
+
+import cache
+from cache import CatalogCache, TOURS, GALLERY
+
+pytestmark = pytest.mark.anyio
+
+
+def _loader(value, calls):
+    async def load():
+        calls.append(value)
+        await asyncio.sleep(0)
+        return value
+    return load
+
+
+async def test_concurrent_misses_share_one_load():
+    catalog = CatalogCache()
+    calls = []
+    values = await asyncio.gather(*[catalog.get_or_load(TOURS, "list", _loader("tours", calls)) for _ in range(5)])
+    assert values == ["tours"] * 5
+    assert calls == ["tours"]
+    assert catalog.stats()["misses"] == 1
+    assert not catalog._locks
+
+
+async def test_size_is_bounded_by_lru_eviction():
+    catalog = CatalogCache(max_entries=3)
+    calls = []
+    for min_price in range(300):
+        await catalog.get_or_load(TOURS, ("list", min_price), _loader(min_price, calls))
+    assert catalog.stats()["entries"] == 3
+    assert catalog.stats()["evictions"] == 297
+    assert not catalog._locks
+
+    # A hit refreshes an entry, so the oldest other one goes first
+    await catalog.get_or_load(TOURS, ("list", 297), _loader(297, calls))
+    await catalog.get_or_load(TOURS, ("list", 1000), _loader(1000, calls))
+    assert set(key for _, key in catalog._entries) == {("list", 297), ("list", 299), ("list", 1000)}
+
+
+async def test_expired_entries_are_reloaded(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(cache.time, "monotonic", lambda: now[0])
+    catalog = CatalogCache(ttl=10)
+    calls = []
+    await catalog.get_or_load(TOURS, "list", _loader("old", calls))
+    now[0] += 11
+    assert await catalog.get_or_load(TOURS, "list", _loader("new", calls)) == "new"
+    assert calls == ["old", "new"]
+
+
+async def test_none_is_not_cached_and_invalidate_is_per_namespace():
+    catalog = CatalogCache()
+    calls = []
+    assert await catalog.get_or_load(TOURS, "missing", _loader(None, calls)) is None
+    assert await catalog.get_or_load(TOURS, "missing", _loader(None, calls)) is None
+    assert len(calls) == 2
+
+    await catalog.get_or_load(TOURS, "list", _loader("tours", calls))
+    await catalog.get_or_load(GALLERY, "all", _loader("gallery", calls))
+    catalog.invalidate(TOURS)
+    assert [namespace for namespace, _ in catalog._entries] == [GALLERY]
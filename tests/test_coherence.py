@@ -0,0 +1,44 @@
+import asyncio
+
+import pytest
+
+from cache import CatalogCache, GALLERY
+from coherence import CacheCoherenceListener
+from views import read_gallery_view, GALLERY_VIEW
+
+pytestmark = pytest.mark.anyio
+
+
+def _event(collection_name):
+    return {"operationType": "insert", "ns": {"db": "tests", "coll": collection_name}}
+
+
+async def test_gallery_burst_rebuilds_the_view_once(db):
+    listener = CacheCoherenceListener(db, cache=CatalogCache(), view_database=db, view_refresh_delay=0.05)
+    await db.gallery.insert_many([
+        {"url": f"https://example.com/{index}.jpg", "category": "beaches", "created_at": index}
+        for index in range(3)
+    ])
+    for _ in range(3):
+        listener.apply(_event("gallery"))
+    await asyncio.sleep(0.1)
+
+    assert listener.stats()["view_refreshes"] == 1
+    assert await read_gallery_view(db) == {"beaches": [f"https://example.com/{index}.jpg" for index in range(3)]}
+
+
+async def test_view_and_other_events_do_not_rebuild(db):
+    catalog = CatalogCache()
+    listener = CacheCoherenceListener(db, cache=catalog, view_database=db, view_refresh_delay=0)
+    await catalog.get_or_load(GALLERY, "all", _value)
+    listener.apply(_event(GALLERY_VIEW))
+    listener.apply(_event("tours"))
+    await asyncio.sleep(0.01)
+
+    assert listener.stats()["view_refreshes"] == 0
+    # The view's own events still drop the cached gallery
+    assert catalog.stats()["entries"] == 0
+
+
+async def _value():
+    return "cached"
@@ -0,0 +1,130 @@
+import copy
+import csv
+import io
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+
+from export import TRANSFERS_EXPORT, export_chunks, CSV
+
+pytestmark = pytest.mark.anyio
+
+CREATED = datetime(2030, 1, 1, 12, 0)
+
+
+async def _transfers(db, count, **fields):
+    documents = [{
+        "_id": ObjectId(), "customer_name": f"Guest {index}", "email": "guest@example.com",
+        "phone": "+255 777 000 000", "flight_number": "TK 603", "arrival_date": f"2030-05-{10 + index:02d}",
+        "arrival_time": "10:00:00", "passengers": 2, "vehicle_type": "SUV", "destination": "Paje",
+        "vehicle_units": ["SUV #1"], "allocation": [{"vehicle_type": "SUV", "vehicle_unit": "SUV #1",
+                                                      "capacity": 6, "price": 35.0, "passengers": 2}],
+        "status": "pending", "created_at": CREATED + timedelta(minutes=index), **fields,
+    } for index in range(count)]
+    await db.transfer_bookings.insert_many(documents)
+    return documents
+
+
+def _rows(response):
+    return list(csv.DictReader(io.StringIO(response.text)))
+
+
+async def test_csv_header_and_rows(client, db):
+    documents = await _transfers(db, 2)
+    response = await client.get("/api/admin/exports/transfers")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    assert response.headers["content-disposition"] == 'attachment; filename="transfers-all.csv"'
+
+    header = response.text.splitlines()[0].split(",")
+    assert header == [column.name for column in TRANSFERS_EXPORT.columns]
+    rows = _rows(response)
+    assert [row["id"] for row in rows] == [str(document["_id"]) for document in documents]
+    assert (rows[0]["arrival_date"], rows[0]["arrival_time"], rows[0]["passengers"]) == ("2030-05-10", "10:00:00", "2")
+    assert (rows[0]["vehicle_units"], rows[0]["vehicles"], rows[0]["price"]) == ("SUV #1", "1", "35.0")
+    assert rows[0]["special_requests"] == ""
+
+
+async def test_parquet_round_trip(client, db):
+    pq = pytest.importorskip("pyarrow.parquet")
+    documents = await _transfers(db, 3)
+    response = await client.get("/api/admin/exports/transfers", params={"format": "parquet"})
+    assert response.status_code == 200
+
+    table = pq.read_table(io.BytesIO(response.content))
+    assert table.column_names == [column.name for column in TRANSFERS_EXPORT.columns]
+    assert table.column("id").to_pylist() == [str(document["_id"]) for document in documents]
+    assert [day.isoformat() for day in table.column("arrival_date").to_pylist()] == [
+        "2030-05-10", "2030-05-11", "2030-05-12",
+    ]
+    assert table.column("price").to_pylist() == [35.0] * 3
+    assert table.column("created_at").to_pylist()[0] == CREATED
+
+
+async def test_date_and_status_filters(client, db):
+    documents = await _transfers(db, 4)
+    await db.transfer_bookings.update_one({"_id": documents[2]["_id"]}, {"$set": {"status": "cancelled"}})
+
+    in_range = await client.get("/api/admin/exports/transfers", params={"start": "2030-05-11", "end": "2030-05-12"})
+    assert [row["arrival_date"] for row in _rows(in_range)] == ["2030-05-11", "2030-05-12"]
+    assert in_range.headers["content-disposition"] == 'attachment; filename="transfers-2030-05-11-2030-05-12.csv"'
+
+    cancelled = await client.get("/api/admin/exports/transfers", params={"status": "cancelled"})
+    assert [row["id"] for row in _rows(cancelled)] == [str(documents[2]["_id"])]
+
+    backwards = await client.get("/api/admin/exports/transfers", params={"start": "2030-05-12", "end": "2030-05-11"})
+    assert backwards.status_code == 400
+
+
+class _CountingCursor:
+    """Cursor that counts the documents read from it so far"""
+
+    def __init__(self, cursor):
+        self.cursor = cursor
+        self.read = 0
+
+    def sort(self, *args):
+        self.cursor = self.cursor.sort(*args)
+        return self
+
+    def batch_size(self, size):
+        self.cursor = self.cursor.batch_size(size)
+        return self
+
+    def __aiter__(self):
+        self.documents = self.cursor.__aiter__()
+        return self
+
+    async def __anext__(self):
+        document = await self.documents.__anext__()
+        self.read += 1
+        return document
+
+
+class _CountingCollection:
+    def __init__(self, collection):
+        self.collection = collection
+        self.cursor = None
+
+    def find(self, *args):
+        self.cursor = _CountingCursor(self.collection.find(*args))
+        return self.cursor
+
+
+async def test_large_exports_are_streamed_batch_by_batch(db):
+    await _transfers(db, 7)
+    spec = copy.copy(TRANSFERS_EXPORT)
+    spec.collection = _CountingCollection(db.transfer_bookings)
+
+    chunks = export_chunks(spec, {}, CSV, batch_size=3)
+    header = await chunks.__anext__()
+    assert header.decode().startswith("id,")
+    first = await chunks.__anext__()
+    # Only the first batch has been read when its rows are handed on
+    assert len(first.decode().splitlines()) == 3
+    assert spec.collection.cursor.read == 3
+
+    rest = [chunk async for chunk in chunks]
+    assert [len(chunk.decode().splitlines()) for chunk in rest] == [3, 1]
+    assert spec.collection.cursor.read == 7
@@ -0,0 +1,181 @@
+import asyncio
+from datetime import date, datetime, time, timedelta
+
+import pytest
+
+import fleet
+from fleet import FleetScheduler, service_window
+
+pytestmark = pytest.mark.anyio
+
+DAY = date(2030, 5, 10)
+START, END = service_window(DAY, time(10, 0), "Stone Town")
+
+
+async def _vehicle(db, vehicle_type="SUV", capacity=6, fleet_size=1, price=35.0):
+    await db.vehicles.insert_one({
+        "type": vehicle_type, "description": vehicle_type, "price": price, "features": [],
+        "capacity": capacity, "fleet_size": fleet_size, "available": True,
+    })
+
+
+def _transfer(passengers=2, vehicle_type="SUV", arrival_time="10:00:00", email="guest@example.com", **extra):
+    return {
+        "customer_name": "Guest", "email": email, "phone": "+255 777 000 000", "flight_number": "TK 603",
+        "arrival_date": DAY.isoformat(), "arrival_time": arrival_time, "passengers": passengers,
+        "vehicle_type": vehicle_type, "destination": "Stone Town", **extra,
+    }
+
+
+async def test_two_workers_cannot_reserve_the_same_unit(db):
+    await _vehicle(db)
+    first, second = FleetScheduler(), FleetScheduler()
+    for scheduler in (first, second):
+        await scheduler.refresh(DAY)
+    later = timedelta(minutes=30)
+    assert first.best_fit("SUV", START, END) == second.best_fit("SUV", START + later, END + later) == "SUV #1"
+
+    reserved = await asyncio.gather(
+        first.reserve(["SUV #1"], START, END, "a"),
+        second.reserve(["SUV #1"], START + later, END + later, "b"),
+    )
+    assert sorted(reserved) == [False, True]
+
+    loser = second if reserved[0] else first
+    await loser.refresh(DAY)
+    assert loser.best_fit("SUV", START + later, END + later) is None
+
+
+async def test_reservation_is_all_or_nothing(db):
+    await _vehicle(db, fleet_size=2)
+    scheduler = FleetScheduler()
+    await scheduler.refresh(DAY)
+    assert await scheduler.reserve(["SUV #2"], START, END, "taken")
+
+    assert not await scheduler.reserve(["SUV #1", "SUV #2"], START, END, "party")
+    unit = await db.fleet_schedule.find_one({"_id": "SUV #1"})
+    assert unit["intervals"] == []
+
+
+async def test_windows_back_to_back_do_not_conflict(db):
+    await _vehicle(db)
+    scheduler = FleetScheduler()
+    await scheduler.refresh(DAY)
+    assert await scheduler.reserve(["SUV #1"], START, END, "a")
+    assert await scheduler.reserve(["SUV #1"], END, END + (END - START), "b")
+
+
+class _SlowSchedule:
+    """Runs a callback while a day is being read, like a booking confirmed during the await"""
+
+    def __init__(self, collection, during):
+        self.collection = collection
+        self.during = during
+
+    def __getattr__(self, name):
+        return getattr(self.collection, name)
+
+    def aggregate(self, pipeline):
+        cursor, during = self.collection.aggregate(pipeline), self.during
+
+        class Cursor:
+            async def to_list(self, length):
+                during()
+                return await cursor.to_list(length)
+
+        return Cursor()
+
+
+async def test_reload_keeps_reservations_made_while_reading(db, monkeypatch):
+    await _vehicle(db)
+    scheduler = FleetScheduler(refresh_seconds=0)
+    await scheduler.refresh(DAY)
+    slow = _SlowSchedule(fleet.fleet_schedule_collection,
+                         lambda: scheduler.add_local(["SUV #1"], START, END, "meanwhile"))
+    monkeypatch.setattr(fleet, "fleet_schedule_collection", slow)
+
+    await scheduler.refresh(DAY)
+    assert scheduler.best_fit("SUV", START, END) is None
+
+
+async def test_negative_passengers_are_rejected(client, db):
+    await _vehicle(db)
+    response = await client.post("/api/transfers/bookings", json=_transfer(passengers=-3))
+    assert response.status_code == 422
+    assert await db.transfer_bookings.count_documents({}) == 0
+
+
+async def test_unit_busy_until_the_booking_is_cancelled(client, db, monkeypatch):
+    monkeypatch.setattr(fleet.fleet_scheduler, "refresh_seconds", 0)
+    await _vehicle(db)
+    booked = await client.post("/api/transfers/bookings", json=_transfer())
+    assert booked.status_code == 200
+    assert booked.json()["vehicle_units"] == ["SUV #1"]
+    stored = await db.transfer_bookings.find_one({})
+    assert (await db.fleet_schedule.find_one({"_id": "SUV #1"}))["intervals"][0]["booking_id"] == str(stored["_id"])
+
+    busy = await client.post("/api/transfers/bookings", json=_transfer(email="other@example.com"))
+    assert busy.status_code == 409
+
+    cancelled = await client.put("/api/transfers/bookings/status",
+                                 json={"status": "cancelled", "ids": [str(stored["_id"])]})
+    assert cancelled.json()["updated"] == 1
+    again = await client.post("/api/transfers/bookings", json=_transfer(email="other@example.com"))
+    assert again.status_code == 200
+
+
+async def test_init_database_backfills_fleet_size(db):
+    import database
+
+    await db.vehicles.insert_one({"type": "SUV", "description": "Old SUV", "price": 35.0, "features": [],
+                                  "capacity": 6, "available": True})
+    await database.init_database()
+
+    suv = await db.vehicles.find_one({"type": "SUV"})
+    assert suv["fleet_size"] == 3
+    assert suv["description"] == "Old SUV"
+    assert await db.vehicles.count_documents({"fleet_size": {"$exists": False}}) == 0
+
+
+async def test_sync_copies_existing_bookings_once(db):
+    await db.transfer_bookings.insert_one({
+        "arrival_date": DAY.isoformat(), "arrival_time": "10:00:00", "destination": "Stone Town",
+        "vehicle_units": ["SUV #1"], "status": "pending",
+    })
+    assert await fleet.sync_schedule(DAY) == 1
+    assert await fleet.sync_schedule(DAY) == 0
+    unit = await db.fleet_schedule.find_one({"_id": "SUV #1"})
+    assert [(interval["start"], interval["end"]) for interval in unit["intervals"]] == [(START, END)]
+
+
+async def test_prune_drops_finished_windows(db):
+    scheduler = FleetScheduler()
+    await scheduler.reserve(["SUV #1"], START, END, "old")
+    await scheduler.reserve(["SUV #1"], START + timedelta(days=2), END + timedelta(days=2), "new")
+    assert await fleet.prune_schedule(datetime.combine(DAY + timedelta(days=1), time.min)) == 1
+    unit = await db.fleet_schedule.find_one({"_id": "SUV #1"})
+    assert [interval["booking_id"] for interval in unit["intervals"]] == ["new"]
+
+
+async def test_sync_sends_units_in_batches(db):
+    await db.transfer_bookings.insert_many([{
+        "arrival_date": DAY.isoformat(), "arrival_time": arrival_time, "destination": "Stone Town",
+        "vehicle_units": ["Minivan #1", "SUV #1"], "status": "pending",
+    } for arrival_time in ("06:00:00", "10:00:00", "14:00:00")])
+    assert await fleet.sync_schedule(DAY, batch_size=4) == 6
+    assert await fleet.sync_schedule(DAY, batch_size=4) == 0
+    unit = await db.fleet_schedule.find_one({"_id": "SUV #1"})
+    assert len(unit["intervals"]) == 3
+
+
+async def test_past_days_are_evicted(db):
+    await _vehicle(db)
+    scheduler = FleetScheduler()
+    await scheduler.refresh(DAY)
+    scheduler.add_local(["SUV #1"], START, END, "old")
+    later = START + timedelta(days=3)
+    scheduler.add_local(["SUV #1"], later, later + (END - START), "upcoming")
+
+    scheduler.evict_past(DAY + timedelta(days=3))
+    assert [key[1] for key in scheduler.schedules["SUV #1"].keys()] == ["upcoming"]
+    assert scheduler._days_loaded_at == {}
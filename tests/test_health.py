@@ -0,0 +1,65 @@
+import pytest
+
+import health
+import server
+from health import ReadinessProbe, READY, NOT_READY
+
+pytestmark = pytest.mark.anyio
+
+
+class _Initializer:
+    """Startup work that fails until told otherwise"""
+
+    def __init__(self, ok=False):
+        self.ok = ok
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        return self.ok
+
+
+@pytest.fixture
+def probe(monkeypatch):
+    probe = ReadinessProbe(cache_seconds=0)
+    monkeypatch.setattr(server, "readiness_probe", probe)
+    return probe
+
+
+async def test_not_ready_until_the_initializer_succeeds(client, db, probe):
+    probe.initializer = initializer = _Initializer()
+
+    response = await client.get("/api/health/ready")
+    assert response.status_code == 503
+    assert (response.json()["status"], response.json()["initialized"]) == (NOT_READY, False)
+    health_response = await client.get("/api/health")
+    assert (health_response.status_code, health_response.json()["status"]) == (200, "unhealthy")
+
+    initializer.ok = True
+    response = await client.get("/api/health/ready")
+    assert response.status_code == 200
+    assert (response.json()["status"], response.json()["initialized"]) == (READY, True)
+    # Once initialized the startup work is not retried
+    await client.get("/api/health/ready")
+    assert initializer.calls == 3
+
+
+class _Unreachable:
+    async def command(self, name):
+        raise ConnectionError("connection refused")
+
+
+async def test_unreachable_mongo_is_not_ready(client, db, probe, monkeypatch):
+    probe.mark_initialized()
+    monkeypatch.setattr(health, "db", _Unreachable())
+    response = await client.get("/api/health/ready")
+    assert response.status_code == 503
+    assert response.json()["mongo"] == {"ok": False, "error": "connection refused"}
+
+
+async def test_result_is_cached(db):
+    probe = ReadinessProbe(cache_seconds=60)
+    probe.initializer = initializer = _Initializer()
+    first = await probe.check()
+    assert await probe.check() is first
+    assert initializer.calls == 1
@@ -0,0 +1,59 @@
+import pytest
+from bson import ObjectId
+
+from cache import catalog_cache
+
+pytestmark = pytest.mark.anyio
+
+
+async def _vehicles(db):
+    # Large enough to be compressed
+    await db.vehicles.insert_many([
+        {"type": f"Van {index}", "description": "Air-conditioned minivan " * 20, "price": 55.0,
+         "features": ["Wi-Fi"], "capacity": 12, "fleet_size": 1, "available": True}
+        for index in range(20)
+    ])
+
+
+async def test_etag_is_weak_and_shared_by_every_encoding(client, db):
+    await _vehicles(db)
+    plain = await client.get("/api/transfers/vehicles", headers={"Accept-Encoding": "identity"})
+    gzipped = await client.get("/api/transfers/vehicles", headers={"Accept-Encoding": "gzip"})
+    assert gzipped.headers["content-encoding"] == "gzip"
+    assert "content-encoding" not in plain.headers
+    assert plain.headers["etag"].startswith('W/"')
+    assert plain.headers["etag"] == gzipped.headers["etag"]
+
+
+@pytest.mark.parametrize("form", ["weak", "strong"])
+async def test_if_none_match_uses_weak_comparison(client, db, form):
+    await _vehicles(db)
+    etag = (await client.get("/api/transfers/vehicles")).headers["etag"]
+    sent = etag if form == "weak" else etag[2:]
+    response = await client.get("/api/transfers/vehicles", headers={"If-None-Match": f'"other", {sent}'})
+    assert response.status_code == 304
+    assert response.headers["etag"] == etag
+
+
+async def test_changed_collection_is_sent_again(client, db):
+    await _vehicles(db)
+    etag = (await client.get("/api/transfers/vehicles")).headers["etag"]
+    await db.vehicles.insert_one({"type": "Bus", "description": "Bus", "price": 90.0, "features": [],
+                                  "capacity": 30, "fleet_size": 1, "available": True})
+    # As the change stream listener would
+    catalog_cache.invalidate()
+    response = await client.get("/api/transfers/vehicles", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+
+
+async def test_wildcard_only_matches_an_existing_tour(client, db):
+    tour = await db.tours.insert_one({"title": "Prison Island", "description": "Tortoises", "image": "x.jpg",
+                                      "price": 40.0, "duration": "Half Day", "category": "water", "features": []})
+    existing = await client.get(f"/api/tours/{tour.inserted_id}", headers={"If-None-Match": "*"})
+    assert existing.status_code == 304
+    assert existing.headers["etag"].startswith('W/"')
+
+    missing = await client.get(f"/api/tours/{ObjectId()}", headers={"If-None-Match": "*"})
+    assert missing.status_code == 404
+    assert "etag" not in missing.headers
@@ -0,0 +1,65 @@
+import pytest
+
+import ratelimit
+from idempotency import IDEMPOTENCY_HEADER, REPLAYED_HEADER
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def tour_id(db):
+    result = await db.tours.insert_one({
+        "title": "Stone Town Tour", "description": "Old town", "image": "town.jpg", "price": 30.0,
+        "duration": "Half Day", "category": "cultural", "features": [], "capacity": 50,
+    })
+    return str(result.inserted_id)
+
+
+def _booking(tour_id, name="Asha", email="asha@example.com"):
+    return {
+        "tour_id": tour_id, "customer_name": name, "email": email, "phone": "+255 777 000 000",
+        "booking_date": "2030-03-01", "guests": 2,
+    }
+
+
+async def test_identical_repeat_is_replayed(client, db, tour_id):
+    first = await client.post("/api/tours/bookings", json=_booking(tour_id))
+    repeat = await client.post("/api/tours/bookings", json=_booking(tour_id))
+
+    assert first.status_code == repeat.status_code == 200
+    assert repeat.headers[REPLAYED_HEADER] == "true"
+    assert repeat.json() == first.json()
+    assert await db.bookings.count_documents({}) == 1
+
+
+async def test_key_reused_with_another_body_is_refused(client, db, tour_id):
+    headers = {IDEMPOTENCY_HEADER: "1"}
+    first = await client.post("/api/tours/bookings", json=_booking(tour_id), headers=headers)
+    reused = await client.post("/api/tours/bookings", json=_booking(tour_id, "Juma", "juma@example.com"),
+                               headers=headers)
+
+    assert first.status_code == 200
+    assert reused.status_code == 422
+    assert REPLAYED_HEADER not in reused.headers
+    assert await db.bookings.count_documents({}) == 1
+
+
+async def test_keys_are_scoped_to_the_client(client, db, tour_id, monkeypatch):
+    monkeypatch.setattr(ratelimit, "TRUST_FORWARDED_FOR", True)
+    first = await client.post("/api/tours/bookings", json=_booking(tour_id),
+                              headers={IDEMPOTENCY_HEADER: "1", "X-Forwarded-For": "198.51.100.1"})
+    other = await client.post("/api/tours/bookings", json=_booking(tour_id, "Juma", "juma@example.com"),
+                              headers={IDEMPOTENCY_HEADER: "1", "X-Forwarded-For": "198.51.100.2"})
+
+    assert first.status_code == other.status_code == 200
+    assert REPLAYED_HEADER not in other.headers
+    assert other.json()["customer_name"] == "Juma"
+    assert await db.bookings.count_documents({}) == 2
+
+
+async def test_failed_requests_are_not_cached(client, db, tour_id):
+    missing = _booking("0" * 24)
+    assert (await client.post("/api/tours/bookings", json=missing)).status_code == 404
+    retry = await client.post("/api/tours/bookings", json=missing)
+    assert retry.status_code == 404
+    assert REPLAYED_HEADER not in retry.headers
@@ -0,0 +1,19 @@
+import pytest
+from pymongo.errors import DuplicateKeyError
+
+from indexes import ensure_indexes
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.mark.parametrize("collection_name, document", [
+    ("tours", {"title": "Prison Island"}),
+    ("vehicles", {"type": "SUV"}),
+    ("gallery", {"url": "https://example.com/beach.jpg"}),
+])
+async def test_natural_keys_are_unique(db, collection_name, document):
+    await ensure_indexes(db)
+    await ensure_indexes(db)
+    await db[collection_name].insert_one(dict(document))
+    with pytest.raises(DuplicateKeyError):
+        await db[collection_name].insert_one(dict(document))
@@ -0,0 +1,81 @@
+from datetime import date
+
+import pytest
+from pymongo.errors import DuplicateKeyError
+
+import inventory
+
+pytestmark = pytest.mark.anyio
+
+DAY = date(2030, 1, 15)
+
+
+async def _tour(db, capacity=5):
+    result = await db.tours.insert_one({
+        "title": "Spice Farm Tour", "description": "Spices", "image": "spice.jpg", "price": 35.0,
+        "duration": "Half Day", "category": "cultural", "features": [], "capacity": capacity,
+    })
+    return str(result.inserted_id)
+
+
+def _booking(tour_id, guests, email="guest@example.com"):
+    return {
+        "tour_id": tour_id, "customer_name": "Guest", "email": email, "phone": "+255 777 000 000",
+        "booking_date": DAY.isoformat(), "guests": guests,
+    }
+
+
+@pytest.mark.parametrize("guests", [0, -50])
+async def test_booking_without_guests_is_rejected(client, db, guests):
+    tour_id = await _tour(db)
+    response = await client.post("/api/tours/bookings", json=_booking(tour_id, guests))
+    assert response.status_code == 422
+    assert await db.tour_inventory.count_documents({}) == 0
+    assert await db.bookings.count_documents({}) == 0
+
+
+async def test_reserve_seats_requires_a_guest(db):
+    with pytest.raises(ValueError):
+        await inventory.reserve_seats("tour", DAY, 0, 5)
+
+
+async def test_sold_out_day_returns_409(client, db):
+    tour_id = await _tour(db, capacity=5)
+    first = await client.post("/api/tours/bookings", json=_booking(tour_id, 4, "first@example.com"))
+    assert first.status_code == 200
+    second = await client.post("/api/tours/bookings", json=_booking(tour_id, 2, "second@example.com"))
+    assert second.status_code == 409
+    third = await client.post("/api/tours/bookings", json=_booking(tour_id, 1, "third@example.com"))
+    assert third.status_code == 200
+
+    calendar = await client.get(f"/api/tours/{tour_id}/availability",
+                                params={"start": DAY.isoformat(), "end": DAY.isoformat()})
+    assert calendar.json() == [{"date": DAY.isoformat(), "capacity": 5, "booked": 5, "available": 0}]
+    assert await db.bookings.count_documents({}) == 2
+
+
+class _RacingCollection:
+    """Lets another request create the day's counter just before our upsert lands"""
+
+    def __init__(self, collection, booked):
+        self.collection = collection
+        self.booked = booked
+
+    def __getattr__(self, name):
+        return getattr(self.collection, name)
+
+    async def find_one_and_update(self, filter, *args, **kwargs):
+        await self.collection.insert_one(
+            {"_id": filter["_id"], "tour_id": "tour", "date": DAY.isoformat(), "booked": self.booked, "capacity": 5}
+        )
+        raise DuplicateKeyError("E11000 duplicate key error")
+
+
+@pytest.mark.parametrize("booked, reserved, total", [(2, True, 5), (4, False, 4)])
+async def test_counter_creation_race(db, monkeypatch, booked, reserved, total):
+    racing = _RacingCollection(inventory.inventory_collection, booked)
+    monkeypatch.setattr(inventory, "inventory_collection", racing)
+
+    assert await inventory.reserve_seats("tour", DAY, 3, 5) is reserved
+    counter = await db.tour_inventory.find_one({"_id": f"tour:{DAY.isoformat()}"})
+    assert counter["booked"] == total
@@ -0,0 +1,109 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from jobs import JobRunner, PermanentJobError, retry_delay, QUEUED, RUNNING, DONE, FAILED
+
+pytestmark = pytest.mark.anyio
+
+
+def _runner(db, handler, worker_id="worker-a", max_attempts=3):
+    runner = JobRunner(db.jobs, handlers={"test": handler}, periodic={}, max_attempts=max_attempts)
+    runner.worker_id = worker_id
+    return runner
+
+
+async def _ok(payload):
+    pass
+
+
+async def _flaky(payload):
+    raise RuntimeError("mail server down")
+
+
+async def _broken(payload):
+    raise PermanentJobError("address rejected")
+
+
+async def test_claimed_job_is_leased_to_one_runner(db):
+    runner = _runner(db, _ok)
+    await runner.enqueue_many("test", [{"n": 1}])
+
+    job = await runner.claim()
+    assert job["status"] == RUNNING
+    assert job["attempts"] == 1
+    assert job["locked_by"] == "worker-a"
+    assert await _runner(db, _ok, "worker-b").claim() is None
+
+    await runner.run_job(job)
+    stored = await db.jobs.find_one({"_id": job["_id"]})
+    assert stored["status"] == DONE
+    assert stored["locked_by"] is None
+
+
+async def test_failure_is_retried_with_backoff(db):
+    runner = _runner(db, _flaky)
+    await runner.enqueue_many("test", [{}])
+
+    job = await runner.claim()
+    before = datetime.utcnow()
+    await runner.run_job(job)
+    stored = await db.jobs.find_one({"_id": job["_id"]})
+    assert stored["status"] == QUEUED
+    assert stored["last_error"] == "mail server down"
+    assert stored["run_at"] > before + timedelta(seconds=retry_delay(1) - 1)
+    # Not due again until the backoff has passed
+    assert await runner.claim() is None
+
+    assert retry_delay(2) == 2 * retry_delay(1)
+
+
+async def test_last_attempt_parks_the_job_as_failed(db):
+    runner = _runner(db, _flaky, max_attempts=2)
+    await runner.enqueue_many("test", [{}])
+    for _ in range(2):
+        await db.jobs.update_many({}, {"$set": {"run_at": datetime.utcnow()}})
+        await runner.run_job(await runner.claim())
+
+    stored = await db.jobs.find_one({})
+    assert (stored["status"], stored["attempts"]) == (FAILED, 2)
+    assert runner.stats()["retried"] == 1
+    assert runner.stats()["failed"] == 1
+
+
+async def test_permanent_error_fails_without_retry(db):
+    runner = _runner(db, _broken)
+    await runner.enqueue_many("test", [{}])
+    await runner.run_job(await runner.claim())
+    stored = await db.jobs.find_one({})
+    assert (stored["status"], stored["attempts"]) == (FAILED, 1)
+
+
+async def test_expired_lease_is_reclaimed(db):
+    first = _runner(db, _ok)
+    await first.enqueue_many("test", [{}])
+    job = await first.claim()
+    # The first runner stalls past its lease
+    await db.jobs.update_one({"_id": job["_id"]}, {"$set": {"locked_until": datetime.utcnow() - timedelta(seconds=1)}})
+
+    second = _runner(db, _flaky, "worker-b")
+    reclaimed = await second.claim()
+    assert reclaimed["_id"] == job["_id"]
+    assert reclaimed["attempts"] == 2
+    await second.run_job(reclaimed)
+
+    # The stale runner finishing late must not overwrite the new outcome
+    await first.run_job(job)
+    stored = await db.jobs.find_one({"_id": job["_id"]})
+    assert stored["status"] == QUEUED
+    assert stored["last_error"] == "mail server down"
+
+
+async def test_periodic_job_is_scheduled_once_per_period(db):
+    runners = [JobRunner(db.jobs, handlers={}, periodic={"tick": 60}) for _ in range(2)]
+    for runner in runners:
+        await runner.schedule_periodic(now=1_200_000)
+    await runners[0].schedule_periodic(now=1_200_030)
+    assert await db.jobs.count_documents({"type": "tick"}) == 1
+    await runners[1].schedule_periodic(now=1_200_060)
+    assert await db.jobs.count_documents({"type": "tick"}) == 2
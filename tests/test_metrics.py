@@ -0,0 +1,65 @@
+import pytest
+from bson import ObjectId
+
+from metrics import Histogram
+
+pytestmark = pytest.mark.anyio
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram("work_seconds", "Time spent working", ("queue",), buckets=(0.1, 1.0))
+    for seconds in (0.05, 0.5, 5.0):
+        histogram.observe(("mail",), seconds)
+    histogram.observe(('say "hi"\n',), 0.05)
+
+    assert histogram.render() == [
+        "# HELP work_seconds Time spent working",
+        "# TYPE work_seconds histogram",
+        'work_seconds_bucket{queue="mail",le="0.1"} 1',
+        'work_seconds_bucket{queue="mail",le="1.0"} 2',
+        'work_seconds_bucket{queue="mail",le="+Inf"} 3',
+        'work_seconds_count{queue="mail"} 3',
+        'work_seconds_sum{queue="mail"} 5.55',
+        'work_seconds_bucket{queue="say \\"hi\\"\\n",le="0.1"} 1',
+        'work_seconds_bucket{queue="say \\"hi\\"\\n",le="1.0"} 1',
+        'work_seconds_bucket{queue="say \\"hi\\"\\n",le="+Inf"} 1',
+        'work_seconds_count{queue="say \\"hi\\"\\n"} 1',
+        'work_seconds_sum{queue="say \\"hi\\"\\n"} 0.05',
+    ]
+
+
+def test_unlabelled_histogram():
+    histogram = Histogram("wait_seconds", "Waiting", (), buckets=(1.0,))
+    histogram.observe((), 0.5)
+    assert histogram.render()[2:] == [
+        'wait_seconds_bucket{le="1.0"} 1',
+        'wait_seconds_bucket{le="+Inf"} 1',
+        "wait_seconds_count 1",
+        "wait_seconds_sum 0.5",
+    ]
+
+
+def _samples(text):
+    samples = {}
+    for line in text.splitlines():
+        if line and not line.startswith("#"):
+            name, value = line.rsplit(" ", 1)
+            samples[name] = float(value)
+    return samples
+
+
+async def test_metrics_exposition(client, db):
+    await client.get(f"/api/tours/{ObjectId()}")
+    response = await client.get("/api/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+
+    text = response.text
+    assert "# TYPE http_request_duration_seconds histogram" in text
+    assert "# TYPE contact_queue_pending gauge" in text
+    samples = _samples(text)
+    # Labelled by the route template, not the id in the path
+    route = 'method="GET",route="/api/tours/{tour_id}",status="404"'
+    assert samples[f'http_request_duration_seconds_bucket{{{route},le="+Inf"}}'] >= 1
+    assert samples[f"http_request_duration_seconds_count{{{route}}}"] >= 1
+    assert "mongo_pool_max_size" in samples
@@ -0,0 +1,120 @@
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+
+from pagination import encode_cursor, decode_cursor, fetch_page, ASCENDING, NEXT_CURSOR_HEADER
+
+pytestmark = pytest.mark.anyio
+
+CREATED = datetime(2030, 1, 1, 12, 0)
+
+
+async def _transfers(db, count):
+    # Pairs share a created_at, so the _id tiebreak matters
+    documents = [{
+        "_id": ObjectId(), "customer_name": f"Guest {index}", "email": "guest@example.com",
+        "phone": "+255 777 000 000", "flight_number": "TK 603", "arrival_date": "2030-05-10",
+        "arrival_time": "10:00:00", "passengers": 2, "vehicle_type": "SUV", "destination": "Paje",
+        "status": "pending", "created_at": CREATED + timedelta(seconds=index // 2),
+    } for index in range(count)]
+    await db.transfer_bookings.insert_many(documents)
+    return documents
+
+
+def test_cursor_round_trip():
+    document = {"_id": ObjectId(), "created_at": datetime(2030, 1, 1, 12, 0, 0, 123000)}
+    assert decode_cursor(encode_cursor(document)) == (document["created_at"], document["_id"])
+
+
+@pytest.mark.parametrize("cursor", ["not-a-cursor", "MjAzMHxub3QtYW4taWQ="])
+def test_bad_cursor_is_a_400(cursor):
+    with pytest.raises(HTTPException) as raised:
+        decode_cursor(cursor)
+    assert raised.value.status_code == 400
+
+
+async def test_pages_cover_every_document_once(client, db):
+    documents = await _transfers(db, 7)
+    seen, cursor, pages = [], None, 0
+    while True:
+        params = {"limit": 3, **({"cursor": cursor} if cursor else {})}
+        response = await client.get("/api/transfers/bookings", params=params)
+        assert response.status_code == 200
+        seen.extend(booking["_id"] for booking in response.json())
+        pages += 1
+        cursor = response.headers.get(NEXT_CURSOR_HEADER)
+        if cursor is None:
+            break
+
+    newest_first = sorted(documents, key=lambda document: (document["created_at"], document["_id"]), reverse=True)
+    assert seen == [str(document["_id"]) for document in newest_first]
+    assert pages == 3
+
+
+async def test_exact_multiple_has_no_trailing_cursor(db):
+    await _transfers(db, 4)
+    first, cursor = await fetch_page(db.transfer_bookings, {}, None, 2)
+    second, cursor = await fetch_page(db.transfer_bookings, {}, cursor, 2)
+    assert len(first) == len(second) == 2
+    assert cursor is None
+
+
+async def test_ascending_pages_with_a_filter(db):
+    documents = await _transfers(db, 6)
+    await db.transfer_bookings.update_one({"_id": documents[2]["_id"]}, {"$set": {"status": "cancelled"}})
+    first, cursor = await fetch_page(db.transfer_bookings, {"status": "pending"}, None, 3, ASCENDING)
+    rest, cursor = await fetch_page(db.transfer_bookings, {"status": "pending"}, cursor, 3, ASCENDING)
+    # Created in (created_at, _id) order
+    assert [document["_id"] for document in first + rest] == [
+        document["_id"] for document in documents if document is not documents[2]
+    ]
+    assert cursor is None
+
+
+async def test_bad_cursor_on_the_endpoint(client, db):
+    response = await client.get("/api/transfers/bookings", params={"cursor": "garbage"})
+    assert response.status_code == 400
+
+
+async def _contacts(db, count):
+    documents = [{
+        "_id": ObjectId(), "name": f"Guest {index}", "email": "guest@example.com", "subject": "Booking",
+        "message": "Hello", "status": "closed" if index % 3 == 0 else "new",
+        "created_at": CREATED + timedelta(seconds=index // 2),
+    } for index in range(count)]
+    await db.contacts.insert_many(documents)
+    return documents
+
+
+async def _all_pages(client, params):
+    contacts, cursor = [], None
+    while True:
+        page = {**params, "limit": 3, **({"cursor": cursor} if cursor else {})}
+        response = await client.get("/api/contact/", params=page)
+        contacts.extend(response.json())
+        cursor = response.headers.get(NEXT_CURSOR_HEADER)
+        if cursor is None:
+            return contacts
+
+
+@pytest.mark.parametrize("params", [{}, {"status": "new"}])
+async def test_contact_stream_matches_the_pages(client, db, params):
+    await _contacts(db, 8)
+    paged = await _all_pages(client, params)
+    assert len(paged) == (8 if not params else 5)
+
+    as_json = await client.get("/api/contact/", params={**params, "stream": "json"})
+    assert as_json.json() == paged
+    as_ndjson = await client.get("/api/contact/", params={**params, "stream": "ndjson"})
+    assert as_ndjson.headers["content-type"] == "application/x-ndjson"
+    assert [json.loads(line) for line in as_ndjson.text.splitlines()] == paged
+
+    # Streaming from a page's cursor gives the remaining pages
+    first = await client.get("/api/contact/", params={**params, "limit": 3})
+    rest = await client.get("/api/contact/", params={
+        **params, "stream": "json", "cursor": first.headers[NEXT_CURSOR_HEADER],
+    })
+    assert rest.json() == paged[3:]
@@ -0,0 +1,53 @@
+import pytest
+
+import ratelimit
+from ratelimit import MemoryBucketStore, RateLimiter
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_bucket_allows_burst_then_limits(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(ratelimit.time, "monotonic", lambda: now[0])
+    store = MemoryBucketStore()
+
+    assert [(await store.take("ip:a", 1.0, 3))[0] for _ in range(4)] == [True, True, True, False]
+    allowed, wait = await store.take("ip:a", 1.0, 3)
+    assert not allowed and wait == pytest.approx(1.0)
+
+    now[0] += 1.0
+    assert (await store.take("ip:a", 1.0, 3))[0]
+    assert (await store.take("ip:b", 1.0, 3))[0]  # other clients have their own bucket
+
+
+async def test_idle_buckets_are_swept(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(ratelimit.time, "monotonic", lambda: now[0])
+    store = MemoryBucketStore(max_buckets=2)
+    await store.take("ip:a", 1.0, 3)
+    now[0] += ratelimit.BUCKET_IDLE_SECONDS + 1
+    await store.take("ip:b", 1.0, 3)
+    await store.take("ip:c", 1.0, 3)
+    assert set(store._buckets) == {"ip:b", "ip:c"}
+
+
+async def test_limiter_checks_every_key():
+    limiter = RateLimiter(MemoryBucketStore())
+    assert await limiter.check(["ip:a", "email:x"], 60, 1) is None
+    # A new address with the same email is still limited
+    assert await limiter.check(["ip:b", "email:x"], 60, 1) > 0
+    assert limiter.stats() == {"allowed": 1, "limited": 1}
+
+
+async def test_public_post_returns_429_with_retry_after(client, db):
+    booking = {
+        "tour_id": "0" * 24, "customer_name": "Asha", "phone": "+255 777 000 000",
+        "booking_date": "2030-03-01", "guests": 2,
+    }
+    statuses = []
+    for number in range(12):
+        response = await client.post("/api/tours/bookings", json={**booking, "email": f"g{number}@example.com"})
+        statuses.append(response.status_code)
+    assert statuses[:10] == [404] * 10  # burst of 10 for booking routes
+    assert statuses[10:] == [429, 429]
+    assert int(response.headers["Retry-After"]) >= 1
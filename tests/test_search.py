@@ -0,0 +1,86 @@
+import pytest
+
+from cache import catalog_cache
+from coherence import CacheCoherenceListener
+from search import TourSearchIndex, tokenize
+
+pytestmark = pytest.mark.anyio
+
+TOURS = [
+    {"title": "Prison Island Tour", "description": "Giant tortoises and snorkeling off the island",
+     "price": 40.0, "duration": "Half Day", "category": "water", "features": ["Snorkeling", "Boat"]},
+    {"title": "Safari Blue", "description": "Sandbank lunch, snorkeling and dhow sailing",
+     "price": 65.0, "duration": "Full Day", "category": "water", "features": ["Lunch", "Dhow"]},
+    {"title": "Spice Farm Tour", "description": "Taste cloves and nutmeg on a spice farm",
+     "price": 35.0, "duration": "Half Day", "category": "cultural", "features": ["Tasting"]},
+    {"title": "Jozani Forest", "description": "Red colobus monkeys in the forest, snorkeling not included",
+     "price": 120.0, "duration": "Half Day", "category": "nature", "features": ["Guide"]},
+]
+
+
+def _index():
+    return TourSearchIndex([{"_id": str(index), **tour} for index, tour in enumerate(TOURS)])
+
+
+def _titles(result):
+    return [tour["title"] for tour in result["results"]]
+
+
+def test_tokenize_drops_stopwords_and_plurals():
+    assert tokenize("The Tortoises of Prison Island") == ["tortoise", "prison", "island"]
+
+
+def test_title_and_feature_matches_rank_first():
+    # Snorkeling is a feature of Prison Island, in the description of the others
+    assert _titles(_index().search("snorkeling")) == ["Prison Island Tour", "Jozani Forest", "Safari Blue"]
+
+
+def test_every_term_must_match():
+    assert _titles(_index().search("snorkeling dhow")) == ["Safari Blue"]
+    assert _index().search("snorkeling volcano")["total"] == 0
+
+
+@pytest.mark.parametrize("query, title", [
+    ("spcie", "Spice Farm Tour"),        # swap
+    ("tortoses", "Prison Island Tour"),  # missing letter
+    ("jozzani", "Jozani Forest"),        # extra letter
+    ("colobos", "Jozani Forest"),        # wrong letter
+])
+def test_one_typo_is_tolerated(query, title):
+    assert _titles(_index().search(query)) == [title]
+
+
+def test_last_term_matches_as_a_prefix():
+    assert _titles(_index().search("safari blu")) == ["Safari Blue"]
+    # Earlier terms have to be whole words
+    assert _index().search("saf blue")["total"] == 0
+
+
+def test_facets_filter_and_count():
+    result = _index().search("", {"category": "water", "duration": "Half Day"})
+    assert _titles(result) == ["Prison Island Tour"]
+    # Each facet counts with the other facets' filters only
+    assert result["facets"]["category"] == {"water": 1, "cultural": 1, "nature": 1}
+    assert result["facets"]["duration"] == {"Half Day": 1, "Full Day": 1}
+    assert result["facets"]["price"] == {"under-50": 1}
+
+
+def test_facets_apply_to_the_query_matches():
+    result = _index().search("snorkeling", {"price": "100-200"})
+    assert _titles(result) == ["Jozani Forest"]
+    assert result["facets"]["price"] == {"under-50": 1, "50-100": 1, "100-200": 1}
+
+
+async def test_tour_change_rebuilds_the_index(client, db):
+    await db.tours.insert_many([{**tour, "image": "x.jpg"} for tour in TOURS[:2]])
+    response = await client.get("/api/tours/search", params={"q": "spice"})
+    assert response.json()["total"] == 0
+
+    await db.tours.insert_one({**TOURS[2], "image": "x.jpg"})
+    # Served from the cached index until the change is seen
+    assert (await client.get("/api/tours/search", params={"q": "spice"})).json()["total"] == 0
+
+    listener = CacheCoherenceListener(db, cache=catalog_cache, view_database=db, view_refresh_delay=0)
+    listener.apply({"operationType": "insert", "ns": {"db": "tests", "coll": "tours"}})
+    response = await client.get("/api/tours/search", params={"q": "spice"})
+    assert [tour["title"] for tour in response.json()["results"]] == ["Spice Farm Tour"]
@@ -0,0 +1,137 @@
+import pytest
+from bson import ObjectId
+
+from routes import transfers
+from transitions import bulk_transition, TRANSFER_TRANSITIONS
+
+pytestmark = pytest.mark.anyio
+
+
+async def _transfers(db, *statuses):
+    result = await db.transfer_bookings.insert_many([
+        {"arrival_date": "2030-05-10", "arrival_time": "10:00:00", "destination": "Paje",
+         "vehicle_type": "SUV", "status": status_name} for status_name in statuses
+    ])
+    return [str(inserted_id) for inserted_id in result.inserted_ids]
+
+
+async def test_transfer_outcomes_per_id(client, db):
+    pending, completed, cancelled = await _transfers(db, "pending", "completed", "cancelled")
+    missing = str(ObjectId())
+    response = await client.put("/api/transfers/bookings/status", json={
+        "status": "cancelled", "ids": [pending, completed, cancelled, missing, "nope"],
+    })
+    assert response.status_code == 200
+    body = response.json()
+    assert [item["status_code"] for item in body["results"]] == [200, 409, 200, 404, 400]
+    assert body["results"][1]["error"] == "Cannot change status from completed to cancelled"
+    assert (body["updated"], body["unchanged"], body["failed"]) == (1, 1, 3)
+
+    stored = {str(document["_id"]): document["status"] async for document in db.transfer_bookings.find()}
+    assert stored == {pending: "cancelled", completed: "completed", cancelled: "cancelled"}
+
+
+async def test_transfer_filter_selects_and_checks_each_booking(client, db):
+    await _transfers(db, "confirmed", "completed")
+    response = await client.put("/api/transfers/bookings/status", json={
+        "status": "completed", "filter": {"arrival_before": "2030-05-11"},
+    })
+    assert [item["status_code"] for item in response.json()["results"]] == [200, 200]
+    assert response.json()["updated"] == 1
+
+    reopened = await client.put("/api/transfers/bookings/status", json={
+        "status": "pending", "filter": {"status": "completed"},
+    })
+    assert [item["status_code"] for item in reopened.json()["results"]] == [409, 409]
+
+
+async def test_contact_transitions(client, db):
+    result = await db.contacts.insert_many([{"name": "A", "status": "replied"}, {"name": "B", "status": "closed"}])
+    replied, closed = [str(inserted_id) for inserted_id in result.inserted_ids]
+    response = await client.put("/api/contact/status", json={"status": "new", "ids": [replied, closed]})
+    assert [item["status_code"] for item in response.json()["results"]] == [409, 200]
+
+
+@pytest.mark.parametrize("body", [
+    {"status": "archived", "ids": []},
+    {"status": "cancelled"},
+    {"status": "cancelled", "filter": {}},
+])
+async def test_bad_requests(client, db, body):
+    response = await client.put("/api/transfers/bookings/status", json=body)
+    assert response.status_code == 400
+
+
+class _ChangedMeanwhile:
+    """Another request confirms the booking between the read and the bulk_write"""
+
+    def __init__(self, collection, booking_id):
+        self.collection = collection
+        self.booking_id = booking_id
+
+    def __getattr__(self, name):
+        return getattr(self.collection, name)
+
+    async def bulk_write(self, operations, ordered):
+        await self.collection.update_one({"_id": ObjectId(self.booking_id)}, {"$set": {"status": "confirmed"}})
+        return await self.collection.bulk_write(operations, ordered=ordered)
+
+
+async def test_concurrent_change_is_a_conflict(db):
+    raced, other = await _transfers(db, "pending", "pending")
+    result = await bulk_transition(
+        _ChangedMeanwhile(db.transfer_bookings, raced), "transfer_bookings", TRANSFER_TRANSITIONS, "pending",
+        "completed", ids=[raced, other],
+    )
+    assert [(item.status_code, item.previous_status) for item in result.results] == [
+        (409, "confirmed"), (200, "pending"),
+    ]
+    assert (await db.transfer_bookings.find_one({"_id": ObjectId(raced)}))["status"] == "confirmed"
+
+
+async def test_concurrent_move_to_the_same_status_is_not_counted_twice(db):
+    raced, other = await _transfers(db, "pending", "pending")
+
+    class _MovedMeanwhile(_ChangedMeanwhile):
+        async def bulk_write(self, operations, ordered):
+            await self.collection.update_one({"_id": ObjectId(self.booking_id)}, {"$set": {"status": "completed"}})
+            return await self.collection.bulk_write(operations, ordered=ordered)
+
+    result = await bulk_transition(
+        _MovedMeanwhile(db.transfer_bookings, raced), "transfer_bookings", TRANSFER_TRANSITIONS, "pending",
+        "completed", ids=[raced, other],
+    )
+    assert [(item.status_code, item.previous_status) for item in result.results] == [
+        (409, "completed"), (200, "pending"),
+    ]
+    assert result.updated == 1
+
+
+class _SingleChangedMeanwhile(_ChangedMeanwhile):
+    """Another request changes or deletes the booking between the read and the update"""
+
+    def __init__(self, collection, booking_id, change):
+        super().__init__(collection, booking_id)
+        self.change = change
+
+    async def find_one_and_update(self, query, update, **kwargs):
+        await self.change(self.collection, {"_id": ObjectId(self.booking_id)})
+        return await self.collection.find_one_and_update(query, update, **kwargs)
+
+
+async def _confirm(collection, query):
+    await collection.update_one(query, {"$set": {"status": "confirmed"}})
+
+
+async def _delete(collection, query):
+    await collection.delete_one(query)
+
+
+@pytest.mark.parametrize("change, status_code", [(_confirm, 409), (_delete, 404)])
+async def test_single_status_update_is_conditional(client, db, monkeypatch, change, status_code):
+    booking_id, = await _transfers(db, "pending")
+    monkeypatch.setattr(transfers, "transfers_collection",
+                        _SingleChangedMeanwhile(db.transfer_bookings, booking_id, change))
+    response = await client.put(f"/api/transfers/bookings/{booking_id}/status", params={"status": "completed"})
+    assert response.status_code == status_code
+    assert await db.transfer_bookings.count_documents({"status": "completed"}) == 0
@@ -0,0 +1,109 @@
+import os
+
+import pytest
+from bson import ObjectId, json_util
+
+from write_behind import WriteBehindQueue
+
+pytestmark = pytest.mark.anyio
+
+
+def _spool(directory, pid, documents):
+    path = directory / f"contacts.{pid}.ndjson"
+    path.write_text("".join(json_util.dumps(document) + "\n" for document in documents))
+    return path
+
+
+async def test_dead_workers_spool_is_replayed(db, tmp_path):
+    documents = [{"_id": ObjectId(), "name": f"Guest {index}"} for index in range(3)]
+    # Already written before the crash; replaying it must not duplicate it
+    await db.contacts.insert_one(documents[0])
+    _spool(tmp_path, 4000001, documents)
+
+    queue = WriteBehindQueue(db.contacts, "contacts", spool_dir=tmp_path, interval=60)
+    await queue.start()
+    assert queue.stats()["pending"] == 3
+    await queue.stop()
+
+    assert await db.contacts.count_documents({}) == 3
+    assert not list(tmp_path.glob("contacts.4000001.*"))
+    assert (tmp_path / f"contacts.{os.getpid()}.ndjson").read_text() == ""
+
+
+async def test_live_workers_spool_is_left_alone(db, tmp_path):
+    sibling = _spool(tmp_path, 4000002, [{"_id": ObjectId(), "name": "In flight"}])
+    holder = WriteBehindQueue._try_lock(sibling.with_suffix(".lock"))
+    assert holder is not None
+    try:
+        queue = WriteBehindQueue(db.contacts, "contacts", spool_dir=tmp_path, interval=60)
+        await queue.start()
+        assert queue.stats()["pending"] == 0
+        await queue.stop()
+        assert sibling.exists()
+        assert await db.contacts.count_documents({}) == 0
+    finally:
+        holder.close()
+
+
+async def test_spool_is_only_rewritten_after_a_flush(db, tmp_path, monkeypatch):
+    queue = WriteBehindQueue(db.contacts, "contacts", spool_dir=tmp_path, interval=60)
+    await queue.start()
+    rewrites = []
+    monkeypatch.setattr(queue, "_rewrite_spool", lambda: rewrites.append(len(queue._pending)))
+
+    await queue.drain()
+    assert rewrites == []
+
+    await queue.submit({"_id": ObjectId(), "name": "Guest"})
+    await queue.drain()
+    assert rewrites == [0]
+    await queue.stop()
+
+
+async def test_unflushed_documents_survive_a_restart(db, tmp_path):
+    queue = WriteBehindQueue(db.contacts, "contacts", spool_dir=tmp_path, interval=60)
+    await queue.start()
+    await queue.submit({"_id": ObjectId(), "name": "Guest"})
+    # A crash: the flusher never runs and the lock goes with the process
+    queue._task.cancel()
+    queue._lock.close()
+    queue._spool.close()
+
+    restarted = WriteBehindQueue(db.contacts, "contacts", spool_dir=tmp_path, interval=60)
+    await restarted.start()
+    assert restarted.stats()["pending"] == 1
+    await restarted.stop()
+    assert await db.contacts.count_documents({}) == 1
+
+
+async def test_claimed_spool_of_a_worker_that_died_replaying_is_recovered(db, tmp_path):
+    documents = [{"_id": ObjectId(), "name": f"Guest {index}"} for index in range(2)]
+    # Worker 4000004 died after claiming 4000003's spool, before respooling it
+    _spool(tmp_path, 4000003, documents).rename(tmp_path / "contacts.4000003.ndjson.replay.4000004")
+
+    queue = WriteBehindQueue(db.contacts, "contacts", spool_dir=tmp_path, interval=60)
+    await queue.start()
+    assert queue.stats()["pending"] == 2
+    assert not list(tmp_path.glob("*.replay.*"))
+    await queue.stop()
+    assert await db.contacts.count_documents({}) == 2
+
+
+async def test_claimed_spool_stays_until_respooled(db, tmp_path, monkeypatch):
+    _spool(tmp_path, 4000005, [{"_id": ObjectId(), "name": "Guest"}])
+    queue = WriteBehindQueue(db.contacts, "contacts", spool_dir=tmp_path, interval=60)
+
+    def disk_full():
+        raise OSError("No space left on device")
+
+    monkeypatch.setattr(queue, "_rewrite_spool", disk_full)
+    with pytest.raises(OSError):
+        await queue.start()
+    queue._lock.close()
+    assert [path.name for path in tmp_path.glob("*.replay.*")] == [f"contacts.4000005.ndjson.replay.{os.getpid()}"]
+
+    monkeypatch.undo()
+    restarted = WriteBehindQueue(db.contacts, "contacts", spool_dir=tmp_path, interval=60)
+    await restarted.start()
+    assert restarted.stats()["pending"] == 1
+    await restarted.stop()